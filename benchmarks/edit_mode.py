@@ -0,0 +1,137 @@
+"""
+Compares ways of changing shape keys of a mesh that is in Edit Mode:
+- `toggle`: leaving Edit Mode with `mode_set` and entering it again (`editable_shape_keys` with `object_mode`,
+  used by operators that move shape keys or change the active one).
+- `reload`: writing edit-mode mesh to mesh data and re-loading BMesh from it (`editable_shape_keys` without it).
+- `layers`: reading and writing one shape key through BMesh shape layers, without any conversion.
+And times add-on operators that work in Edit Mode. Merge Down is timed both in place (through shape layers,
+`EditShapeLayers`) and with the toggle around it, which is what it costs when it can't be done in place.
+
+Run with:
+    blender --background --factory-startup --python benchmarks/edit_mode.py -- --vertices 1000000 --keys 20
+Add-on has to be installed and enabled (`--addons bake_shape_keys`, or as an extension).
+"""
+
+import addon_utils
+import argparse
+import sys
+import time
+
+import bmesh
+import bpy
+import numpy
+
+
+# Module of the add-on that was enabled when the benchmark started (`bl_ext.<repository>.bake_shape_keys` when installed as an extension).
+ADDON = next((name for name in bpy.context.preferences.addons.keys() if name.split(".")[-1] == "bake_shape_keys"), None)
+
+
+def parse_arguments():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vertices", type=int, default=250000, help="Approximate number of vertices of the test mesh")
+    parser.add_argument("--keys", type=int, default=10, help="Number of shape keys (besides basis)")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of times each case is run, fastest is reported")
+    return parser.parse_args(argv)
+
+
+def reset_file():
+    """Loads empty factory startup file, without resetting preferences, and makes sure the add-on is still enabled"""
+
+    bpy.ops.wm.read_homefile(use_empty=True, use_factory_startup=True)
+    if ADDON is not None and ADDON not in bpy.context.preferences.addons:
+        addon_utils.enable(ADDON, default_set=True)
+
+
+def create_mesh(vertex_count, key_count):
+    """Creates a grid object with random shape keys and enters Edit Mode"""
+
+    reset_file()
+
+    size = max(int(vertex_count ** 0.5), 2)
+    bpy.ops.mesh.primitive_grid_add(x_subdivisions=size, y_subdivisions=size, size=2.0)
+    obj = bpy.context.object
+
+    rng = numpy.random.default_rng(0)
+    obj.shape_key_add(name="Basis")
+    for i in range(key_count):
+        key = obj.shape_key_add(name=f"Key_{i:03d}", from_mix=False)
+        coordinates = numpy.empty(len(key.data) * 3, dtype=numpy.float32)
+        key.data.foreach_get("co", coordinates)
+        coordinates += rng.normal(0.0, 0.01, coordinates.shape).astype(numpy.float32)
+        key.data.foreach_set("co", coordinates)
+        key.value = 0.5
+
+    obj.active_shape_key_index = 1
+    bpy.ops.object.mode_set(mode='EDIT')
+    bpy.ops.mesh.select_all(action='SELECT')
+    return obj
+
+
+def time_case(function, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def toggle(obj):
+    bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.mode_set(mode='EDIT')
+
+
+def reload(obj):
+    obj.update_from_editmode()
+    bm = bmesh.from_edit_mesh(obj.data)
+    bm.clear()
+    bm.from_mesh(obj.data, use_shape_key=True, shape_key_index=obj.active_shape_key_index)
+    bmesh.update_edit_mesh(obj.data)
+
+
+def layers(obj):
+    bm = bmesh.from_edit_mesh(obj.data)
+    layer = bm.verts.layers.shape[obj.data.shape_keys.key_blocks[-1].name]
+    coordinates = numpy.fromiter((value for vert in bm.verts for value in vert[layer]),
+                                 dtype=numpy.float32, count=len(bm.verts) * 3).reshape(-1, 3)
+    for vert, co in zip(bm.verts, coordinates):
+        vert[layer] = co
+    bmesh.update_edit_mesh(obj.data)
+
+
+def merge_with_toggle(obj):
+    bpy.ops.object.mode_set(mode='OBJECT')
+    bpy.ops.object.shape_key_merge(direction='DOWN')
+    bpy.ops.object.mode_set(mode='EDIT')
+
+
+def main():
+    arguments = parse_arguments()
+    obj = create_mesh(arguments.vertices, arguments.keys)
+    print(f"Mesh with {len(obj.data.vertices)} vertices and {arguments.keys} shape keys")
+
+    cases = [
+        ("toggle", lambda: toggle(obj)),
+        ("reload", lambda: reload(obj)),
+        ("layers (one shape key)", lambda: layers(obj)),
+        ("object.shape_key_duplicate", lambda: bpy.ops.object.shape_key_duplicate()),
+        ("object.shape_key_split", lambda: bpy.ops.object.shape_key_split()),
+        ("object.shape_key_merge (in place)", lambda: bpy.ops.object.shape_key_merge(direction='DOWN')),
+        ("object.shape_key_merge (toggle)", lambda: merge_with_toggle(obj)),
+    ]
+
+    for name, function in cases:
+        if name.startswith("object.") and not hasattr(bpy.types, "OBJECT_OT_" + name.split(" ")[0].split(".")[1]):
+            print(f"{name:<36} skipped (add-on is not enabled)")
+            continue
+        # Merged shape key is renamed, which its shape layer only picks up when edit-mode mesh is re-created,
+        # so Edit Mode is entered again (untimed) before every merge, or it couldn't be done in place.
+        setup = (lambda: toggle(obj)) if name.startswith("object.shape_key_merge") else None
+        print(f"{name:<36} {time_case(function, arguments.repeat, setup=setup) * 1000.0:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+"""
+Times add-on operators on synthetic rigs, and compares results with stored baselines.
+Rigs are generated procedurally: grid meshes with random shape keys, keyframed every few frames,
+some of them driven by an animated empty, and a target mesh without shape keys to copy shape keys to.
+
+For every operator the fastest of `--repeat` runs is reported, and peak memory of one more run.
+Peak memory is measured with `tracemalloc`, so it covers Python and NumPy allocations, not Blender's own.
+
+With `--scale`, every operator is run for each value of one rig parameter, and exponent of the growth of time
+between consecutive values is reported (1 is linear, 2 quadratic). Steps above `--max-exponent` are flagged.
+
+Run with:
+    blender --background --factory-startup --python-exit-code 1 --python benchmarks/operators.py -- --vertices 10000 --keys 100
+    blender --background --factory-startup --python benchmarks/operators.py -- --scale keys=25,50,100,200 --operators split duplicate
+Add-on has to be installed and enabled (`--addons bake_shape_keys`, or as an extension).
+Files written by export operators (point caches, shape key streams) go to a temporary directory that is removed at the end.
+Save results with `--save-baseline baseline.json`, and compare later runs with `--baseline baseline.json`.
+When a result is slower (or uses more memory) than the baseline by more than `--tolerance`, exit code is 1.
+Baselines store the Blender version and platform they were measured on, and comparing with a baseline
+from a different environment prints a warning, since timings only compare on the same machine.
+"""
+
+import addon_utils
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import bpy
+import numpy
+
+from bpy_extras.anim_utils import action_ensure_channelbag_for_slot
+
+
+# Rig parameters that can be given on the command line and scaled with `--scale`.
+RIG_PARAMETERS = ("vertices", "keys", "keyframe_step", "drivers", "objects", "frames")
+
+# Module of the add-on that was enabled when the benchmark started (`bl_ext.<repository>.bake_shape_keys` when installed as an extension).
+ADDON = next((name for name in bpy.context.preferences.addons.keys() if name.split(".")[-1] == "bake_shape_keys"), None)
+
+# Directory for files written and read by the cases.
+FILES_DIRECTORY = tempfile.mkdtemp(prefix="bake_shape_keys_benchmark_")
+
+# Key of the baseline entry with the environment results were measured in.
+ENVIRONMENT_KEY = "environment"
+
+
+def parse_arguments():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vertices", type=int, default=10000, help="Approximate number of vertices of each mesh")
+    parser.add_argument("--keys", type=int, default=50, help="Number of shape keys of each mesh (besides basis)")
+    parser.add_argument("--keyframe-step", dest="keyframe_step", type=int, default=5, help="Frames between keyframes of shape keys")
+    parser.add_argument("--drivers", type=int, default=10, help="Number of shape keys of each mesh that are driven instead of keyframed")
+    parser.add_argument("--objects", type=int, default=1, help="Number of meshes with shape keys")
+    parser.add_argument("--frames", type=int, default=100, help="Length of the animation")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of times each operator is run, fastest is reported")
+    parser.add_argument("--operators", nargs="*", default=None,
+                        help="Operators to run (names of cases, e.g. 'split'), all by default")
+    parser.add_argument("--scale", default=None, help="Rig parameter and its values to run operators with, e.g. 'vertices=1000,10000,100000'")
+    parser.add_argument("--max-exponent", dest="max_exponent", type=float, default=1.5,
+                        help="Growth exponent of time above which scaling is flagged")
+    parser.add_argument("--baseline", default=None, help="JSON file with results to compare with")
+    parser.add_argument("--save-baseline", dest="save_baseline", default=None, help="JSON file that results are written to")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Fraction by which results can be worse than baseline")
+    return parser.parse_args(argv)
+
+
+#### ------------------------------ RIG ------------------------------ ####
+
+def reset_file():
+    """Loads empty factory startup file, without resetting preferences, and makes sure the add-on is still enabled"""
+
+    bpy.ops.wm.read_homefile(use_empty=True, use_factory_startup=True)
+    if ADDON is not None and ADDON not in bpy.context.preferences.addons:
+        addon_utils.enable(ADDON, default_set=True)
+
+
+def create_rig(vertices, keys, keyframe_step, drivers, objects, frames):
+    """Creates meshes with random shape keys, keyframed and driven, and a target mesh without shape keys.
+    Returns list of meshes with shape keys, and the target mesh."""
+
+    reset_file()
+    scene = bpy.context.scene
+    scene.frame_start = 1
+    scene.frame_end = frames
+    rng = numpy.random.default_rng(0)
+
+    # Control Empty
+    control = bpy.data.objects.new("Control", None)
+    scene.collection.objects.link(control)
+    control.keyframe_insert("location", index=0, frame=1)
+    control.location[0] = 1.0
+    control.keyframe_insert("location", index=0, frame=frames)
+
+    size = max(int(vertices ** 0.5), 2)
+    rigs = []
+    for index in range(objects):
+        bpy.ops.mesh.primitive_grid_add(x_subdivisions=size, y_subdivisions=size, size=2.0, location=(index * 3.0, 0.0, 0.0))
+        obj = bpy.context.object
+        obj.name = f"Rig_{index:03d}"
+
+        obj.shape_key_add(name="Basis")
+        for i in range(keys):
+            key = obj.shape_key_add(name=f"Key_{i:03d}", from_mix=False)
+            coordinates = numpy.empty(len(key.data) * 3, dtype=numpy.float32)
+            key.data.foreach_get("co", coordinates)
+            coordinates += rng.normal(0.0, 0.01, coordinates.shape).astype(numpy.float32)
+            key.data.foreach_set("co", coordinates)
+
+        shape_keys = obj.data.shape_keys
+        key_blocks = shape_keys.key_blocks
+        driven = min(drivers, keys)
+
+        # Keyframes
+        keyframes = numpy.arange(1, frames + 1, max(keyframe_step, 1), dtype=numpy.float32)
+        for key in key_blocks[1:keys - driven + 1]:
+            key.keyframe_insert("value", frame=1)
+        if keys - driven > 0:
+            anim_data = shape_keys.animation_data
+            channelbag = action_ensure_channelbag_for_slot(anim_data.action, anim_data.action_slot)
+            for fcurve in channelbag.fcurves:
+                co = numpy.column_stack((keyframes, rng.random(len(keyframes), dtype=numpy.float32))).ravel()
+                fcurve.keyframe_points.clear()
+                fcurve.keyframe_points.add(len(keyframes))
+                fcurve.keyframe_points.foreach_set("co", co)
+                fcurve.keyframe_points.foreach_set("handle_left", co)
+                fcurve.keyframe_points.foreach_set("handle_right", co)
+                fcurve.update()
+
+        # Drivers
+        for key in key_blocks[keys - driven + 1:]:
+            driver = key.driver_add("value").driver
+            driver.type = 'AVERAGE'
+            variable = driver.variables.new()
+            variable.type = 'TRANSFORMS'
+            variable.targets[0].id = control
+            variable.targets[0].transform_type = 'LOC_X'
+
+        rigs.append(obj)
+
+    # Target
+    bpy.ops.mesh.primitive_grid_add(x_subdivisions=size, y_subdivisions=size, size=2.0, location=(0.0, 3.0, 0.0))
+    target = bpy.context.object
+    target.name = "Target"
+
+    return rigs, target
+
+
+def set_context(active, selected=(), active_key=1):
+    """Makes the object active with the given shape key, and selects it together with other objects"""
+
+    view_layer = bpy.context.view_layer
+    for obj in view_layer.objects:
+        obj.select_set(False)
+    for obj in (*selected, active):
+        obj.select_set(True)
+    view_layer.objects.active = active
+
+    if active.data.shape_keys is not None:
+        active.active_shape_key_index = min(active_key, len(active.data.shape_keys.key_blocks) - 1)
+
+
+#### ------------------------------ CASES ------------------------------ ####
+
+def action_bake(rigs, target, parameters):
+    set_context(rigs[0], rigs[1:])
+    bpy.ops.object.shape_key_action_bake(frame_start=1, frame_end=parameters["frames"])
+
+
+def keyframe_all(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_keyframe_all()
+
+
+def merge(rigs, target, parameters):
+    set_context(rigs[0], active_key=parameters["keys"] // 2)
+    bpy.ops.object.shape_key_merge(direction='DOWN')
+
+
+def merge_all(rigs, target, parameters):
+    set_context(rigs[0], active_key=1)
+    bpy.ops.object.shape_key_merge_all(direction='DOWN')
+
+
+def split(rigs, target, parameters):
+    set_context(rigs[0])
+    vertices = rigs[0].data.vertices
+    selected = numpy.arange(len(vertices)) < len(vertices) // 2
+    vertices.foreach_set("select", selected)
+    bpy.ops.object.shape_key_split()
+
+
+def duplicate(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_duplicate()
+
+
+def transfer_all(rigs, target, parameters):
+    set_context(target, rigs[:1])
+    bpy.ops.object.shape_key_transfer_all()
+
+
+def objects_from_shape_keys(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.objects_from_shape_keys(frame_start=1, frame_end=parameters["frames"])
+
+
+def clean_up(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_clean_up()
+
+
+def compress(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_compress(method='BAKE', frame_start=1, frame_end=parameters["frames"])
+
+
+def retime(rigs, target, parameters):
+    set_context(rigs[0], rigs[1:])
+    bpy.ops.object.shape_key_retime(mode='SCALE', scale=2.0, pivot=1)
+
+
+def prepare_mirror(rigs, target, parameters):
+    # Quarter of the shape keys are left side shapes, to be mirrored to the right.
+    key_blocks = rigs[0].data.shape_keys.key_blocks
+    for key in key_blocks[1:max(parameters["keys"] // 4, 1) + 1]:
+        key.name += "_L"
+
+
+def mirror(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_mirror_copy(keys='MATCHING')
+
+
+def prepare_combinations(rigs, target, parameters):
+    # Table of random combinations of the first few shape keys.
+    rng = numpy.random.default_rng(0)
+    names = [key.name for key in rigs[0].data.shape_keys.key_blocks[1:9]]
+    rows = [",".join(f"{value:.3f}" for value in rng.random(len(names))) for __ in range(64)]
+    text = bpy.data.texts.new("Combinations")
+    text.from_string("\n".join([",".join(names), *rows]))
+
+
+def combinations(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_bake_combinations(source='TEXT', text="Combinations")
+
+
+def point_cache_bake(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_point_cache_bake(filepath=os.path.join(FILES_DIRECTORY, "cache.pc2"))
+
+
+def prepare_point_cache_load(rigs, target, parameters):
+    point_cache_bake(rigs, target, parameters)
+
+
+def point_cache_load(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_point_cache_load(filepath=os.path.join(FILES_DIRECTORY, "cache.pc2"), relative_path=False)
+
+
+def stream_export(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_stream_export(filepath=os.path.join(FILES_DIRECTORY, "stream.bsks"))
+
+
+def prepare_stream_import(rigs, target, parameters):
+    stream_export(rigs, target, parameters)
+
+
+def stream_import(rigs, target, parameters):
+    set_context(rigs[0])
+    bpy.ops.object.shape_key_stream_import(filepath=os.path.join(FILES_DIRECTORY, "stream.bsks"))
+
+
+# Cases as (name, operator, function that runs it on a fresh rig).
+CASES = [
+    ("action_bake", "shape_key_action_bake", action_bake),
+    ("keyframe_all", "shape_key_keyframe_all", keyframe_all),
+    ("merge", "shape_key_merge", merge),
+    ("merge_all", "shape_key_merge_all", merge_all),
+    ("split", "shape_key_split", split),
+    ("duplicate", "shape_key_duplicate", duplicate),
+    ("transfer_all", "shape_key_transfer_all", transfer_all),
+    ("objects_from_shape_keys", "objects_from_shape_keys", objects_from_shape_keys),
+    ("clean_up", "shape_key_clean_up", clean_up),
+    ("compress", "shape_key_compress", compress),
+    ("retime", "shape_key_retime", retime),
+    ("mirror", "shape_key_mirror_copy", mirror),
+    ("combinations", "shape_key_bake_combinations", combinations),
+    ("point_cache_bake", "shape_key_point_cache_bake", point_cache_bake),
+    ("point_cache_load", "shape_key_point_cache_load", point_cache_load),
+    ("stream_export", "shape_key_stream_export", stream_export),
+    ("stream_import", "shape_key_stream_import", stream_import),
+]
+
+# Functions that prepare the fresh rig for the case (names, texts, files to read), before it's timed.
+SETUPS = {
+    "mirror": prepare_mirror,
+    "combinations": prepare_combinations,
+    "point_cache_load": prepare_point_cache_load,
+    "stream_import": prepare_stream_import,
+}
+
+
+#### ------------------------------ MEASURING ------------------------------ ####
+
+def measure(function, parameters, repeat, setup=None):
+    """Returns fastest time of running the case on a fresh rig `repeat` times, and peak memory of one more run"""
+
+    timings = []
+    for _ in range(repeat):
+        rigs, target = create_rig(**parameters)
+        if setup is not None:
+            setup(rigs, target, parameters)
+        gc.collect()
+        start = time.perf_counter()
+        function(rigs, target, parameters)
+        timings.append(time.perf_counter() - start)
+
+    # Memory is measured on a separate run, because tracing allocations slows Python code down.
+    rigs, target = create_rig(**parameters)
+    if setup is not None:
+        setup(rigs, target, parameters)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(rigs, target, parameters)
+        __, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak
+
+
+def environment():
+    return {"blender": bpy.app.version_string, "platform": platform.platform(), "processor": platform.processor()}
+
+
+def result_key(name, parameters):
+    return name + "@" + ",".join(f"{parameter}={parameters[parameter]}" for parameter in RIG_PARAMETERS)
+
+
+def compare(results, baseline, tolerance):
+    """Prints results that are worse than baseline by more than tolerance, and returns their number"""
+
+    if baseline.get(ENVIRONMENT_KEY, environment()) != environment():
+        print(f"WARNING baseline was measured in a different environment: {baseline[ENVIRONMENT_KEY]}")
+
+    regressions = 0
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+
+        for measure_name, unit, scale in (("time", "ms", 1000.0), ("peak_memory", "MB", 1.0 / (1024 * 1024))):
+            if base[measure_name] > 0 and result[measure_name] > base[measure_name] * (1.0 + tolerance):
+                print(f"REGRESSION {key}: {measure_name} {result[measure_name] * scale:.1f} {unit} "
+                      f"(baseline {base[measure_name] * scale:.1f} {unit})")
+                regressions += 1
+
+    return regressions
+
+
+def print_scaling(parameter, values, results, max_exponent):
+    """Prints time of every case for every value of the parameter, and growth exponent between consecutive values"""
+
+    print(f"\nScaling with {parameter}: " + ", ".join(str(value) for value in values))
+    for name, timings in results.items():
+        steps = []
+        for (value_1, time_1), (value_2, time_2) in zip(zip(values, timings), zip(values[1:], timings[1:])):
+            if value_1 <= 0 or time_1 <= 0 or value_1 == value_2:
+                continue
+            exponent = math.log(time_2 / time_1) / math.log(value_2 / value_1)
+            steps.append(f"{exponent:.2f}" + (" SUPERLINEAR" if exponent > max_exponent else ""))
+
+        print(f"{name:<26} " + " ".join(f"{timing * 1000.0:10.1f}" for timing in timings) + " ms"
+              + ("  | exponents " + ", ".join(steps) if steps else ""))
+
+
+def main():
+    arguments = parse_arguments()
+    base_parameters = {parameter: getattr(arguments, parameter) for parameter in RIG_PARAMETERS}
+
+    # Scaled Parameter
+    scale_parameter, scale_values = None, [None]
+    if arguments.scale:
+        scale_parameter, __, values = arguments.scale.partition("=")
+        if scale_parameter not in RIG_PARAMETERS or not values:
+            print(f"Invalid --scale '{arguments.scale}', expected one of {', '.join(RIG_PARAMETERS)} with values, e.g. 'keys=10,20,40'")
+            sys.exit(2)
+        scale_values = [int(value) for value in values.split(",")]
+
+    cases = []
+    for name, operator, function in CASES:
+        if arguments.operators and name not in arguments.operators and operator not in arguments.operators:
+            continue
+        if not hasattr(bpy.types, "OBJECT_OT_" + operator):
+            print(f"{name:<26} skipped (add-on is not enabled)")
+            continue
+        cases.append((name, function))
+
+    results = {}
+    scaling = {name: [] for name, __ in cases}
+    try:
+        for value in scale_values:
+            parameters = dict(base_parameters)
+            if scale_parameter is not None:
+                parameters[scale_parameter] = value
+
+            print("\nRig: " + ", ".join(f"{parameter} {parameters[parameter]}" for parameter in RIG_PARAMETERS))
+            for name, function in cases:
+                timing, peak = measure(function, parameters, arguments.repeat, setup=SETUPS.get(name))
+                results[result_key(name, parameters)] = {"time": timing, "peak_memory": peak}
+                scaling[name].append(timing)
+                print(f"{name:<26} {timing * 1000.0:10.1f} ms {peak / (1024 * 1024):10.1f} MB")
+    finally:
+        shutil.rmtree(FILES_DIRECTORY, ignore_errors=True)
+
+    if scale_parameter is not None:
+        print_scaling(scale_parameter, scale_values, scaling, arguments.max_exponent)
+
+    # Baselines
+    regressions = 0
+    if arguments.baseline:
+        if os.path.exists(arguments.baseline):
+            with open(arguments.baseline) as file:
+                regressions = compare(results, json.load(file), arguments.tolerance)
+            print(f"\n{regressions} regressions compared to '{arguments.baseline}'")
+        else:
+            print(f"\nBaseline '{arguments.baseline}' doesn't exist")
+
+    if arguments.save_baseline:
+        baseline = {}
+        if os.path.exists(arguments.save_baseline):
+            with open(arguments.save_baseline) as file:
+                baseline = json.load(file)
+            # Results from a different environment aren't kept next to the new ones.
+            if baseline.get(ENVIRONMENT_KEY, environment()) != environment():
+                baseline = {}
+        baseline.update(results)
+        baseline[ENVIRONMENT_KEY] = environment()
+        with open(arguments.save_baseline, "w") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Results saved to '{arguments.save_baseline}'")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 if "bpy" in locals():
     import importlib
-    for mod in [operators,
+    for mod in [preferences,
+                handlers,
+                operators,
                 ui,
                 ]:
         importlib.reload(mod)
@@ -8,6 +10,8 @@ if "bpy" in locals():
 else:
     import bpy
     from . import (
+        preferences,
+        handlers,
         operators,
         ui,
     )
@@ -16,6 +20,8 @@ else:
 ##### ---------------------------------- REGISTERING ---------------------------------- #####
 
 modules = [
+    preferences,
+    handlers,
     operators,
     ui,
 ]
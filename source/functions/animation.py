@@ -1,7 +1,39 @@
 import bpy
+import numpy
+import re
 
 from bpy_extras.anim_utils import action_ensure_channelbag_for_slot
 
+from .drivers import (
+    FCURVE_EXCLUDED_PROPERTIES,
+    DriverIndex,
+    apply_control_points,
+    capture_control_points,
+    capture_driver,
+    create_drivers,
+)
+from .profiling import phase
+
+
+# Data path of a shape key property, with the shape key name and the rest of the path as groups.
+SHAPE_KEY_DATA_PATH = re.compile(r'^key_blocks\["(.*)"\](.*)$')
+
+
+# Keyframe properties that are read and written in bulk, as (identifier, array size, dtype).
+KEYFRAME_ATTRIBUTES = (
+    ("co", 2, numpy.float32),
+    ("handle_left", 2, numpy.float32),
+    ("handle_right", 2, numpy.float32),
+    ("interpolation", 1, numpy.int32),
+    ("easing", 1, numpy.int32),
+    ("handle_left_type", 1, numpy.int32),
+    ("handle_right_type", 1, numpy.int32),
+    ("type", 1, numpy.int32),
+    ("amplitude", 1, numpy.float32),
+    ("back", 1, numpy.float32),
+    ("period", 1, numpy.float32),
+)
+
 
 #### ------------------------------ FUNCTIONS ------------------------------ ####
 
@@ -26,8 +58,93 @@ def ensure_channelbag(data_block):
     return channelbag
 
 
-def transfer_animation(shape_keys, source, *targets):
-    """Transfers animation (f-curve properties, keyframes, f-curve modifiers, and drivers) from one shape key to another"""
+def new_action_for_data_block(data_block, name):
+    """Creates a new action with a slot for the given ID, and returns the action, slot and its (empty) channelbag"""
+
+    action = bpy.data.actions.new(name)
+    slot = action.slots.new(id_type=data_block.id_type, name=data_block.name)
+    channelbag = action_ensure_channelbag_for_slot(action, slot)
+
+    return action, slot, channelbag
+
+
+def ensure_action_channelbag(data_block):
+    """Returns the channelbag of f-curves for the action assigned to the ID.
+    If ID doesn't have an action (or slot), it's created the same way as when keyframing from UI."""
+
+    anim_data = data_block.animation_data
+    if anim_data is None or anim_data.action is None:
+        action, slot, channelbag = new_action_for_data_block(data_block, f"{data_block.name}Action")
+        assign_action(data_block, action, slot)
+        return channelbag
+
+    if anim_data.action_slot is None:
+        anim_data.action_slot = anim_data.action.slots.new(id_type=data_block.id_type, name=data_block.name)
+
+    return action_ensure_channelbag_for_slot(anim_data.action, anim_data.action_slot)
+
+
+def assign_action(data_block, action, slot):
+    """Assigns action and slot to the given ID, keeping previously assigned action from being lost on save"""
+
+    anim_data = data_block.animation_data
+    if anim_data is None:
+        anim_data = data_block.animation_data_create()
+
+    if anim_data.action is not None and anim_data.action != action:
+        anim_data.action.use_fake_user = True
+
+    anim_data.action = action
+    anim_data.action_slot = slot
+
+
+def is_shape_key_animated(shape_keys, shape_key):
+    """Checks if value of the given shape key has an f-curve or a driver"""
+
+    anim_data = shape_keys.animation_data
+    if anim_data is None:
+        return False
+
+    data_path = f'key_blocks["{shape_key.name}"].value'
+    if anim_data.drivers.find(data_path):
+        return True
+
+    channelbag = ensure_channelbag(shape_keys)
+    if channelbag and channelbag.fcurves.find(data_path):
+        return True
+
+    return False
+
+
+def get_keyframed_frames(channelbag, frame_start, frame_end, step=1):
+    """Returns sorted array of unique frames within the frame range (and on step) that have shape key keyframes.
+    Frames are read with single `foreach_get` per f-curve, and filtered with array masks."""
+
+    if channelbag is None:
+        return numpy.empty(0, dtype=numpy.int32)
+
+    frames = [numpy.empty(0, dtype=numpy.int32)]
+    for fcurve in channelbag.fcurves:
+        if not fcurve.data_path.startswith("key_blocks"):
+            continue
+
+        co = numpy.empty(len(fcurve.keyframe_points) * 2, dtype=numpy.float32)
+        fcurve.keyframe_points.foreach_get("co", co)
+        frames.append(numpy.unique(co[0::2].astype(numpy.int32)))
+
+    frames = numpy.unique(numpy.concatenate(frames))
+    in_range = (frames >= frame_start) & (frames <= frame_end) & ((frames - frame_start) % step == 0)
+
+    return frames[in_range]
+
+
+@phase("transfer_animation")
+def transfer_animation(shape_keys, source, *targets, replacements=(), drivers=None):
+    """
+    Transfers animation (f-curve properties, keyframes, f-curve modifiers, and drivers) from one shape key to others.
+    Driver is captured once and recreated on all targets, with (pattern, replacement) `replacements` applied to its
+    variable targets. `drivers` is an optional `DriverIndex` of shape keys, for transferring many shape keys in a row.
+    """
 
     anim_data = shape_keys.animation_data
     if anim_data is None:
@@ -36,54 +153,285 @@ def transfer_animation(shape_keys, source, *targets):
     channelbag = ensure_channelbag(shape_keys)
     if channelbag is not None:
         # Transfer F-Curves
-        for fcurve in channelbag.fcurves:
-            if fcurve.data_path == f'key_blocks["{source.name}"].value':
-                # get_original_fcurve_properties
-                original_fcurve_group = fcurve.group.name if fcurve.group else ""
-                original_fcurve_properties = {prop.identifier: getattr(fcurve, prop.identifier)
-                                                for prop in fcurve.bl_rna.properties if not prop.is_readonly}
-
-                # get_original_keyframes
-                original_keyframes = {}
-                for keyframe in fcurve.keyframe_points:
-                    key_properties = {prop.identifier: getattr(keyframe, prop.identifier) for prop in keyframe.bl_rna.properties if not prop.is_readonly}
-                    original_keyframes[int(keyframe.co[0])] = key_properties
-
-                # get_original_modifiers
-                original_modifiers = {}
-                for mod in fcurve.modifiers:
-                    mod_properties = {prop.identifier: getattr(mod, prop.identifier) for prop in mod.bl_rna.properties if not prop.is_readonly}
-                    original_modifiers[mod.type] = mod_properties
-
-
-                for target in targets:
-                    target_fcurve = channelbag.fcurves.new(f'key_blocks["{target.name}"].value', group_name=original_fcurve_group)
-
-                    # copy_fcurve_properties
-                    for prop, value in original_fcurve_properties.items():
-                        if hasattr(fcurve, prop):
-                            if prop not in ("data_path", "group", "is_valid"):
-                                setattr(target_fcurve, prop, value)
-
-                    # copy_keyframes
-                    for keyframe, properties in original_keyframes.items():
-                        new_key = target_fcurve.keyframe_points.insert(keyframe, properties["co"][1])
-                        for prop, value in properties.items():
-                            if hasattr(new_key, prop):
-                                setattr(new_key, prop, value)
-
-                    # copy_modifiers
-                    for mod, properties in original_modifiers.items():
-                        new_mod = target_fcurve.modifiers.new(mod)
-                        for prop, value in properties.items():
-                            if hasattr(new_mod, prop):
-                                setattr(new_mod, prop, value)
-                break
+        fcurve = channelbag.fcurves.find(f'key_blocks["{source.name}"].value')
+        if fcurve is not None:
+            group_name = fcurve.group.name if fcurve.group else ""
+            for target in targets:
+                target_fcurve = channelbag.fcurves.new(f'key_blocks["{target.name}"].value', group_name=group_name)
+                copy_fcurve(fcurve, target_fcurve)
 
     # Transfer Drivers
+    if drivers is None:
+        drivers = DriverIndex(shape_keys)
+    driver = drivers.get(f'key_blocks["{source.name}"].value')
+    if driver is not None:
+        template = capture_driver(driver)
+        create_drivers(shape_keys, template, [f'key_blocks["{target.name}"].value' for target in targets],
+                       replacements=replacements, drivers=drivers)
+
+
+@phase("copy_shape_key_animation")
+def copy_shape_key_animation(source, target, names, drivers=None):
+    """
+    Copies f-curves and drivers of shape keys from one shape keys ID to another (e.g. of a different object).
+    `names` maps names of source shape keys to names of target shape keys, animation of shape keys that aren't in it
+    is skipped. Driver variables that read the source ID read the target ID instead, with shape key names mapped too.
+    `drivers` is an optional `DriverIndex` of the target. Returns the number of copied f-curves and drivers.
+    """
+
+    anim_data = source.animation_data
+    if anim_data is None:
+        return 0
+
+    copied = 0
+
+    # Copy F-Curves
+    channelbag = ensure_channelbag(source)
+    if channelbag is not None:
+        target_channelbag = None
+        for fcurve in channelbag.fcurves:
+            data_path = _map_shape_key_data_path(fcurve.data_path, names)
+            if data_path is None:
+                continue
+
+            if target_channelbag is None:
+                target_channelbag = ensure_action_channelbag(target)
+            target_fcurve = target_channelbag.fcurves.find(data_path, index=fcurve.array_index)
+            if target_fcurve is None:
+                target_fcurve = target_channelbag.fcurves.new(data_path, index=fcurve.array_index,
+                                                              group_name=fcurve.group.name if fcurve.group else "")
+            copy_fcurve(fcurve, target_fcurve)
+            copied += 1
+
+    # Copy Drivers
+    # Variables that read renamed shape keys of the source are pointed to their names on the target.
+    replacements = [(re.escape(f'key_blocks["{name}"]'), f'key_blocks["{new_name}"]'.replace("\\", "\\\\"))
+                    for name, new_name in names.items() if name != new_name]
+    if drivers is None:
+        drivers = DriverIndex(target)
     for driver in anim_data.drivers:
-        if driver.data_path == f'key_blocks["{source.name}"].value':
-            for target in targets:
-                new_driver = anim_data.drivers.from_existing(src_driver=driver)
-                new_driver.data_path = f'key_blocks["{target.name}"].value'
-            break
+        data_path = _map_shape_key_data_path(driver.data_path, names)
+        if data_path is None:
+            continue
+
+        create_drivers(target, capture_driver(driver), [data_path], replacements=replacements, drivers=drivers,
+                       id_map={source: target})
+        copied += 1
+
+    return copied
+
+
+@phase("copy_fcurve")
+def copy_fcurve(fcurve, target_fcurve):
+    """Copies properties, keyframes, and modifiers of the f-curve to another f-curve, replacing the ones it had.
+    Keyframes are copied in bulk with `foreach_get` and `foreach_set`."""
+
+    for prop in fcurve.bl_rna.properties:
+        if not prop.is_readonly and prop.identifier not in FCURVE_EXCLUDED_PROPERTIES and prop.identifier != "rna_type":
+            setattr(target_fcurve, prop.identifier, getattr(fcurve, prop.identifier))
+
+    # Copy Keyframes
+    keyframes = read_keyframes(fcurve)
+    target_fcurve.keyframe_points.clear()
+    target_fcurve.keyframe_points.add(len(fcurve.keyframe_points))
+    for identifier, array in keyframes.items():
+        target_fcurve.keyframe_points.foreach_set(identifier, array.ravel())
+
+    # Copy Modifiers
+    for modifier in list(target_fcurve.modifiers):
+        target_fcurve.modifiers.remove(modifier)
+    for modifier in fcurve.modifiers:
+        new_modifier = target_fcurve.modifiers.new(modifier.type)
+        for prop in modifier.bl_rna.properties:
+            if not prop.is_readonly and hasattr(new_modifier, prop.identifier):
+                setattr(new_modifier, prop.identifier, getattr(modifier, prop.identifier))
+        apply_control_points(new_modifier, capture_control_points(modifier))
+
+    target_fcurve.update()
+
+
+def _map_shape_key_data_path(data_path, names):
+    """Returns data path with the shape key name mapped through `names`, or None if it's not a path of a mapped shape key"""
+
+    match = SHAPE_KEY_DATA_PATH.match(data_path)
+    if match is None or match.group(1) not in names:
+        return None
+
+    return f'key_blocks["{names[match.group(1)]}"]{match.group(2)}'
+
+
+def ensure_shape_key_fcurve(shape_keys, key_block, frame):
+    """Returns f-curve of the shape key value. If it doesn't exist it's created by inserting a keyframe,
+    so that action, slot, and f-curve are created with the same defaults as when keyframing from UI."""
+
+    data_path = f'key_blocks["{key_block.name}"].value'
+
+    channelbag = ensure_channelbag(shape_keys)
+    fcurve = channelbag.fcurves.find(data_path) if channelbag else None
+    if fcurve is None:
+        with phase("keyframe_insert"):
+            key_block.keyframe_insert("value", frame=frame)
+        channelbag = ensure_channelbag(shape_keys)
+        fcurve = channelbag.fcurves.find(data_path)
+
+    return fcurve
+
+
+def read_keyframes(fcurve):
+    """Returns a dictionary of keyframe property arrays of the given f-curve, read with `foreach_get`"""
+
+    count = len(fcurve.keyframe_points)
+
+    keyframes = {}
+    for identifier, size, dtype in KEYFRAME_ATTRIBUTES:
+        array = numpy.empty(count * size, dtype=dtype)
+        fcurve.keyframe_points.foreach_get(identifier, array)
+        keyframes[identifier] = array.reshape(count, size) if size > 1 else array
+
+    return keyframes
+
+
+@phase("evaluate_fcurve")
+def evaluate_fcurve(fcurve, frames):
+    """
+    Returns float32 array of f-curve values on given (possibly fractional) frames.
+    Constant, linear and bezier segments with constant extrapolation are evaluated with NumPy over keyframe arrays,
+    anything else (modifiers, easing interpolations, linear extrapolation) falls back to `FCurve.evaluate`.
+    """
+
+    frames = numpy.asarray(frames, dtype=numpy.float64)
+    keyframes = read_keyframes(fcurve)
+    count = len(keyframes["co"])
+
+    interpolation_items = bpy.types.Keyframe.bl_rna.properties["interpolation"].enum_items
+    constant = interpolation_items["CONSTANT"].value
+    linear = interpolation_items["LINEAR"].value
+    bezier = interpolation_items["BEZIER"].value
+
+    if (count == 0 or any(not modifier.mute for modifier in fcurve.modifiers) or fcurve.extrapolation != 'CONSTANT' or
+        not numpy.isin(keyframes["interpolation"][:-1], (constant, linear, bezier)).all()):
+        return numpy.fromiter((fcurve.evaluate(frame) for frame in frames), dtype=numpy.float32, count=len(frames))
+
+    co = keyframes["co"].astype(numpy.float64)
+    if count == 1:
+        return numpy.full(len(frames), co[0, 1], dtype=numpy.float32)
+
+    # Segment (pair of keyframes) that each frame falls into.
+    segment = numpy.clip(numpy.searchsorted(co[:, 0], frames, side="right") - 1, 0, count - 2)
+    p0 = co[segment]
+    p3 = co[segment + 1]
+    interpolation = keyframes["interpolation"][segment]
+
+    span = p3[:, 0] - p0[:, 0]
+    span[span == 0.0] = 1.0
+    factor = numpy.clip((frames - p0[:, 0]) / span, 0.0, 1.0)
+    values = numpy.where(interpolation == constant, p0[:, 1], p0[:, 1] + (p3[:, 1] - p0[:, 1]) * factor)
+
+    is_bezier = interpolation == bezier
+    if is_bezier.any():
+        p0, p3 = p0[is_bezier], p3[is_bezier]
+        p1 = keyframes["handle_right"].astype(numpy.float64)[segment[is_bezier]]
+        p2 = keyframes["handle_left"].astype(numpy.float64)[segment[is_bezier] + 1]
+        p1, p2 = _correct_bezier_handles(p0, p1, p2, p3)
+
+        # Find curve parameter of each frame by bisection, x is monotonic after handles are corrected.
+        x = numpy.clip(frames[is_bezier], p0[:, 0], p3[:, 0])
+        low = numpy.zeros(len(x))
+        high = numpy.ones(len(x))
+        for _ in range(32):
+            middle = (low + high) * 0.5
+            below = _bezier(p0[:, 0], p1[:, 0], p2[:, 0], p3[:, 0], middle) < x
+            low = numpy.where(below, middle, low)
+            high = numpy.where(below, high, middle)
+
+        values[is_bezier] = _bezier(p0[:, 1], p1[:, 1], p2[:, 1], p3[:, 1], (low + high) * 0.5)
+
+    # Constant extrapolation.
+    values[frames <= co[0, 0]] = co[0, 1]
+    values[frames >= co[-1, 0]] = co[-1, 1]
+
+    return values.astype(numpy.float32)
+
+
+def _bezier(p0, p1, p2, p3, t):
+    u = 1.0 - t
+    return u * u * u * p0 + 3.0 * u * u * t * p1 + 3.0 * u * t * t * p2 + t * t * t * p3
+
+
+def _correct_bezier_handles(p0, p1, p2, p3):
+    """Shortens handles that reach past the other end of the segment, the same way Blender does before evaluating"""
+
+    length = p3[:, 0] - p0[:, 0]
+    handle_1 = p0 - p1
+    handle_2 = p3 - p2
+    length_1 = numpy.abs(handle_1[:, 0])
+    length_2 = numpy.abs(handle_2[:, 0])
+
+    total = length_1 + length_2
+    too_long = (total > length) & (total > 0.0)
+    factor = numpy.where(too_long, length / numpy.where(total > 0.0, total, 1.0), 1.0)[:, numpy.newaxis]
+
+    return p0 - handle_1 * factor, p3 - handle_2 * factor
+
+
+@phase("write_keyframes")
+def write_keyframes(fcurve, frames, values, interpolation=None, replace=False):
+    """
+    Inserts keyframes with given values on given frames in bulk.
+    Existing keyframes on the same frames are overwritten, the rest are kept with all of their properties,
+    unless `replace` is True, in which case all existing keyframes are removed.
+    """
+
+    frames = numpy.asarray(frames, dtype=numpy.float32)
+    values = numpy.asarray(values, dtype=numpy.float32)
+    keyframe_points = fcurve.keyframe_points
+
+    # get_kept_keyframes
+    kept = None
+    if not replace and len(keyframe_points) > 0:
+        existing = read_keyframes(fcurve)
+        keep_mask = ~numpy.isin(existing["co"][:, 0], frames)
+        kept = {identifier: array[keep_mask] for identifier, array in existing.items()}
+    kept_count = len(kept["co"]) if kept else 0
+
+    # Newly added keyframes carry default properties, which are used for baked keyframes.
+    keyframe_points.clear()
+    keyframe_points.add(kept_count + len(frames))
+    keyframes = read_keyframes(fcurve)
+
+    if kept_count:
+        for identifier, array in kept.items():
+            keyframes[identifier][:kept_count] = array
+
+    keyframes["co"][kept_count:, 0] = frames
+    keyframes["co"][kept_count:, 1] = values
+    keyframes["handle_left"][kept_count:] = keyframes["co"][kept_count:]
+    keyframes["handle_right"][kept_count:] = keyframes["co"][kept_count:]
+    if interpolation is not None:
+        keyframes["interpolation"][kept_count:] = bpy.types.Keyframe.bl_rna.properties["interpolation"].enum_items[interpolation].value
+
+    # Sort keyframes chronologically.
+    order = numpy.argsort(keyframes["co"][:, 0], kind="stable")
+    for identifier, array in keyframes.items():
+        keyframe_points.foreach_set(identifier, array[order].ravel())
+
+    fcurve.update()
+
+
+def set_keyframe_interpolation(fcurve, interpolation, frame_start, frame_end):
+    """Sets interpolation of all keyframes of the f-curve within the frame range in bulk"""
+
+    keyframe_points = fcurve.keyframe_points
+    if len(keyframe_points) == 0:
+        return
+
+    co = numpy.empty(len(keyframe_points) * 2, dtype=numpy.float32)
+    interpolations = numpy.empty(len(keyframe_points), dtype=numpy.int32)
+    keyframe_points.foreach_get("co", co)
+    keyframe_points.foreach_get("interpolation", interpolations)
+
+    frames = co[0::2]
+    in_range = (frames >= frame_start) & (frames <= frame_end)
+    interpolations[in_range] = bpy.types.Keyframe.bl_rna.properties["interpolation"].enum_items[interpolation].value
+    keyframe_points.foreach_set("interpolation", interpolations)
+    fcurve.update()
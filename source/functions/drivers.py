@@ -0,0 +1,239 @@
+import bpy
+import re
+
+from collections import namedtuple
+
+from .profiling import phase
+
+
+# Driver f-curve captured as plain Python data, so that it can be recreated on any number of f-curves
+# without reading it from Blender again. Properties are stored as {identifier: value} dictionaries.
+DriverTemplate = namedtuple("DriverTemplate", ["fcurve", "driver", "variables", "keyframes", "modifiers"])
+
+# F-curve properties that identify the f-curve, and aren't copied.
+FCURVE_EXCLUDED_PROPERTIES = {"data_path", "array_index", "group", "is_valid"}
+
+# Collections of `bpy.data` by ID type, used to find retargeted IDs by name.
+ID_COLLECTIONS = {
+    'ACTION': "actions",
+    'ARMATURE': "armatures",
+    'CAMERA': "cameras",
+    'CURVE': "curves",
+    'KEY': "shape_keys",
+    'LATTICE': "lattices",
+    'LIGHT': "lights",
+    'MATERIAL': "materials",
+    'MESH': "meshes",
+    'NODETREE': "node_groups",
+    'OBJECT': "objects",
+    'SCENE': "scenes",
+    'TEXTURE': "textures",
+    'WORLD': "worlds",
+}
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+class DriverIndex:
+    """
+    Drivers of the ID by data path and array index, so that they're found without iterating over all of them.
+    While index is in use, drivers should be added and removed through it, so that it stays in sync.
+    """
+
+    def __init__(self, data_block):
+        self.data_block = data_block
+
+        anim_data = data_block.animation_data
+        self._drivers = {(fcurve.data_path, fcurve.array_index): fcurve
+                         for fcurve in anim_data.drivers} if anim_data else {}
+
+    def __len__(self):
+        return len(self._drivers)
+
+    def get(self, data_path, index=0):
+        return self._drivers.get((data_path, index))
+
+    def ensure(self, data_path, index=0):
+        """Returns driver f-curve of the data path, which is created if it doesn't exist"""
+
+        fcurve = self._drivers.get((data_path, index))
+        if fcurve is None:
+            anim_data = self.data_block.animation_data or self.data_block.animation_data_create()
+            fcurve = self._drivers[(data_path, index)] = anim_data.drivers.new(data_path, index=index)
+
+        return fcurve
+
+    def remove(self, data_path, index=0):
+        """Removes driver of the data path if it exists"""
+
+        fcurve = self._drivers.pop((data_path, index), None)
+        if fcurve is not None:
+            self.data_block.animation_data.drivers.remove(fcurve)
+
+    def rename(self, old_data_path, new_data_path):
+        """Updates the index after data path of drivers was changed (e.g. by renaming a shape key)"""
+
+        for (data_path, index) in [key for key in self._drivers if key[0] == old_data_path]:
+            self._drivers[(new_data_path, index)] = self._drivers.pop((data_path, index))
+
+
+@phase("capture_driver")
+def capture_driver(fcurve):
+    """Returns `DriverTemplate` with properties, variables, targets, keyframes, and modifiers of the driver f-curve"""
+
+    driver = fcurve.driver
+
+    variables = []
+    for variable in driver.variables:
+        targets = [_rna_properties(target) for target in variable.targets]
+        variables.append((_rna_properties(variable), targets))
+
+    keyframes = [_rna_properties(keyframe) for keyframe in fcurve.keyframe_points]
+    modifiers = [(modifier.type, _rna_properties(modifier), capture_control_points(modifier)) for modifier in fcurve.modifiers]
+
+    return DriverTemplate(fcurve=_rna_properties(fcurve, exclude=FCURVE_EXCLUDED_PROPERTIES),
+                          driver=_rna_properties(driver, exclude={"is_valid"}),
+                          variables=variables,
+                          keyframes=keyframes,
+                          modifiers=modifiers)
+
+
+def capture_control_points(modifier):
+    """Returns list of (frame, min, max) of control points of the Envelope f-curve modifier, empty for other modifiers.
+    They're a read-only collection, so they aren't included in modifier properties."""
+
+    if modifier.type != 'ENVELOPE':
+        return []
+    return [(point.frame, point.min, point.max) for point in modifier.control_points]
+
+
+def apply_control_points(modifier, control_points):
+    """Adds (frame, min, max) control points to the Envelope f-curve modifier"""
+
+    for frame, minimum, maximum in control_points:
+        point = modifier.control_points.add(frame)
+        point.min = minimum
+        point.max = maximum
+
+
+def validate_replacement(pattern, replacement):
+    """Raises `re.error` if the pattern is invalid, or if the replacement refers to groups that pattern doesn't have.
+    Replacement is only checked when it's used, so it's tried on an empty string."""
+
+    if pattern:
+        re.compile(pattern).sub(replacement, "")
+
+
+def compile_replacements(replacements):
+    """Returns list of (compiled regular expression, replacement) pairs from (pattern, replacement) pairs, skipping empty patterns"""
+
+    return [(re.compile(pattern), replacement) for pattern, replacement in replacements if pattern]
+
+
+def apply_driver(fcurve, template, replacements=(), id_map=None):
+    """
+    Sets up driver f-curve from the template, replacing its previous driver setup.
+    `replacements` are compiled (pattern, replacement) pairs that are applied to IDs, bones and data paths of
+    variable targets, e.g. to point driver of a mirrored shape key to the bone on the other side.
+    `id_map` is an optional {ID: ID} dictionary of variable target IDs that are swapped before replacements,
+    e.g. to point variables that read the source shape keys to the target ones when copying between objects.
+    """
+
+    _set_properties(fcurve, template.fcurve)
+
+    # Variables
+    driver = fcurve.driver
+    while driver.variables:
+        driver.variables.remove(driver.variables[0])
+
+    for variable_properties, targets in template.variables:
+        variable = driver.variables.new()
+        _set_properties(variable, variable_properties)
+
+        for target, target_properties in zip(variable.targets, targets):
+            # ID type has to be set before the ID, and can only be set for single property variables.
+            if variable.type == 'SINGLE_PROP':
+                target.id_type = target_properties["id_type"]
+
+            for identifier, value in target_properties.items():
+                if identifier == "id_type":
+                    continue
+                if identifier == "id" and id_map:
+                    value = id_map.get(value, value)
+                if replacements and value:
+                    if identifier in ("data_path", "bone_target"):
+                        value = _retarget_name(value, replacements)
+                    elif identifier == "id":
+                        value = _retarget_id(value, replacements)
+                if hasattr(target, identifier):
+                    setattr(target, identifier, value)
+
+    _set_properties(driver, template.driver)
+
+    # Keyframes
+    keyframe_points = fcurve.keyframe_points
+    keyframe_points.clear()
+    if template.keyframes:
+        keyframe_points.add(len(template.keyframes))
+        for keyframe, properties in zip(keyframe_points, template.keyframes):
+            _set_properties(keyframe, properties)
+
+    # Modifiers
+    for modifier in list(fcurve.modifiers):
+        fcurve.modifiers.remove(modifier)
+    for modifier_type, properties, control_points in template.modifiers:
+        modifier = fcurve.modifiers.new(modifier_type)
+        _set_properties(modifier, properties)
+        apply_control_points(modifier, control_points)
+
+    fcurve.update()
+
+
+@phase("create_drivers")
+def create_drivers(data_block, template, data_paths, replacements=(), drivers=None, id_map=None):
+    """
+    Creates drivers from the template on all given data paths of the ID, and returns their f-curves.
+    Existing drivers on the data paths are set up again. `drivers` is an optional `DriverIndex` of the ID.
+    """
+
+    if drivers is None:
+        drivers = DriverIndex(data_block)
+    replacements = compile_replacements(replacements)
+
+    fcurves = []
+    for data_path in data_paths:
+        fcurve = drivers.ensure(data_path)
+        apply_driver(fcurve, template, replacements, id_map)
+        fcurves.append(fcurve)
+
+    return fcurves
+
+
+def _rna_properties(struct, exclude=()):
+    return {prop.identifier: getattr(struct, prop.identifier) for prop in struct.bl_rna.properties
+            if not prop.is_readonly and prop.identifier not in exclude and prop.identifier != "rna_type"}
+
+
+def _set_properties(struct, properties):
+    for identifier, value in properties.items():
+        if hasattr(struct, identifier):
+            setattr(struct, identifier, value)
+
+
+def _retarget_name(name, replacements):
+    for pattern, replacement in replacements:
+        name = pattern.sub(replacement, name)
+    return name
+
+
+def _retarget_id(data_block, replacements):
+    """Returns ID of the same type with the retargeted name, or the given ID if there isn't one"""
+
+    name = _retarget_name(data_block.name, replacements)
+    if name == data_block.name:
+        return data_block
+
+    collection = getattr(bpy.data, ID_COLLECTIONS.get(data_block.id_type, ""), None)
+    retargeted = collection.get(name) if collection is not None else None
+
+    return retargeted if retargeted is not None else data_block
@@ -0,0 +1,170 @@
+import hashlib
+import numpy
+
+from .animation import (
+    ensure_channelbag,
+    read_keyframes,
+)
+
+
+# Name of the custom property on shape keys data-block where snapshot of the previous bake is stored.
+SNAPSHOT_PROPERTY = "bake_shape_keys_snapshot"
+DIGEST_SIZE = 8
+
+# Properties of f-curves and modifiers that only affect the interface, not evaluated values.
+INTERFACE_PROPERTIES = {"select", "hide", "lock", "color", "color_mode", "show_expanded", "active", "is_valid"}
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+def get_frame_windows(frames, window_size):
+    """Returns (windows x 2) array of first and last frame of every window of `window_size` consecutive frames"""
+
+    starts = frames[::window_size]
+    ends = frames[numpy.minimum(numpy.arange(len(starts)) * window_size + window_size - 1, len(frames) - 1)]
+
+    return numpy.stack((starts, ends), axis=1)
+
+
+def get_input_digests(shape_keys, names, frames, window_size):
+    """
+    Returns a dictionary of shape key names and lists of digests (one per window of frames) of everything
+    that determines their values: keyframes of the value f-curve, and drivers with animation of their targets.
+    Only keyframes that can affect a window (keyframes inside it, and the closest ones on both sides) are hashed,
+    so that editing a keyframe only changes digests of windows around it.
+    """
+
+    windows = get_frame_windows(numpy.asarray(frames), window_size)
+
+    channelbag = ensure_channelbag(shape_keys)
+    anim_data = shape_keys.animation_data
+
+    # Animation of driver targets is shared between drivers, so it's hashed once.
+    target_digests = {}
+
+    digests = {}
+    for name in names:
+        data_path = f'key_blocks["{name}"].value'
+        parts = []
+
+        fcurve = channelbag.fcurves.find(data_path) if channelbag else None
+        if fcurve is not None:
+            parts.append(_fcurve_window_digests(fcurve, windows))
+
+        driver = anim_data.drivers.find(data_path) if anim_data else None
+        if driver is not None:
+            parts.append([_driver_digest(driver)] * len(windows))
+
+            for variable in driver.driver.variables:
+                for target in variable.targets:
+                    if target.id is None:
+                        continue
+                    if target.id not in target_digests:
+                        target_digests[target.id] = _animation_window_digests(target.id, windows)
+                    parts.append(target_digests[target.id])
+
+        digests[name] = [hashlib.blake2b(b"".join(window_parts), digest_size=DIGEST_SIZE).digest()
+                         for window_parts in zip(*parts)] if parts else [b""] * len(windows)
+
+    return digests
+
+
+def get_dirty_frames(shape_keys, names, frames, window_size):
+    """
+    Compares current inputs of shape keys with the snapshot stored by the previous bake.
+    Returns a dictionary of shape key names and arrays of frames that need to be re-baked.
+    When there is no snapshot, or it was made for different frames, all frames are returned for every shape key.
+    """
+
+    frames = numpy.asarray(frames)
+    snapshot = shape_keys.get(SNAPSHOT_PROPERTY)
+    if snapshot is None or snapshot.get("frames") != _frames_digest(frames, window_size):
+        return {name: frames for name in names}
+
+    stored = snapshot.get("keys", {})
+    current = get_input_digests(shape_keys, names, frames, window_size)
+
+    dirty_frames = {}
+    for name, window_digests in current.items():
+        stored_digests = bytes.fromhex(stored.get(name, ""))
+        dirty = numpy.array([stored_digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] != digest
+                             for i, digest in enumerate(window_digests)], dtype=bool)
+        dirty_frames[name] = frames[numpy.repeat(dirty, window_size)[:len(frames)]]
+
+    return dirty_frames
+
+
+def store_snapshot(shape_keys, names, frames, window_size):
+    """Stores digests of current inputs of shape keys, to compare with on the next incremental bake"""
+
+    frames = numpy.asarray(frames)
+    digests = get_input_digests(shape_keys, names, frames, window_size)
+
+    shape_keys[SNAPSHOT_PROPERTY] = {
+        "frames": _frames_digest(frames, window_size),
+        "keys": {name: b"".join(window_digests).hex() for name, window_digests in digests.items()},
+    }
+
+
+def _frames_digest(frames, window_size):
+    data = numpy.ascontiguousarray(frames, dtype=numpy.int32).tobytes() + window_size.to_bytes(4, "little")
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def _rna_digest(data):
+    """Returns repr of all editable RNA properties of given struct"""
+
+    return repr([(prop.identifier, getattr(data, prop.identifier))
+                 for prop in data.bl_rna.properties
+                 if not prop.is_readonly and prop.type != 'POINTER' and prop.identifier not in INTERFACE_PROPERTIES])
+
+
+def _fcurve_window_digests(fcurve, windows):
+    """Returns list of digests of keyframes that affect each window, and f-curve settings that affect all of them"""
+
+    header = (_rna_digest(fcurve) + "".join(_rna_digest(modifier) for modifier in fcurve.modifiers)).encode()
+
+    keyframes = read_keyframes(fcurve)
+    keyframe_frames = keyframes["co"][:, 0]
+    count = len(keyframe_frames)
+    if count == 0:
+        return [header] * len(windows)
+
+    # One row of bytes per keyframe.
+    rows = numpy.concatenate([numpy.ascontiguousarray(array).view(numpy.uint8).reshape(count, -1)
+                              for array in keyframes.values()], axis=1)
+
+    first = numpy.clip(numpy.searchsorted(keyframe_frames, windows[:, 0], side="left") - 1, 0, count)
+    last = numpy.clip(numpy.searchsorted(keyframe_frames, windows[:, 1], side="right") + 1, 0, count)
+
+    return [header + rows[start:end].tobytes() for start, end in zip(first, last)]
+
+
+def _driver_digest(fcurve):
+    """Returns digest of the driver setup: expression, variables and their targets, and driver f-curve"""
+
+    driver = fcurve.driver
+    parts = [driver.type, driver.expression, driver.use_self]
+    for variable in driver.variables:
+        parts += [variable.name, variable.type]
+        for target in variable.targets:
+            parts += [target.id_type, target.id.name if target.id else "", target.data_path, target.bone_target,
+                      target.transform_type, target.transform_space, target.rotation_mode]
+
+    # Driver f-curve maps driver value instead of time, so all of its keyframes are hashed as one window.
+    everything = numpy.array([[-numpy.inf, numpy.inf]])
+    return repr(parts).encode() + _fcurve_window_digests(fcurve, everything)[0]
+
+
+def _animation_window_digests(data_block, windows):
+    """Returns list of digests of all animation of given data-block that affects each window"""
+
+    channelbag = ensure_channelbag(data_block) if getattr(data_block, "animation_data", None) else None
+    if channelbag is None:
+        return [b""] * len(windows)
+
+    fcurve_digests = [_fcurve_window_digests(fcurve, windows) for fcurve in channelbag.fcurves]
+    if not fcurve_digests:
+        return [b""] * len(windows)
+
+    return [hashlib.blake2b(b"".join(window_parts), digest_size=DIGEST_SIZE).digest() for window_parts in zip(*fcurve_digests)]
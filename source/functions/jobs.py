@@ -0,0 +1,115 @@
+import bpy
+import time
+import traceback
+
+from .profiling import resumed_profile, stop_profile
+
+
+#### ------------------------------ CLASSES ------------------------------ ####
+
+class ChunkedJob:
+    """
+    Runs a generator of work in time-sliced chunks.
+    Generator should do one unit of work (usually one frame) between yields, and yield the number of shape keys it processed.
+    Generator that waits on work done elsewhere can yield None, which gives time back without counting as progress.
+    """
+
+    def __init__(self, label, steps, total):
+        self.label = label
+        self.steps = steps
+        self.total = total
+
+        self.done = 0
+        self.keys = 0
+        self.finished = False
+        self._start_time = time.perf_counter()
+
+    def run(self, time_budget=None):
+        """Advances the job until it runs out of `time_budget` (in seconds), or until it's finished if budget is None.
+        Returns True when the job is finished."""
+
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        for keys in self.steps:
+            if keys is not None:
+                self.done += 1
+                self.keys += keys
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+
+        self.finished = True
+        return True
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start_time
+
+    def status(self):
+        """Returns a string with progress and throughput of the job"""
+
+        elapsed = max(self.elapsed, 1e-6)
+        return (f"{self.label}: {self.done}/{self.total} frames "
+                f"({self.done / elapsed:.1f} frames/s, {self.keys / elapsed:.0f} keys/s)")
+
+
+class ModalJob:
+    """
+    Mixin for operators that run a `ChunkedJob`. Job is processed on a timer in slices, with progress shown
+    in the status bar and cursor, and can be cancelled with Esc. When there is no window (i.e. in background mode),
+    or when the operator is repeated from redo panel, the same job is run to completion in one go.
+    Operators implement `finish_job(context, cancelled)`, which is called in both cases and returns the operator result.
+    If a step raises an error, job is finished as cancelled (so that what was done is kept consistent) and the error is reported.
+    """
+
+    time_slice = 0.05
+
+    def start_job(self, context, job):
+        self._job = job
+
+        if bpy.app.background or context.window is None or self.options.is_repeat:
+            try:
+                job.run()
+            except Exception:
+                self.finish_job(context, cancelled=True)
+                raise
+            return self.finish_job(context, cancelled=False)
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.001, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, max(job.total, 1))
+
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            return self._end_job(context, cancelled=True)
+
+        if event.type == 'TIMER':
+            try:
+                with resumed_profile(self):
+                    finished = self._job.run(self.time_slice)
+            except Exception as error:
+                traceback.print_exc()
+                self._end_job(context, cancelled=True)
+                self.report({'ERROR'}, f"{self._job.label} stopped by an error: {error}")
+                return {'CANCELLED'}
+
+            context.window_manager.progress_update(self._job.done)
+            context.workspace.status_text_set(self._job.status() + "  |  Esc to cancel")
+
+            if finished:
+                return self._end_job(context, cancelled=False)
+
+        return {'RUNNING_MODAL'}
+
+    def _end_job(self, context, cancelled):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+        try:
+            with resumed_profile(self):
+                return self.finish_job(context, cancelled=cancelled)
+        finally:
+            stop_profile(self, context)
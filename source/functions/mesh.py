@@ -1,6 +1,28 @@
 import bpy
+import bmesh
+import hashlib
+import numpy
+
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from itertools import chain
 
 from .animation import ensure_channelbag
+from .profiling import count, phase
+from ..preferences import get_preferences
+
+
+# Topology of a part of the mesh, with vertex, edge, and loop indices remapped to the part.
+MeshRegion = namedtuple("MeshRegion", ["indices", "edges", "loop_vertices", "loop_starts", "material_indices", "smooth"])
+
+# Shape key values are rounded to this step before they're used as keys of the mix cache.
+MIX_CACHE_QUANTIZATION = 1e-6
+
+# `ShapeKeyMix` objects and mixed positions, keyed by shape keys pointer and what the mix depends on, in order of use,
+# as (object, size in bytes) pairs. Size is limited in preferences. Entries of shape keys are invalidated when add-on
+# functions change them, and by depsgraph update and undo handlers (see `handlers.py`) when anything else does.
+_mix_cache = OrderedDict()
+_mix_cache_size = 0
 
 
 #### ------------------------------ FUNCTIONS ------------------------------ ####
@@ -20,10 +42,14 @@ def store_active_shape_key(obj):
     """Returns active shape key and dictionary of its properties"""
 
     shape_key = obj.active_shape_key
-    properties = {prop.identifier: getattr(shape_key, prop.identifier)
-                  for prop in shape_key.bl_rna.properties if not prop.is_readonly}
+    return shape_key, get_shape_key_properties(shape_key)
+
 
-    return shape_key, properties
+def get_shape_key_properties(shape_key):
+    """Returns dictionary of editable properties of the given shape key"""
+
+    return {prop.identifier: getattr(shape_key, prop.identifier)
+            for prop in shape_key.bl_rna.properties if not prop.is_readonly}
 
 
 def set_shape_key_values(shape_key, properties: dict, name=None):
@@ -37,55 +63,650 @@ def set_shape_key_values(shape_key, properties: dict, name=None):
                 setattr(shape_key, prop, value)
 
 
-def set_active_shape_key(obj, shape_key):
-    """Sets active shape key index to the index of the key with the given name"""
+class KeyBlockIndex:
+    """
+    Map of shape key names to their indices, built once per operation, so that shape keys are found by name
+    without searching through key blocks. While index is in use, shape keys should be added, removed, renamed,
+    and moved through it, so that it stays in sync.
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+
+        shape_keys = obj.data.shape_keys
+        self._names = [key.name for key in shape_keys.key_blocks] if shape_keys else []
+        self._indices = {name: i for i, name in enumerate(self._names)}
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._indices
+
+    def index(self, name):
+        """Returns index of the shape key with the given name, or -1 if there isn't one"""
+
+        return self._indices.get(name, -1)
+
+    def get(self, name):
+        """Returns shape key with the given name, or None if there isn't one"""
+
+        index = self._indices.get(name)
+        return self.obj.data.shape_keys.key_blocks[index] if index is not None else None
+
+    def add(self, name="Key", from_mix=False):
+        """Adds a new shape key at the end. Name is made unique by Blender if it's already taken"""
+
+        with phase("shape_key_add"):
+            shape_key = self.obj.shape_key_add(name=name, from_mix=from_mix)
+
+        self._indices[shape_key.name] = len(self._names)
+        self._names.append(shape_key.name)
+        return shape_key
+
+    def remove(self, shape_key, drivers=None):
+        """Removes the shape key with its animation (see `remove_shape_key`)"""
+
+        name = shape_key.name
+        remove_shape_key(self.obj, shape_key, drivers=drivers)
+
+        index = self._indices.pop(name)
+        del self._names[index]
+        for i in range(index, len(self._names)):
+            self._indices[self._names[i]] = i
+
+    def remove_many(self, shape_keys, drivers=None):
+        """Removes shape keys with their animation (see `remove_shape_key`), updating the index once for all of them"""
+
+        shape_keys = {shape_key.name: shape_key for shape_key in shape_keys}
+        for shape_key in shape_keys.values():
+            remove_shape_key(self.obj, shape_key, drivers=drivers)
+
+        self._names = [name for name in self._names if name not in shape_keys]
+        self._indices = {name: i for i, name in enumerate(self._names)}
+
+    def rename(self, shape_key, name):
+        """Renames the shape key, and returns the name it got (Blender makes it unique)"""
+
+        old_name = shape_key.name
+        shape_key.name = name
+
+        index = self._indices.pop(old_name)
+        self._names[index] = shape_key.name
+        self._indices[shape_key.name] = index
+        return shape_key.name
+
+    def move(self, shape_key, index):
+        """Moves the shape key to the index (see `move_shape_key`)"""
+
+        name = shape_key.name
+        move_shape_key(self.obj, shape_key, index, keys=self)
+
+        current = self._indices[name]
+        self._names.insert(index, self._names.pop(current))
+        for i in range(min(current, index), max(current, index) + 1):
+            self._indices[self._names[i]] = i
+
+    def set_active(self, shape_key):
+        """Makes the shape key active (see `set_active_shape_key`)"""
+
+        set_active_shape_key(self.obj, shape_key, keys=self)
+
+
+def set_active_shape_key(obj, shape_key, keys=None):
+    """Sets active shape key index to the index of the key with the given name.
+    `keys` is an optional `KeyBlockIndex` of the object, used to find the index."""
+
+    # In Edit Mode changing active shape key re-creates the edit-mode mesh, so index is only set when it changes.
+    index = keys.index(shape_key.name) if keys is not None else obj.data.shape_keys.key_blocks.find(shape_key.name)
+    if obj.active_shape_key_index != index:
+        obj.active_shape_key_index = index
+
+
+def get_shape_key_coordinates(shape_key):
+    """Returns flat float32 array of vertex positions of the given shape key"""
+
+    coordinates = numpy.empty(len(shape_key.data) * 3, dtype=numpy.float32)
+    shape_key.data.foreach_get("co", coordinates)
+
+    return coordinates
+
+
+def set_shape_key_coordinates(shape_key, coordinates):
+    """Sets vertex positions of the given shape key from flat array"""
+
+    shape_key.data.foreach_set("co", numpy.asarray(coordinates, dtype=numpy.float32))
+    invalidate_mix_cache(shape_key.id_data)
+
+
+def get_shape_key_delta(shape_key):
+    """Returns flat float32 array of offsets of vertex positions of the given shape key from its relative key"""
+
+    return get_shape_key_coordinates(shape_key) - get_shape_key_coordinates(shape_key.relative_key)
+
+
+def get_mesh_coordinates(mesh):
+    """Returns flat float32 array of vertex positions of the given mesh"""
+
+    coordinates = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", coordinates)
+
+    return coordinates
+
+
+def get_vertex_group_weights(obj, vertex_group, indices=None):
+    """Returns float32 array of weights of given vertices (all by default) in a vertex group, 0 for vertices not in it.
+    Returns None if the object doesn't have the vertex group (e.g. shape key still has the name of a removed one)."""
+
+    group = obj.vertex_groups.get(vertex_group)
+    if group is None:
+        return None
+
+    group_index = group.index
+    vertices = obj.data.vertices
+    elements = vertices if indices is None else (vertices[int(index)] for index in indices)
+
+    # NOTE: Vertex groups can't be read with `foreach_get`, so this is slow on dense meshes.
+    # Pass only the vertices that are needed, and reuse weights of the same group.
+    weights = numpy.zeros(len(vertices) if indices is None else len(indices), dtype=numpy.float32)
+    for i, vertex in enumerate(elements):
+        for element in vertex.groups:
+            if element.group == group_index:
+                weights[i] = element.weight
+                break
+
+    return weights
+
+
+def get_mesh_region(mesh, indices):
+    """Returns `MeshRegion` of given vertices, with edges and faces whose vertices are all inside the region"""
+
+    vertex_count = len(mesh.vertices)
+    inside = numpy.zeros(vertex_count, dtype=bool)
+    inside[indices] = True
+    remap = numpy.cumsum(inside, dtype=numpy.int32) - 1
+
+    edges = numpy.empty(len(mesh.edges) * 2, dtype=numpy.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    edges = edges.reshape(-1, 2)
+    edges = remap[edges[inside[edges].all(axis=1)]]
+
+    loop_vertices = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    loop_starts = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get("loop_total", loop_totals)
+    material_indices = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get("material_index", material_indices)
+    smooth = numpy.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", smooth)
+
+    if len(loop_starts):
+        faces_inside = numpy.logical_and.reduceat(inside[loop_vertices], loop_starts)
+    else:
+        faces_inside = numpy.zeros(0, dtype=bool)
+
+    region_loop_totals = loop_totals[faces_inside]
+    region_loop_starts = numpy.concatenate(([0], numpy.cumsum(region_loop_totals)[:-1])).astype(numpy.int32)
+    region_loop_vertices = remap[loop_vertices[numpy.repeat(faces_inside, loop_totals)]]
+
+    return MeshRegion(numpy.asarray(indices), edges, region_loop_vertices, region_loop_starts[:len(region_loop_totals)],
+                      material_indices[faces_inside], smooth[faces_inside])
+
+
+def new_mesh_from_region(name, region, coordinates, materials=()):
+    """Creates a new mesh with topology of the given `MeshRegion` and given vertex positions"""
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(region.indices))
+    mesh.vertices.foreach_set("co", numpy.asarray(coordinates, dtype=numpy.float32).ravel())
+
+    mesh.edges.add(len(region.edges))
+    mesh.edges.foreach_set("vertices", region.edges.ravel())
+
+    mesh.loops.add(len(region.loop_vertices))
+    mesh.loops.foreach_set("vertex_index", region.loop_vertices)
+    mesh.polygons.add(len(region.loop_starts))
+    mesh.polygons.foreach_set("loop_start", region.loop_starts)
+
+    for material in materials:
+        mesh.materials.append(material)
+    mesh.polygons.foreach_set("material_index", region.material_indices)
+    mesh.polygons.foreach_set("use_smooth", region.smooth)
+
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+class ShapeKeyMix:
+    """
+    Computes mix of relative shape keys with NumPy, the way Blender does (offset from relative key,
+    multiplied by value and vertex group weight), for all or only a subset of vertices.
+    Deltas of all shape keys are kept in memory, so for dense meshes it should only be used with a subset
+    of vertices, or of shape keys (`keys`, indices of key blocks that can have non-zero values).
+    """
+
+    def __init__(self, obj, indices=None, keys=None):
+        shape_keys = obj.data.shape_keys
+        key_blocks = shape_keys.key_blocks
+        reference_key = shape_keys.reference_key
+
+        if indices is None:
+            indices = numpy.arange(len(reference_key.data))
+        self.indices = numpy.asarray(indices)
+
+        self.basis = get_shape_key_coordinates(reference_key).reshape(-1, 3)[self.indices].ravel()
+        self.keys = None if keys is None else numpy.asarray(keys, dtype=numpy.int64)
+        keys = range(len(key_blocks)) if self.keys is None else self.keys
+
+        self.deltas = numpy.zeros((len(keys), len(self.basis)), dtype=numpy.float32)
+        weights = {}
+        for i, key_index in enumerate(keys):
+            key = key_blocks[int(key_index)]
+            if key == reference_key:
+                continue
+
+            delta = get_shape_key_delta(key).reshape(-1, 3)[self.indices]
+            if key.vertex_group:
+                # Shape keys often share vertex groups (e.g. all '_L' shape keys), so weights of each are read once.
+                if key.vertex_group not in weights:
+                    weights[key.vertex_group] = get_vertex_group_weights(obj, key.vertex_group, self.indices)
+                # Like in Blender, vertex group that doesn't exist doesn't mask the shape key.
+                if weights[key.vertex_group] is not None:
+                    delta *= weights[key.vertex_group][:, numpy.newaxis]
+            self.deltas[i] = delta.ravel()
+
+        self._values = numpy.empty(len(key_blocks), dtype=numpy.float32)
+        self._mute = numpy.empty(len(key_blocks), dtype=bool)
+
+        self.slider_min = numpy.empty(len(key_blocks), dtype=numpy.float32)
+        self.slider_max = numpy.empty(len(key_blocks), dtype=numpy.float32)
+        key_blocks.foreach_get("slider_min", self.slider_min)
+        key_blocks.foreach_get("slider_max", self.slider_max)
+
+    def read_values(self, shape_keys):
+        """Returns array of current shape key values, with muted shape keys set to 0"""
+
+        shape_keys.key_blocks.foreach_get("value", self._values)
+        shape_keys.key_blocks.foreach_get("mute", self._mute)
 
-    obj.active_shape_key_index = obj.data.shape_keys.key_blocks.keys().index(shape_key.name)
+        values = self._values.copy()
+        values[self._mute] = 0.0
+        return values
 
+    def clamp(self, values):
+        """Returns shape key values (single array or table with a row for each mix) clamped to slider ranges"""
 
-def duplicate_shape_key(obj):
-    """Duplicates active shape key by soloing it and adding new shape key from the mix"""
+        return numpy.clip(values, self.slider_min, self.slider_max)
 
-    obj.show_only_shape_key = True
-    dupe_shape_key = obj.shape_key_add(from_mix=True)
-    obj.show_only_shape_key = False
+    def evaluate(self, values):
+        """Returns flat array of vertex positions for given shape key values.
+        Values can also be a table with a row for each mix, in which case a row of positions is returned for each."""
 
-    return dupe_shape_key
+        if self.keys is not None:
+            values = values[..., self.keys]
+        return self.basis + values @ self.deltas
 
 
-def remove_shape_key(obj, shape_key):
-    """Removes given shape key from object and deletes it's animation data"""
+def mix_cache_limit():
+    """Returns maximum size of the mix cache in bytes"""
+
+    return get_preferences().mix_cache_size * 1024 * 1024
+
+
+def get_shape_key_mix(obj, indices=None):
+    """Returns `ShapeKeyMix` of the object for all or only a subset of vertices, which is reused while shape keys don't change."""
+
+    shape_keys = obj.data.shape_keys
+    key = (shape_keys.as_pointer(), _region_digest(indices), len(shape_keys.key_blocks))
+
+    mix = _mix_cache_get(key)
+    if mix is None:
+        with phase("read_deltas"):
+            mix = ShapeKeyMix(obj, indices)
+        _mix_cache_store(key, mix, mix.deltas.nbytes + mix.basis.nbytes)
+
+    return mix
+
+
+def get_cached_mix(obj, values=None, indices=None, mix=None):
+    """
+    Returns flat array of vertex positions of the mix of shape keys for given values (current values by default),
+    for all or only a subset of vertices. Mixes are memoized by quantized values, so repeated values cost nothing.
+    `mix` is `ShapeKeyMix` of the same vertices, if caller already has one.
+    NOTE: Returned array is shared with the cache, and can't be changed.
+    """
+
+    shape_keys = obj.data.shape_keys
+    if mix is None:
+        mix = get_shape_key_mix(obj, indices)
+    if values is None:
+        values = mix.read_values(shape_keys)
+
+    key = (shape_keys.as_pointer(), _region_digest(indices), len(shape_keys.key_blocks), quantize_values(values))
+
+    coordinates = _mix_cache_get(key)
+    if coordinates is None:
+        count("mix_cache_misses")
+        with phase("mix"):
+            coordinates = mix.evaluate(values)
+        coordinates.flags.writeable = False
+        _mix_cache_store(key, coordinates, coordinates.nbytes)
+    else:
+        count("mix_cache_hits")
+
+    return coordinates
+
+
+def quantize_values(values):
+    """Returns shape key values rounded to `MIX_CACHE_QUANTIZATION` as bytes, so that they can be used as a dictionary key"""
+
+    return numpy.round(numpy.asarray(values, dtype=numpy.float64) / MIX_CACHE_QUANTIZATION).astype(numpy.int64).tobytes()
+
+
+def invalidate_mix_cache(shape_keys=None):
+    """Removes cached mixes of the given shape keys (`Key` ID), or of all shape keys if none is given."""
+
+    global _mix_cache_size
+
+    if shape_keys is None:
+        _mix_cache.clear()
+        _mix_cache_size = 0
+        return
+
+    pointer = shape_keys.as_pointer()
+    for key in [key for key in _mix_cache if key[0] == pointer]:
+        _mix_cache_size -= _mix_cache.pop(key)[1]
+
+
+def _region_digest(indices):
+    if indices is None:
+        return None
+    return hashlib.blake2b(numpy.ascontiguousarray(indices, dtype=numpy.int64), digest_size=8).digest()
+
+
+def _mix_cache_get(key):
+    entry = _mix_cache.get(key)
+    if entry is None:
+        return None
+
+    _mix_cache.move_to_end(key)
+    return entry[0]
+
+
+def _mix_cache_store(key, value, size):
+    global _mix_cache_size
+
+    limit = mix_cache_limit()
+    if size > limit:
+        return
+
+    _mix_cache[key] = (value, size)
+    _mix_cache_size += size
+
+    # Evict least recently used entries.
+    while _mix_cache_size > limit:
+        __, (__, evicted_size) = _mix_cache.popitem(last=False)
+        _mix_cache_size -= evicted_size
+
+
+def hash_coordinates(coordinates):
+    """Returns digest of vertex positions array. Doesn't access Blender data, so it can be run on a thread pool."""
+
+    # Adding zero turns negative zeros into positive, so that equal positions always have equal hashes.
+    coordinates = numpy.ascontiguousarray(coordinates, dtype=numpy.float32) + numpy.float32(0.0)
+    return hashlib.blake2b(coordinates, digest_size=16).digest()
+
+
+def copy_shape_key_data(source, target):
+    """Copies point data (positions, and handles, tilt and radius of curve points) from one shape key to another"""
+
+    if len(source.data) == 0:
+        return
+
+    for prop in source.data[0].bl_rna.properties:
+        if prop.is_readonly or prop.type != 'FLOAT':
+            continue
+
+        array = numpy.empty(len(source.data) * max(prop.array_length, 1), dtype=numpy.float32)
+        source.data.foreach_get(prop.identifier, array)
+        target.data.foreach_set(prop.identifier, array)
+
+    invalidate_mix_cache(target.id_data)
+
+
+def apply_mix_to_shape_key(obj, shape_key):
+    """Replaces positions of given shape key with the current mix of all shape keys"""
+
+    with phase("shape_key_add"):
+        mix = obj.shape_key_add(name="__mix__", from_mix=True)
+    copy_shape_key_data(mix, shape_key)
+    obj.shape_key_remove(mix)
+
+
+@contextmanager
+def editable_shape_keys(obj, object_mode=False):
+    """
+    Lets shape keys of an object in Edit Mode be changed through data API, with one conversion of the edit-mode mesh each way.
+    By default edit-mode mesh is written to mesh data before the changes, and loaded back from it afterwards.
+    With `object_mode`, and for curves and lattices (which can't be re-loaded that way), Object Mode is entered instead
+    for the whole block, and Edit Mode is entered again afterwards.
+
+    NOTE: Shape keys can't be added through BMesh shape layers alone, because key blocks are only created when
+    edit-mode mesh is written back, so one conversion each way can't be avoided. Operators that only change positions
+    (and remove shape keys without changing active shape key index) should use `EditShapeLayers` instead.
+    Operators that move shape keys (`shape_key_move` only works in Object Mode) or change the active shape key
+    (which in Edit Mode writes edit-mode mesh and re-creates it) should use `object_mode`, and do it inside.
+    Without it, active shape key must not be changed inside, because that writes edit-mode mesh (which is not
+    updated yet) over the changes.
+    """
+
+    if obj.mode != 'EDIT':
+        yield
+        return
+
+    # Edit Mode is restored even if the body raises, so that it doesn't show data from before the changes already made.
+    if object_mode or obj.type != 'MESH':
+        with phase("mode_set"):
+            bpy.ops.object.mode_set(mode='OBJECT')
+        try:
+            yield
+        finally:
+            with phase("mode_set"):
+                bpy.ops.object.mode_set(mode='EDIT')
+        return
+
+    with phase("update_from_editmode"):
+        obj.update_from_editmode()
+    try:
+        yield
+    finally:
+        with phase("load_edit_mesh"):
+            bm = bmesh.from_edit_mesh(obj.data)
+            bm.clear()
+            bm.from_mesh(obj.data, use_shape_key=True, shape_key_index=obj.active_shape_key_index)
+            bmesh.update_edit_mesh(obj.data)
+
+
+class EditShapeLayers:
+    """
+    Positions of shape keys of a mesh in Edit Mode, read and written through BMesh shape layers, so that edit-mode mesh
+    isn't converted. Active shape key is read from vertex positions (what Edit Mode shows), and shape keys relative to it
+    get the offset Blender adds to them when it leaves Edit Mode. Shape keys can be removed, but not added or moved,
+    and active shape key index must not change (edit-mode mesh remembers which key block it writes positions to).
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.bm = bmesh.from_edit_mesh(obj.data)
+        self.active = obj.active_shape_key
+        self._layers = self.bm.verts.layers.shape
+        self._offset = None
+
+    @staticmethod
+    def available(obj, shape_keys):
+        """Returns True if the object is a mesh in Edit Mode, and given shape keys, their relative keys,
+        and the active shape key have shape layers (ones added or renamed since entering Edit Mode don't)"""
+
+        if obj.mode != 'EDIT' or obj.type != 'MESH' or not obj.data.shape_keys.use_relative:
+            return False
+
+        layers = bmesh.from_edit_mesh(obj.data).verts.layers.shape
+        needed = {obj.active_shape_key.name}
+        for shape_key in shape_keys:
+            needed.update((shape_key.name, shape_key.relative_key.name))
+        return all(name in layers for name in needed)
+
+    def _read(self, layer=None):
+        verts = self.bm.verts
+        values = chain.from_iterable(vert.co if layer is None else vert[layer] for vert in verts)
+        return numpy.fromiter(values, dtype=numpy.float32, count=len(verts) * 3)
+
+    def _write(self, layer, coordinates):
+        for vert, co in zip(self.bm.verts, coordinates.reshape(-1, 3).tolist()):
+            vert[layer] = co
+
+    def _active_offset(self):
+        # Difference between positions and active shape layer, which Blender adds to shape keys relative to the active one.
+        if self._offset is None:
+            self._offset = self._read() - self._read(self._layers[self.active.name])
+        return self._offset
+
+    @phase("read_shape_layer")
+    def get_coordinates(self, shape_key):
+        """Returns flat float32 array of positions that the shape key will have when Edit Mode is left"""
+
+        if shape_key == self.active:
+            return self._read()
+
+        coordinates = self._read(self._layers[shape_key.name])
+        if shape_key.relative_key == self.active:
+            coordinates += self._active_offset()
+        return coordinates
+
+    @phase("write_shape_layer")
+    def set_coordinates(self, shape_key, coordinates):
+        """Replaces positions of the shape key. Call `update` after all changes."""
+
+        if shape_key != self.active:
+            self._write(self._layers[shape_key.name], coordinates)
+            return
+
+        # Positions and active layer become equal, so pending offset is added to shape keys relative to the active one first.
+        layer = self._layers[self.active.name]
+        offset = self._active_offset()
+        if offset.any():
+            for key in self.obj.data.shape_keys.key_blocks:
+                if key != self.active and key.relative_key == self.active:
+                    self._write(self._layers[key.name], self._read(self._layers[key.name]) + offset)
+
+        for vert, co in zip(self.bm.verts, coordinates.reshape(-1, 3).tolist()):
+            vert.co = co
+            vert[layer] = co
+        self._offset = None
+
+    def get_vertex_group_weights(self, vertex_group):
+        """Returns float32 array of weights of vertices in the vertex group, or None if it doesn't mask anything"""
+
+        group = self.obj.vertex_groups.get(vertex_group)
+        deform = self.bm.verts.layers.deform.active
+        if group is None or deform is None:
+            return None
+
+        group_index = group.index
+        return numpy.fromiter((vert[deform].get(group_index, 0.0) for vert in self.bm.verts),
+                              dtype=numpy.float32, count=len(self.bm.verts))
+
+    def mix(self, shape_keys):
+        """Returns flat float32 array of positions of the mix of given shape keys (with their current values)
+        on top of the reference key, the way Blender mixes them"""
+
+        reference_key = self.obj.data.shape_keys.reference_key
+        coordinates = self.get_coordinates(reference_key)
+        for shape_key in shape_keys:
+            if shape_key == reference_key or shape_key.mute or shape_key.value == 0.0:
+                continue
+
+            delta = self.get_coordinates(shape_key) - self.get_coordinates(shape_key.relative_key)
+            weights = self.get_vertex_group_weights(shape_key.vertex_group) if shape_key.vertex_group else None
+            if weights is not None:
+                delta *= numpy.repeat(weights, 3)
+            coordinates += shape_key.value * delta
+
+        return coordinates
+
+    def remove(self, shape_key):
+        """Removes shape layer of the shape key. Shape key itself has to be removed through data API as well."""
+
+        layer = self._layers.get(shape_key.name)
+        if layer is not None:
+            self._layers.remove(layer)
+
+    def update(self):
+        """Updates edit-mode mesh after changes"""
+
+        bmesh.update_edit_mesh(self.obj.data)
+        invalidate_mix_cache(self.obj.data.shape_keys)
+
+
+@phase("remove_shape_key")
+def remove_shape_key(obj, shape_key, drivers=None):
+    """Removes given shape key from object and deletes it's animation data.
+    `drivers` is an optional `DriverIndex` of shape keys, for removing many shape keys in a row."""
+
+    data_path = f'key_blocks["{shape_key.name}"].value'
 
     # Remove f-curve and/or driver.
     channelbag = ensure_channelbag(obj.data.shape_keys)
     if channelbag:
-        for fcurve in channelbag.fcurves:
-            if fcurve.data_path == f'key_blocks["{shape_key.name}"].value':
-                channelbag.fcurves.remove(fcurve)
-                break
+        fcurve = channelbag.fcurves.find(data_path)
+        if fcurve is not None:
+            channelbag.fcurves.remove(fcurve)
 
-    if obj.data.shape_keys.animation_data:
+    if drivers is not None:
+        drivers.remove(data_path)
+    elif obj.data.shape_keys.animation_data:
         anim_data = obj.data.shape_keys.animation_data
-        for driver in anim_data.drivers:
-            if driver.data_path == f'key_blocks["{shape_key.name}"].value':
-                anim_data.drivers.remove(driver)
-                break
+        driver = anim_data.drivers.find(data_path)
+        if driver is not None:
+            anim_data.drivers.remove(driver)
 
     # Remove the shape key.
+    invalidate_mix_cache(obj.data.shape_keys)
     obj.shape_key_remove(shape_key)
 
 
-def reposition_shape_key(obj, shape_keys, active_index, *keys, mode=None, offset=2):
-    """Moves up given keys to be below active shape key"""
+@phase("move_shape_key")
+def move_shape_key(obj, shape_key, index, keys=None):
+    """
+    Moves given shape key to the index, with as few calls of `shape_key_move` operator as possible.
+    `keys` is an optional `KeyBlockIndex` of the object, used to find the current index (use `KeyBlockIndex.move` to keep it in sync).
+    NOTE: Order of shape keys can't be changed through data API, so this is the only nested operator
+    that shape key operators call. It only works in Object Mode, so it should be called inside
+    `editable_shape_keys(obj, object_mode=True)`, otherwise Edit Mode is left just for moving.
+    """
+
+    key_blocks = obj.data.shape_keys.key_blocks
+    current = keys.index(shape_key.name) if keys is not None else key_blocks.find(shape_key.name)
+    if current == index:
+        return
+
+    # Moving to the top puts shape key right below the basis (relative shape keys), or above it (absolute).
+    top = 1 if obj.data.shape_keys.use_relative else 0
+    bottom = len(key_blocks) - 1
 
-    if mode == 'EDIT':
-        bpy.ops.object.mode_set(mode='OBJECT')
+    # Pick between moving step by step and jumping to the end first, whichever takes fewer calls.
+    if index < current:
+        moves = [('UP', current - index)] if current - index <= 1 + index - top else [('TOP', 1), ('DOWN', index - top)]
+    else:
+        moves = [('DOWN', index - current)] if index - current <= 1 + bottom - index else [('BOTTOM', 1), ('UP', bottom - index)]
 
-    new_index = (len(shape_keys.key_blocks) - active_index) - offset
-    for key in keys:
-        set_active_shape_key(obj, key)
-        for _ in range(new_index):
-            bpy.ops.object.shape_key_move(type='UP')
+    invalidate_mix_cache(obj.data.shape_keys)
 
-    if mode == 'EDIT':
-        bpy.ops.object.mode_set(mode=mode)
+    with editable_shape_keys(obj, object_mode=True):
+        obj.active_shape_key_index = current
+        for move_type, repeat in moves:
+            for _ in range(repeat):
+                with phase("shape_key_move"):
+                    bpy.ops.object.shape_key_move(type=move_type)
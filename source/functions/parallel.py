@@ -0,0 +1,42 @@
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Shared thread pool, created on first use.
+_executor = None
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+def get_executor():
+    """Returns add-ons thread pool, with one worker per CPU core"""
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bake_shape_keys")
+
+    return _executor
+
+
+def parallel_map(function, *iterables):
+    """
+    Calls function for every set of items from iterables on a thread pool, and returns list of results in order.
+    NOTE: Function must only work on arrays and never access Blender data, because RNA is not thread-safe.
+    Work should consist of NumPy operations (or hashing) that release the GIL, otherwise threads won't help.
+    """
+
+    items = list(zip(*iterables))
+    if len(items) <= 1:
+        return [function(*item) for item in items]
+
+    return list(get_executor().map(function, *zip(*items)))
+
+
+def shutdown_executor():
+    """Shuts down the thread pool, waiting for running tasks to finish"""
+
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,207 @@
+import numpy
+import os
+import struct
+import zlib
+
+
+# Point cache (.pc2) is the format that Mesh Cache modifier reads: header, and float32 positions of every point
+# for every sample, one sample after the other.
+#
+#     Header          magic, version, point count, start frame, sample rate, sample count
+#     Samples         float32 x, y, z of every point
+#
+# Compressed point cache (.pc2z) stores the same samples for transfer. Every sample is XOR-ed with the bits of the
+# previous sample (so points that didn't move become zeros, and decoding is exact) and compressed with zlib.
+#
+#     Header          magic, version, flags (reserved), point count, start frame, sample rate, sample count
+#     Offsets         uint64 byte offset of every record in the file, and one past the last record
+#     Records         zlib-compressed XOR deltas of every sample
+#
+# All numbers are little-endian.
+
+PC2_MAGIC = b"POINTCACHE2\0"
+PC2_HEADER = struct.Struct("<12siiffi")
+
+PC2Z_MAGIC = b"PC2Z"
+PC2Z_VERSION = 1
+PC2Z_HEADER = struct.Struct("<4sHHiffi")
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+class PointCacheWriter:
+    """Writes vertex positions sample by sample into a memory-mapped point cache file, preallocated for all samples.
+    Pages are flushed to disk as they're written, so memory doesn't grow with the number of samples."""
+
+    def __init__(self, filepath, point_count, sample_count, start_frame=1.0, sample_rate=1.0, flush_interval=64):
+        self.filepath = filepath
+        self.point_count = point_count
+        self.sample_count = sample_count
+        self.flush_interval = flush_interval
+
+        header = PC2_HEADER.pack(PC2_MAGIC, 1, point_count, start_frame, sample_rate, sample_count)
+        with open(filepath, "wb") as file:
+            file.write(header)
+            file.truncate(PC2_HEADER.size + sample_count * point_count * 12)
+
+        try:
+            self._samples = numpy.memmap(filepath, dtype="<f4", mode="r+", offset=PC2_HEADER.size,
+                                         shape=(sample_count, point_count * 3))
+        except (OSError, ValueError):
+            os.remove(filepath)
+            raise
+        self._index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        self.close()
+
+    def write(self, coordinates):
+        """Writes flat array of positions of all points as the next sample"""
+
+        self._samples[self._index] = coordinates
+        self._index += 1
+
+        if self._index % self.flush_interval == 0:
+            self._samples.flush()
+
+    def close(self):
+        if self._samples is None:
+            return
+
+        self._samples.flush()
+        self._samples = None
+
+    def abort(self):
+        """Closes and deletes the file, so that a cache with fewer samples than its header claims isn't left behind"""
+
+        # Memory map is released before the file is deleted, which some platforms don't allow while it's mapped.
+        self._samples = None
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+class CompressedPointCacheWriter:
+    """Writes vertex positions sample by sample into a compressed point cache file, as XOR deltas against the previous sample."""
+
+    def __init__(self, filepath, point_count, sample_count, start_frame=1.0, sample_rate=1.0, level=6):
+        self.filepath = filepath
+        self.point_count = point_count
+        self.sample_count = sample_count
+        self.level = level
+
+        self._file = open(filepath, "wb")
+        self._file.write(PC2Z_HEADER.pack(PC2Z_MAGIC, PC2Z_VERSION, 0, point_count, start_frame, sample_rate, sample_count))
+        self._offsets = numpy.zeros(sample_count + 1, dtype="<u8")
+        self._file.write(self._offsets.tobytes())
+
+        self._previous = numpy.zeros(point_count * 3, dtype=numpy.uint32)
+        self._index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        self.close()
+
+    def write(self, coordinates):
+        """Writes flat array of positions of all points as the next sample"""
+
+        current = numpy.ascontiguousarray(coordinates, dtype="<f4").view(numpy.uint32)
+        self._offsets[self._index] = self._file.tell()
+        self._file.write(zlib.compress(numpy.bitwise_xor(current, self._previous).tobytes(), self.level))
+
+        self._previous[:] = current
+        self._index += 1
+
+    def close(self):
+        if self._file is None:
+            return
+
+        self._offsets[self._index:] = self._file.tell()
+        self._file.seek(PC2Z_HEADER.size)
+        self._file.write(self._offsets.tobytes())
+        self._file.close()
+        self._file = None
+
+    def abort(self):
+        """Closes and deletes the file, so that a cache with fewer samples than its header claims isn't left behind"""
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+def read_compressed_point_cache(filepath):
+    """Reads header of a compressed point cache file, and returns `(point count, start frame, sample rate, sample count, samples)`,
+    where samples is a generator that yields flat float32 positions of every sample (one buffer, reused between samples)."""
+
+    file = open(filepath, "rb")
+    header = file.read(PC2Z_HEADER.size)
+    if len(header) < PC2Z_HEADER.size:
+        file.close()
+        raise ValueError("File is not a compressed point cache")
+
+    magic, version, __, point_count, start_frame, sample_rate, sample_count = PC2Z_HEADER.unpack(header)
+    if magic != PC2Z_MAGIC:
+        file.close()
+        raise ValueError("File is not a compressed point cache")
+    if version > PC2Z_VERSION:
+        file.close()
+        raise ValueError(f"Unsupported compressed point cache version ({version})")
+
+    offsets = numpy.frombuffer(file.read((sample_count + 1) * 8), dtype="<u8")
+    if len(offsets) < sample_count + 1:
+        file.close()
+        raise ValueError("Compressed point cache is incomplete")
+
+    def samples():
+        with file:
+            current = numpy.zeros(point_count * 3, dtype=numpy.uint32)
+            for index, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+                file.seek(int(start))
+                # Records of samples that were never written (e.g. bake was interrupted) are empty.
+                try:
+                    delta = zlib.decompress(file.read(int(end - start)))
+                except zlib.error:
+                    raise ValueError(f"Compressed point cache is incomplete or damaged (sample {index})")
+                if len(delta) != point_count * 12:
+                    raise ValueError(f"Compressed point cache is damaged (sample {index})")
+                current ^= numpy.frombuffer(delta, dtype=numpy.uint32)
+                yield current.view("<f4")
+
+    return point_count, start_frame, sample_rate, sample_count, samples()
+
+
+def decompress_point_cache(source, target):
+    """Writes compressed point cache as a regular point cache that Mesh Cache modifier can read, one sample at a time"""
+
+    point_count, start_frame, sample_rate, sample_count, samples = read_compressed_point_cache(source)
+    with PointCacheWriter(target, point_count, sample_count, start_frame=start_frame, sample_rate=sample_rate) as writer:
+        for coordinates in samples:
+            writer.write(coordinates)
+
+    return point_count, start_frame, sample_rate, sample_count
+
+
+def read_point_cache_header(filepath):
+    """Returns `(point count, start frame, sample rate, sample count)` from the header of a point cache file"""
+
+    with open(filepath, "rb") as file:
+        header = file.read(PC2_HEADER.size)
+    if len(header) < PC2_HEADER.size:
+        raise ValueError("File is not a point cache")
+
+    magic, __, point_count, start_frame, sample_rate, sample_count = PC2_HEADER.unpack(header)
+    if magic != PC2_MAGIC:
+        raise ValueError("File is not a point cache")
+
+    return point_count, start_frame, sample_rate, sample_count
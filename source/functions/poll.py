@@ -1,21 +1,60 @@
-import bpy
+from collections import namedtuple
+
+
+ShapeKeySummary = namedtuple("ShapeKeySummary", ["key_count", "animated", "driver_count"])
+EMPTY_SUMMARY = ShapeKeySummary(0, False, 0)
+
+# Summaries of objects shape keys, keyed by object pointer, as (validation key, summary) pairs.
+# Validation key changes when mesh, shape keys, or their animation data are replaced, or key blocks are added or removed
+# (also through data API, before the depsgraph is updated), so that polls are never stale. Driver count isn't part of it,
+# it's refreshed by depsgraph update and undo handlers (see `handlers.py`).
+_summaries = {}
 
 
 #### ------------------------------ FUNCTIONS ------------------------------ ####
 
-def has_shape_keys(obj, check_animated=False):
-    """Check if a given object and has at least one shape key (besides basis)."""
+def shape_key_summary(obj):
+    """Returns summary of objects shape keys (number of key blocks, whether they're animated, and number of drivers)."""
 
-    if obj.type not in ('MESH'):
-        return False
+    if obj is None or obj.type != 'MESH':
+        return EMPTY_SUMMARY
 
-    if not obj.data.shape_keys:
-        return False
+    shape_keys = obj.data.shape_keys
+    if not shape_keys:
+        return EMPTY_SUMMARY
+
+    key_count = len(shape_keys.key_blocks)
+    anim_data = shape_keys.animation_data
+    validation = (shape_keys.as_pointer(), key_count, anim_data.as_pointer() if anim_data else 0)
+
+    pointer = obj.as_pointer()
+    entry = _summaries.get(pointer)
+    if entry is None or entry[0] != validation:
+        summary = ShapeKeySummary(key_count=key_count,
+                                  animated=anim_data is not None,
+                                  driver_count=len(anim_data.drivers) if anim_data else 0)
+        entry = _summaries[pointer] = (validation, summary)
+
+    return entry[1]
+
+
+def invalidate_shape_key_summary(obj=None):
+    """Removes cached summary of the given object, or of all objects if none is given."""
+
+    if obj is None:
+        _summaries.clear()
+    else:
+        _summaries.pop(obj.as_pointer(), None)
+
+
+def has_shape_keys(obj, check_animated=False):
+    """Check if a given object and has at least one shape key (besides basis)."""
 
-    if len(obj.data.shape_keys.key_blocks) < 2:
+    summary = shape_key_summary(obj)
+    if summary.key_count < 2:
         return False
 
-    if check_animated and not obj.data.shape_keys.animation_data:
+    if check_animated and not summary.animated:
         return False
 
     return True
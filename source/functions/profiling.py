@@ -0,0 +1,193 @@
+import bpy
+import cProfile
+import functools
+import json
+import os
+import time
+
+from contextlib import contextmanager
+
+from ..preferences import get_preferences
+
+
+# Profile of the operator whose code is currently running, None when profiling is disabled.
+# Profile itself is kept on the operator, and modal operators only make it active while their job runs (see `ModalJob`),
+# so that phases of other operators that run in the meantime aren't recorded in it.
+_active = None
+
+
+#### ------------------------------ CLASSES ------------------------------ ####
+
+class Profile:
+    """Wall time and call count of every phase, and counters of processed data, for a single operator run"""
+
+    def __init__(self, operator):
+        self.operator = operator
+        self.phases = {}
+        self.counts = {}
+        self.properties = {}
+        self.cprofile = None
+        self.timestamp = time.time()
+        self._start_time = time.perf_counter()
+        self.total = 0.0
+
+    def add(self, phase, duration):
+        time_spent, calls = self.phases.get(phase, (0.0, 0))
+        self.phases[phase] = (time_spent + duration, calls + 1)
+
+    def count(self, name, amount):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def stop(self):
+        self.total = time.perf_counter() - self._start_time
+
+    def summary(self):
+        """Returns a one-line summary, with phases sorted by time spent in them"""
+
+        phases = sorted(self.phases.items(), key=lambda item: item[1][0], reverse=True)
+        text = f"{self.operator}: {self.total:.3f} s"
+        if phases:
+            text += " | " + ", ".join(f"{phase} {time_spent:.3f} s ({calls}x)" for phase, (time_spent, calls) in phases)
+        if self.counts:
+            text += " | " + ", ".join(f"{name} {amount}" for name, amount in self.counts.items())
+
+        return text
+
+    def as_dict(self):
+        return {
+            "operator": self.operator,
+            "timestamp": self.timestamp,
+            "blender_version": bpy.app.version_string,
+            "total": self.total,
+            "phases": {phase: {"time": time_spent, "calls": calls} for phase, (time_spent, calls) in self.phases.items()},
+            "counts": self.counts,
+        }
+
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+@contextmanager
+def phase(name):
+    """Records wall time of the enclosed block in the active profile. Does nothing when profiling is disabled."""
+
+    if _active is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _active.add(name, time.perf_counter() - start)
+
+
+def count(name, amount=1):
+    """Adds to the counter of processed data (objects, keys, vertices...) of the active profile."""
+
+    if _active is not None:
+        _active.count(name, amount)
+
+
+def start_profile(operator, context):
+    """Starts profiling the operator run if profiling is enabled in preferences. Nested operator runs are not profiled separately."""
+
+    global _active
+    if _active is not None:
+        return
+
+    prefs = get_preferences(context)
+    if not prefs.enable_profiling:
+        return
+
+    _active = operator._profile = Profile(operator.bl_idname)
+    _active.properties = {prop.identifier: getattr(operator, prop.identifier)
+                          for prop in operator.bl_rna.properties if not prop.is_readonly}
+    if prefs.use_cprofile:
+        _active.cprofile = cProfile.Profile()
+        _active.cprofile.enable()
+
+
+def stop_profile(operator, context):
+    """Stops profiling the operator run, reports the summary, and appends the profile to the log."""
+
+    global _active
+    profile = getattr(operator, "_profile", None)
+    if profile is None:
+        return
+
+    operator._profile = None
+    if _active is profile:
+        _active = None
+
+    profile.stop()
+    if profile.cprofile is not None:
+        profile.cprofile.disable()
+
+    directory = _log_directory(context)
+    log = profile.as_dict()
+    log["properties"] = profile.properties
+    with open(os.path.join(directory, "profile_log.jsonl"), "a", encoding="utf-8") as file:
+        file.write(json.dumps(log, default=str) + "\n")
+
+    if profile.cprofile is not None:
+        filename = f"{profile.operator}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(profile.timestamp))}.prof"
+        profile.cprofile.dump_stats(os.path.join(directory, filename))
+
+    operator.report({'INFO'}, profile.summary())
+
+
+@contextmanager
+def resumed_profile(operator):
+    """Makes the profile of a running modal operator active for the enclosed block (see `ModalJob`)."""
+
+    global _active
+    profile = getattr(operator, "_profile", None)
+    if profile is None or _active is not None:
+        yield
+        return
+
+    _active = profile
+    try:
+        yield
+    finally:
+        _active = None
+
+
+def suspend_profile(operator):
+    """Deactivates the profile of a modal operator until its job runs again, without stopping it."""
+
+    global _active
+    if _active is not None and _active is getattr(operator, "_profile", None):
+        _active = None
+
+
+def profiled(execute):
+    """Decorator for operators `execute` method, which profiles the run when profiling is enabled in preferences.
+    For modal operators profiling is stopped by `ModalJob` when the job is finished."""
+
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        start_profile(self, context)
+        try:
+            result = execute(self, context)
+        except Exception:
+            stop_profile(self, context)
+            raise
+
+        if 'RUNNING_MODAL' in result:
+            suspend_profile(self)
+        else:
+            stop_profile(self, context)
+        return result
+
+    return wrapper
+
+
+def _log_directory(context):
+    directory = bpy.path.abspath(get_preferences(context).log_directory)
+    if not directory:
+        directory = bpy.utils.extension_path_user(__package__.rpartition(".")[0], path="profiles", create=True)
+
+    os.makedirs(directory, exist_ok=True)
+    return directory
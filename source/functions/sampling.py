@@ -0,0 +1,52 @@
+import bpy
+import numpy
+
+from .profiling import phase
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+def frame_range(frame_start, frame_end, step=1):
+    """Returns an array of frames between start and end frame (inclusive) with the given step"""
+
+    return numpy.arange(frame_start, frame_end + 1, step, dtype=numpy.int32)
+
+
+def sample_shape_key_values(scene, objects, frames, chunk_size=64, positions=False):
+    """
+    Steps through given frames and yields shape key values of given objects in chunks.
+    Yields tuples of `(frames, values, coordinates)` where `values` is a list of (frames x keys) arrays,
+    and `coordinates` a list of (frames x vertices * 3) arrays of evaluated vertex positions (or None).
+    Arrays are preallocated once and reused between chunks, so memory stays the same no matter how long
+    the frame range is, but consumer has to write out or copy the data before requesting the next chunk.
+    """
+
+    chunk_size = max(1, min(chunk_size, len(frames)))
+
+    values = [numpy.empty((chunk_size, len(obj.data.shape_keys.key_blocks)), dtype=numpy.float32) for obj in objects]
+    coordinates = None
+    if positions:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        coordinates = [numpy.empty((chunk_size, len(obj.evaluated_get(depsgraph).data.vertices) * 3), dtype=numpy.float32)
+                       for obj in objects]
+
+    for chunk_start in range(0, len(frames), chunk_size):
+        chunk = frames[chunk_start:chunk_start + chunk_size]
+
+        for i, frame in enumerate(chunk):
+            with phase("frame_set"):
+                scene.frame_set(int(frame))
+
+            with phase("read_values"):
+                for obj, obj_values in zip(objects, values):
+                    obj.data.shape_keys.key_blocks.foreach_get("value", obj_values[i])
+
+            if positions:
+                with phase("read_positions"):
+                    depsgraph = bpy.context.evaluated_depsgraph_get()
+                    for obj, obj_coordinates in zip(objects, coordinates):
+                        obj.evaluated_get(depsgraph).data.vertices.foreach_get("co", obj_coordinates[i])
+
+        yield (chunk,
+               [obj_values[:len(chunk)] for obj_values in values],
+               [obj_coordinates[:len(chunk)] for obj_coordinates in coordinates] if positions else None)
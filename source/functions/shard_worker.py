@@ -0,0 +1,32 @@
+# Runs in a background Blender process started by a sharded bake of "Bake Shape Key Action" (see `sharding.py`):
+#
+#     blender --background <copy of the file> --python shard_worker.py -- <frames.npy> <output prefix> <object names>
+#
+# It samples values of all shape keys of the objects on every frame of its shard, and saves them into
+# `<output prefix>_<object index>.npy` as (frames x keys) float32 arrays. It doesn't import the add-on,
+# so that it works no matter if or how the add-on is installed in that process.
+
+import bpy
+import numpy
+import sys
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:]
+    frames_path, output_prefix, names = argv[0], argv[1], argv[2:]
+
+    scene = bpy.context.scene
+    frames = numpy.load(frames_path)
+    objects = [bpy.data.objects[name] for name in names]
+    values = [numpy.empty((len(frames), len(obj.data.shape_keys.key_blocks)), dtype=numpy.float32) for obj in objects]
+
+    for i, frame in enumerate(frames):
+        scene.frame_set(int(frame))
+        for obj, obj_values in zip(objects, values):
+            obj.data.shape_keys.key_blocks.foreach_get("value", obj_values[i])
+
+    for index, obj_values in enumerate(values):
+        numpy.save(f"{output_prefix}_{index}.npy", obj_values)
+
+
+main()
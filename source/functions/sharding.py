@@ -0,0 +1,89 @@
+import bpy
+import numpy
+import os
+import shutil
+import subprocess
+import tempfile
+
+from .profiling import phase
+
+
+# Script that background Blender processes run on their shard of frames.
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "shard_worker.py")
+
+
+#### ------------------------------ CLASSES ------------------------------ ####
+
+class ShardedSampler:
+    """
+    Samples shape key values of objects in background Blender processes, each on one contiguous shard of frames.
+    Processes open a copy of the current file (with unsaved changes) saved in a temporary directory,
+    and return values as .npy files. Frames are sampled the same way as in `sample_shape_key_values`,
+    so values are identical to the ones sampled in this process.
+    """
+
+    def __init__(self, scene, objects, frames, shard_count):
+        self.directory = tempfile.mkdtemp(prefix="bake_shape_keys_")
+        self.shards = [shard for shard in numpy.array_split(frames, min(shard_count, len(frames))) if len(shard) > 0]
+        self.offsets = numpy.cumsum([0] + [len(shard) for shard in self.shards])
+        self.object_count = len(objects)
+        self._processes = {}
+
+        try:
+            with phase("save_copy"):
+                filepath = os.path.join(self.directory, "bake.blend")
+                bpy.ops.wm.save_as_mainfile(filepath=filepath, copy=True, check_existing=False)
+
+            # Drivers with Python expressions only work if the user allowed scripts in this session.
+            autoexec = "--enable-autoexec" if bpy.context.preferences.filepaths.use_scripts_auto_execute else "--disable-autoexec"
+            names = [obj.name for obj in objects]
+
+            for index, shard in enumerate(self.shards):
+                prefix = os.path.join(self.directory, f"shard_{index:03d}")
+                numpy.save(prefix + "_frames.npy", shard)
+                log = open(prefix + ".log", "wb")
+                with log:
+                    self._processes[index] = subprocess.Popen(
+                        [bpy.app.binary_path, "--background", "-noaudio", autoexec, filepath, "--scene", scene.name,
+                         "--python-exit-code", "1", "--python", WORKER_SCRIPT, "--", prefix + "_frames.npy", prefix, *names],
+                        stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                    )
+        except BaseException:
+            self.close()
+            raise
+
+    def poll(self):
+        """Returns indices of shards whose processes finished since the previous call.
+        Raises RuntimeError with the end of the process output if one of them failed."""
+
+        finished = []
+        for index, process in list(self._processes.items()):
+            returncode = process.poll()
+            if returncode is None:
+                continue
+
+            del self._processes[index]
+            if returncode != 0:
+                with open(os.path.join(self.directory, f"shard_{index:03d}.log"), "rb") as log:
+                    output = log.read().decode(errors="replace").strip().splitlines()
+                raise RuntimeError(f"Bake of frames {int(self.shards[index][0])}-{int(self.shards[index][-1])} failed: "
+                                   + (output[-1] if output else f"exit code {returncode}"))
+            finished.append(index)
+
+        return finished
+
+    def read(self, index):
+        """Returns list of (frames x keys) arrays of values of every object on the shard"""
+
+        prefix = os.path.join(self.directory, f"shard_{index:03d}")
+        return [numpy.load(f"{prefix}_{i}.npy") for i in range(self.object_count)]
+
+    def close(self):
+        """Stops processes that are still running and removes temporary files"""
+
+        for process in self._processes.values():
+            process.kill()
+            process.wait()
+        self._processes.clear()
+
+        shutil.rmtree(self.directory, ignore_errors=True)
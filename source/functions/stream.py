@@ -0,0 +1,186 @@
+import numpy
+import struct
+
+
+# Shape key stream (.bsks) is a compact binary format of per-frame shape key values.
+#
+#     Header          magic, version, flags, key count, frame count, vertex count, fps, size of names
+#     Names           UTF-8 key names separated by null characters, padded to 8 bytes
+#     Frames          int32 frame number of every record
+#     Offsets         uint64 byte offset of every record in the file, so that frames can be read randomly
+#     Records         per frame: bitmask of keys that changed since previous frame (sparse streams only),
+#                     values of the changed keys (float16 or float32), vertex positions (float32, optional)
+#
+# All numbers are little-endian.
+
+MAGIC = b"BSKS"
+VERSION = 1
+
+FLAG_HALF = 1 << 0
+FLAG_SPARSE = 1 << 1
+FLAG_POSITIONS = 1 << 2
+
+HEADER = struct.Struct("<4sHHIIIfI")
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+def _align(size, alignment=8):
+    return (size + alignment - 1) // alignment * alignment
+
+
+class ShapeKeyStreamWriter:
+    """Writes shape key values (and optionally vertex positions) chunk by chunk into a memory-mapped stream file.
+    File is preallocated for the worst case (no sparse savings) and truncated to the written size when closed."""
+
+    def __init__(self, filepath, names, frames, vertex_count=0, fps=24.0, half=False, sparse=True, threshold=0.0):
+        self.filepath = filepath
+        self.key_count = len(names)
+        self.frame_count = len(frames)
+        self.vertex_count = vertex_count
+        self.dtype = numpy.dtype("<f2" if half else "<f4")
+        self.sparse = sparse
+        self.threshold = threshold
+        self.mask_size = (self.key_count + 7) // 8 if sparse else 0
+
+        flags = ((FLAG_HALF if half else 0) |
+                 (FLAG_SPARSE if sparse else 0) |
+                 (FLAG_POSITIONS if vertex_count else 0))
+        names_data = "\0".join(names).encode("utf-8")
+        header = HEADER.pack(MAGIC, VERSION, flags, self.key_count, self.frame_count, vertex_count, fps, len(names_data))
+
+        # Layout
+        frames_offset = _align(HEADER.size + len(names_data))
+        self.offsets_offset = frames_offset + self.frame_count * 4
+        self.records_offset = _align(self.offsets_offset + self.frame_count * 8)
+        record_size = self.mask_size + self.key_count * self.dtype.itemsize + vertex_count * 3 * 4
+        capacity = self.records_offset + record_size * self.frame_count
+
+        with open(filepath, "wb") as file:
+            file.truncate(capacity)
+        self._map = numpy.memmap(filepath, dtype=numpy.uint8, mode="r+", shape=(capacity,))
+
+        self._map[:HEADER.size] = numpy.frombuffer(header, dtype=numpy.uint8)
+        self._map[HEADER.size:HEADER.size + len(names_data)] = numpy.frombuffer(names_data, dtype=numpy.uint8)
+        self._map[frames_offset:self.offsets_offset] = numpy.asarray(frames, dtype="<i4").view(numpy.uint8)
+
+        self._position = self.records_offset
+        self._frame_index = 0
+        self._previous = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_bytes(self, array):
+        data = numpy.ascontiguousarray(array).view(numpy.uint8).ravel()
+        self._map[self._position:self._position + len(data)] = data
+        self._position += len(data)
+
+    def write(self, values, coordinates=None):
+        """Writes (frames x keys) array of values, and (frames x vertices * 3) array of vertex positions"""
+
+        values = numpy.asarray(values).astype(self.dtype)
+        offsets = self._map[self.offsets_offset:self.offsets_offset + self.frame_count * 8].view("<u8")
+
+        for i, frame_values in enumerate(values):
+            offsets[self._frame_index] = self._position
+
+            if self.sparse:
+                # Compare with previously written values, so that small changes below threshold don't accumulate.
+                if self._previous is None:
+                    changed = numpy.ones(self.key_count, dtype=bool)
+                    self._previous = frame_values.copy()
+                else:
+                    changed = numpy.abs(frame_values.astype(numpy.float32) - self._previous.astype(numpy.float32)) > self.threshold
+                    self._previous[changed] = frame_values[changed]
+
+                self._write_bytes(numpy.packbits(changed, bitorder="little")[:self.mask_size])
+                self._write_bytes(frame_values[changed])
+            else:
+                self._write_bytes(frame_values)
+
+            if self.vertex_count:
+                self._write_bytes(numpy.asarray(coordinates[i], dtype="<f4"))
+
+            self._frame_index += 1
+
+        # Write pages to disk, so that memory doesn't grow with frame count.
+        self._map.flush()
+
+    def close(self):
+        if self._map is None:
+            return
+
+        self._map.flush()
+        self._map = None
+
+        with open(self.filepath, "r+b") as file:
+            file.truncate(self._position)
+
+
+class ShapeKeyStreamReader:
+    """Reads shape key stream file through memory map, decoding sparse records on the fly"""
+
+    def __init__(self, filepath):
+        self._map = numpy.memmap(filepath, dtype=numpy.uint8, mode="r")
+        if len(self._map) < HEADER.size:
+            raise ValueError("File is not a shape key stream")
+
+        magic, version, flags, key_count, frame_count, vertex_count, fps, names_size = HEADER.unpack(self._map[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError("File is not a shape key stream")
+        if version > VERSION:
+            raise ValueError(f"Unsupported shape key stream version ({version})")
+
+        self.key_count = key_count
+        self.frame_count = frame_count
+        self.vertex_count = vertex_count if flags & FLAG_POSITIONS else 0
+        self.fps = fps
+        self.dtype = numpy.dtype("<f2" if flags & FLAG_HALF else "<f4")
+        self.sparse = bool(flags & FLAG_SPARSE)
+
+        names_data = self._map[HEADER.size:HEADER.size + names_size].tobytes()
+        self.names = names_data.decode("utf-8").split("\0") if key_count else []
+
+        frames_offset = _align(HEADER.size + names_size)
+        offsets_offset = frames_offset + frame_count * 4
+        self.frames = self._map[frames_offset:offsets_offset].view("<i4")
+        self.offsets = self._map[offsets_offset:offsets_offset + frame_count * 8].view("<u8")
+
+    def iter_frames(self):
+        """Yields `(frame, values, coordinates)` for every record, values are decoded into a dense float32 array"""
+
+        values = numpy.zeros(self.key_count, dtype=numpy.float32)
+        mask_size = (self.key_count + 7) // 8
+        itemsize = self.dtype.itemsize
+
+        for frame, position in zip(self.frames, self.offsets):
+            position = int(position)
+
+            if self.sparse:
+                changed = numpy.unpackbits(self._map[position:position + mask_size], bitorder="little")[:self.key_count].astype(bool)
+                position += mask_size
+                count = int(changed.sum())
+                values[changed] = self._map[position:position + count * itemsize].view(self.dtype)
+                position += count * itemsize
+            else:
+                values[:] = self._map[position:position + self.key_count * itemsize].view(self.dtype)
+                position += self.key_count * itemsize
+
+            coordinates = None
+            if self.vertex_count:
+                coordinates = self._map[position:position + self.vertex_count * 3 * 4].view("<f4")
+
+            yield int(frame), values, coordinates
+
+    def read_values(self):
+        """Returns (frames x keys) array of all decoded values"""
+
+        values = numpy.empty((self.frame_count, self.key_count), dtype=numpy.float32)
+        for i, (__, frame_values, __) in enumerate(self.iter_frames()):
+            values[i] = frame_values
+
+        return values
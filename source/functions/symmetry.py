@@ -0,0 +1,70 @@
+import numpy
+
+from mathutils.kdtree import KDTree
+
+from .mesh import (
+    get_shape_key_coordinates,
+    hash_coordinates,
+)
+from .profiling import phase
+
+
+# Symmetry maps of meshes, keyed by (mesh pointer, axis, tolerance), as (digest of basis positions, map) pairs.
+# Map is rebuilt when the basis changes, and all maps are invalidated by undo and file load handlers (see `handlers.py`).
+_symmetry_maps = {}
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+def get_symmetry_map(obj, axis='X', tolerance=0.0001):
+    """
+    Returns int array with the index of the mirrored vertex for every vertex of the mesh (or -1 if there isn't one),
+    found with a KD-tree over basis positions. Map is cached for the mesh until its basis shape key changes.
+    """
+
+    basis = get_shape_key_coordinates(obj.data.shape_keys.reference_key)
+    digest = hash_coordinates(basis)
+
+    key = (obj.data.as_pointer(), axis, tolerance)
+    cached = _symmetry_maps.get(key)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+
+    with phase("build_symmetry_map"):
+        basis = basis.reshape(-1, 3)
+        mirrored = basis.copy()
+        mirrored[:, 'XYZ'.index(axis)] *= -1.0
+
+        kd = KDTree(len(basis))
+        for index, co in enumerate(basis.tolist()):
+            kd.insert(co, index)
+        kd.balance()
+
+        symmetry = numpy.full(len(basis), -1, dtype=numpy.int64)
+        for index, co in enumerate(mirrored.tolist()):
+            __, found, distance = kd.find(co)
+            if found is not None and distance <= tolerance:
+                symmetry[index] = found
+
+    _symmetry_maps[key] = (digest, symmetry)
+    return symmetry
+
+
+def invalidate_symmetry_maps():
+    """Removes all cached symmetry maps."""
+
+    _symmetry_maps.clear()
+
+
+def mirror_coordinates(coordinates, reference, symmetry, axis='X'):
+    """Returns flat array of positions with offsets from the reference positions mirrored across the axis.
+    Vertices without a mirrored counterpart keep reference positions."""
+
+    delta = (coordinates - reference).reshape(-1, 3)
+    found = symmetry >= 0
+
+    mirrored = numpy.zeros_like(delta)
+    mirrored[found] = delta[symmetry[found]]
+    mirrored[:, 'XYZ'.index(axis)] *= -1.0
+
+    return (reference.reshape(-1, 3) + mirrored).ravel()
@@ -0,0 +1,22 @@
+import numpy
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+def format_obj_faces(region):
+    """Returns face lines of an OBJ file for the topology of given `MeshRegion`, to be reused for every written shape"""
+
+    faces = numpy.split(region.loop_vertices + 1, region.loop_starts[1:]) if len(region.loop_starts) else []
+    lines = ["f " + " ".join(map(str, face)) for face in faces]
+    lines += [f"l {a + 1} {b + 1}" for a, b in region.edges] if not lines else []
+
+    return ("\n".join(lines) + "\n").encode() if lines else b""
+
+
+def write_obj(filepath, name, coordinates, faces):
+    """Writes an OBJ file with one object with given vertex positions and preformatted face lines"""
+
+    with open(filepath, "wb") as file:
+        file.write(f"o {name}\n".encode())
+        numpy.savetxt(file, numpy.asarray(coordinates).reshape(-1, 3), fmt="v %.6f %.6f %.6f")
+        file.write(faces)
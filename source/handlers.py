@@ -0,0 +1,60 @@
+import bpy
+
+from bpy.app.handlers import persistent
+
+from .functions.mesh import invalidate_mix_cache
+from .functions.parallel import shutdown_executor
+from .functions.poll import invalidate_shape_key_summary
+from .functions.symmetry import invalidate_symmetry_maps
+
+
+#### ------------------------------ HANDLERS ------------------------------ ####
+
+@persistent
+def shape_keys_depsgraph_update(scene, depsgraph):
+    """Invalidates cached shape key data of updated objects."""
+
+    for update in depsgraph.updates:
+        data_block = update.id.original
+        if isinstance(data_block, bpy.types.Key):
+            invalidate_mix_cache(data_block)
+        elif isinstance(data_block, bpy.types.Mesh) and data_block.shape_keys:
+            invalidate_mix_cache(data_block.shape_keys)
+
+        if isinstance(data_block, (bpy.types.Key, bpy.types.Mesh, bpy.types.Action)):
+            # Data can be shared between objects, so there is no cheap way to know which ones are affected.
+            invalidate_shape_key_summary()
+        elif isinstance(data_block, bpy.types.Object):
+            invalidate_shape_key_summary(data_block)
+
+
+@persistent
+def shape_keys_reset(*args):
+    """Invalidates all cached shape key data, since undo and file load re-allocate data-blocks."""
+
+    invalidate_shape_key_summary()
+    invalidate_symmetry_maps()
+    invalidate_mix_cache()
+
+
+
+#### ------------------------------ REGISTRATION ------------------------------ ####
+
+handlers = [
+    (bpy.app.handlers.depsgraph_update_post, shape_keys_depsgraph_update),
+    (bpy.app.handlers.undo_post, shape_keys_reset),
+    (bpy.app.handlers.redo_post, shape_keys_reset),
+    (bpy.app.handlers.load_post, shape_keys_reset),
+]
+
+def register():
+    for handler_list, handler in handlers:
+        handler_list.append(handler)
+
+def unregister():
+    for handler_list, handler in reversed(handlers):
+        if handler in handler_list:
+            handler_list.remove(handler)
+
+    shape_keys_reset()
+    shutdown_executor()
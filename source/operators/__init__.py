@@ -1,22 +1,36 @@
 if "bpy" in locals():
     import importlib
     for mod in [bake,
+                cleanup,
+                combinations,
+                compress,
                 copy,
                 duplicate,
                 merge,
+                mirror,
                 objects,
+                pointcache,
+                retime,
                 split,
+                stream,
                 ]:
         importlib.reload(mod)
 else:
     import bpy
     from . import (
         bake,
+        cleanup,
+        combinations,
+        compress,
         copy,
         duplicate,
         merge,
+        mirror,
         objects,
+        pointcache,
+        retime,
         split,
+        stream,
     )
 
 
@@ -24,11 +38,18 @@ else:
 
 modules = [
     bake,
+    cleanup,
+    combinations,
+    compress,
     copy,
     duplicate,
     merge,
+    mirror,
     objects,
+    pointcache,
+    retime,
     split,
+    stream,
 ]
 
 def register():
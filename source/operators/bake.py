@@ -1,11 +1,39 @@
 import bpy
+import numpy
+import time
 
 from ..functions.animation import (
+    assign_action,
     ensure_channelbag,
+    ensure_shape_key_fcurve,
+    get_keyframed_frames,
+    new_action_for_data_block,
+    set_keyframe_interpolation,
+    write_keyframes,
+)
+from ..functions.incremental import (
+    get_dirty_frames,
+    store_snapshot,
+)
+from ..functions.jobs import (
+    ChunkedJob,
+    ModalJob,
 )
 from ..functions.poll import (
     has_shape_keys,
 )
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+from ..functions.sampling import (
+    frame_range,
+    sample_shape_key_values,
+)
+from ..functions.sharding import (
+    ShardedSampler,
+)
 
 
 ##### ---------------------------------- OPERATORS ---------------------------------- #####
@@ -20,21 +48,25 @@ class OBJECT_OT_shape_key_keyframe_all(bpy.types.Operator):
     def poll(cls, context):
         return has_shape_keys(context.object)
 
+    @profiled
     def execute(self, context):
         obj = context.object
         for key in obj.data.shape_keys.key_blocks:
             # Skip 'Basis' Key
             if key == obj.data.shape_keys.key_blocks[0]:
                 continue
-            key.keyframe_insert("value")
+            with phase("keyframe_insert"):
+                key.keyframe_insert("value")
+            count("keys")
 
         return {'FINISHED'}
 
 
-class OBJECT_OT_shape_key_action_bake(bpy.types.Operator):
+class OBJECT_OT_shape_key_action_bake(ModalJob, bpy.types.Operator):
     bl_idname = "object.shape_key_action_bake"
     bl_label = "Bake Shape Key Action"
-    bl_description = "Insert keyframes for all shape keys on selected objects on every frame within frame range"
+    bl_description = ("Insert keyframes for all shape keys on selected objects on every frame within frame range.\n"
+                      "Press Esc to cancel, frames that were already sampled will still be baked")
     bl_options = {'REGISTER', 'UNDO'}
 
     follow_scene_range: bpy.props.BoolProperty(
@@ -57,6 +89,30 @@ class OBJECT_OT_shape_key_action_bake(bpy.types.Operator):
         min = 1, max = 4,
         default = 1,
     )
+    keyframes_only: bpy.props.BoolProperty(
+        name = "Keyframes Only",
+        description = "Bake only on frames that already have shape key keyframes, instead of on every frame",
+        default = False,
+    )
+    incremental: bpy.props.BoolProperty(
+        name = "Incremental",
+        description = ("Only re-bake frames where animation or drivers of shape keys changed since the previous bake.\n"
+                       "Changes in animation that drivers don't read directly (like constraints or parents) are not detected"),
+        default = False,
+    )
+    window_size: bpy.props.IntProperty(
+        name = "Window",
+        description = "Number of consecutive frames that are compared and re-baked together",
+        min = 1, soft_max = 100,
+        default = 16,
+    )
+    processes: bpy.props.IntProperty(
+        name = "Processes",
+        description = ("Split frame range between this many background Blender processes that bake at the same time, on a saved copy of the file.\n"
+                       "Useful for very long frame ranges, since evaluating frames in one process can't use more than one CPU core"),
+        min = 1, soft_max = 16,
+        default = 1,
+    )
 
     constant_interpolation: bpy.props.BoolProperty(
         name = "Constant Interpolation",
@@ -64,6 +120,21 @@ class OBJECT_OT_shape_key_action_bake(bpy.types.Operator):
         default = True
     )
 
+    bake_target: bpy.props.EnumProperty(
+        name = "Bake To",
+        description = "Where baked keyframes are inserted",
+        items = [('ACTIVE', "Current Action", "Insert keyframes into the action that is currently assigned to shape keys"),
+                 ('NEW', "New Action", ("Insert keyframes into a new action for each object, leaving the current animation untouched.\n"
+                                        "Incremental bake is not available, since every frame has to be written"))],
+        default = 'ACTIVE',
+    )
+    assign_action: bpy.props.BoolProperty(
+        name = "Assign New Action",
+        description = ("Assign the new action to shape keys and mute their drivers, so that baked values are used.\n"
+                       "Previous action is kept with a fake user"),
+        default = False,
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.use_property_split = True
@@ -78,9 +149,23 @@ class OBJECT_OT_shape_key_action_bake(bpy.types.Operator):
             col.enabled = False
 
         layout.prop(self, "step")
+        layout.prop(self, "keyframes_only")
+        row = layout.row(heading="Incremental")
+        row.prop(self, "incremental", text="")
+        sub = row.row()
+        sub.prop(self, "window_size")
+        sub.enabled = self.incremental
+        if self.bake_target != 'ACTIVE':
+            row.enabled = False
+        layout.prop(self, "processes")
 
         layout.separator()
         layout.prop(self, "constant_interpolation")
+        layout.prop(self, "bake_target")
+        row = layout.row()
+        row.prop(self, "assign_action")
+        if self.bake_target != 'NEW':
+            row.enabled = False
 
     def invoke(self, context, event):
         self.frame_start = context.scene.frame_start
@@ -88,6 +173,7 @@ class OBJECT_OT_shape_key_action_bake(bpy.types.Operator):
 
         return context.window_manager.invoke_props_dialog(self)
 
+    @profiled
     def execute(self, context):
         # Define Frame Range
         initial_frame = context.scene.frame_current
@@ -105,35 +191,178 @@ class OBJECT_OT_shape_key_action_bake(bpy.types.Operator):
             self.report({'WARNING'}, "No objects with animated shape keys in selection")
             return {'CANCELLED'}
 
-        for obj in objects:
-            shape_keys = obj.data.shape_keys.key_blocks
-            basis = shape_keys[0]
-
-            # Inserting Keyframes
-            for frame in range(self.frame_start, self.frame_end + 1, self.step):
-                context.scene.frame_set(frame)
-                for key in shape_keys:
-                    if key == basis:
+        # Sample Shape Key Values
+        # NOTE: All frames are sampled before writing, because inserting keyframes changes the animation being sampled.
+        self._initial_frame = initial_frame
+        self._objects = objects
+        if self.keyframes_only:
+            # Sample on frames keyframed on any of the objects, but write only on each objects own keyframes.
+            self._object_frames = [get_keyframed_frames(ensure_channelbag(obj.data.shape_keys), self.frame_start, self.frame_end, self.step)
+                                   for obj in objects]
+            self._frames = numpy.unique(numpy.concatenate(self._object_frames))
+            if len(self._frames) == 0:
+                self.report({'WARNING'}, "No shape key keyframes within the frame range")
+                return {'CANCELLED'}
+        else:
+            self._frames = frame_range(self.frame_start, self.frame_end, self.step)
+            self._object_frames = None
+
+        # Compare With Previous Bake
+        self._snapshot_frames = self._object_frames or [self._frames] * len(objects)
+        self._dirty_frames = None
+        if self.incremental and self.bake_target == 'ACTIVE':
+            with phase("compare_snapshot"):
+                self._dirty_frames = [get_dirty_frames(obj.data.shape_keys, obj.data.shape_keys.key_blocks.keys()[1:],
+                                                       obj_frames, self.window_size)
+                                      for obj, obj_frames in zip(objects, self._snapshot_frames)]
+
+            # Sample only on frames that are dirty for at least one shape key.
+            dirty = [key_frames for obj_dirty in self._dirty_frames for key_frames in obj_dirty.values()]
+            self._frames = numpy.unique(numpy.concatenate(dirty)) if dirty else self._frames[:0]
+            if len(self._frames) == 0:
+                self.report({'INFO'}, "Nothing changed since the previous bake")
+                return {'CANCELLED'}
+
+        self._baked_values = [numpy.empty((len(self._frames), len(obj.data.shape_keys.key_blocks)), dtype=numpy.float32)
+                              for obj in objects]
+        self._sampled = 0
+
+        count("objects", len(objects))
+        count("keys", sum(len(obj.data.shape_keys.key_blocks) - 1 for obj in objects))
+        count("frames", len(self._frames))
+
+        # Sharded Bake
+        self._sampler = None
+        self._shard_error = None
+        if self.processes > 1 and len(self._frames) > 1:
+            try:
+                self._sampler = ShardedSampler(context.scene, objects, self._frames, self.processes)
+            except (OSError, RuntimeError) as error:
+                self.report({'ERROR'}, f"Background processes couldn't be started: {error}")
+                return {'CANCELLED'}
+            count("processes", len(self._sampler.shards))
+
+        steps = self._sharded_bake_steps() if self._sampler else self._bake_steps(context)
+        job = ChunkedJob("Baking Shape Keys", steps, len(self._frames))
+        return self.start_job(context, job)
+
+    def finish_job(self, context, cancelled):
+        if self._sampler is not None:
+            self._sampler.close()
+            self._sampler = None
+        if self._shard_error is not None:
+            self.report({'ERROR'}, self._shard_error)
+            cancelled = True
+
+        frames = self._frames[:self._sampled]
+
+        # Inserting Keyframes
+        if len(frames) > 0:
+            interpolation = 'CONSTANT' if self.constant_interpolation else None
+            for index, (obj, obj_baked_values) in enumerate(zip(self._objects, self._baked_values)):
+                obj_baked_values = obj_baked_values[:len(frames)]
+                obj_frames = frames
+                if self._object_frames is not None:
+                    on_keyframes = numpy.isin(frames, self._object_frames[index])
+                    obj_frames = frames[on_keyframes]
+                    obj_baked_values = obj_baked_values[on_keyframes]
+                if len(obj_frames) == 0:
+                    continue
+
+                shape_keys = obj.data.shape_keys
+                if self.bake_target == 'NEW':
+                    action, slot, channelbag = new_action_for_data_block(shape_keys, f"{shape_keys.name}_Baked")
+
+                for i, key in enumerate(shape_keys.key_blocks):
+                    # Skip 'Basis' Key
+                    if i == 0:
                         continue
-                    key.keyframe_insert(data_path="value")
 
-            # Set Constant Interpolation
-            if self.constant_interpolation:
-                channelbag = ensure_channelbag(obj.data.shape_keys)
-                for fcurve in channelbag.fcurves:
-                    if not fcurve.data_path.startswith("key_blocks"):
-                        continue
-                    if basis.name in fcurve.data_path:
-                        continue
-
-                    for keyframe in fcurve.keyframe_points:
-                        if self.frame_start <= keyframe.co[0] <= self.frame_end:
-                            keyframe.interpolation = 'CONSTANT'
-
-        context.scene.frame_set(initial_frame)
-        self.report({'INFO'}, "Shape key action successfully baked for selected object(s)")
+                    key_frames, key_values = obj_frames, obj_baked_values[:, i]
+                    if self._dirty_frames is not None:
+                        dirty = numpy.isin(obj_frames, self._dirty_frames[index][key.name])
+                        key_frames, key_values = obj_frames[dirty], key_values[dirty]
+                        if len(key_frames) == 0:
+                            continue
+
+                    if self.bake_target == 'NEW':
+                        fcurve = channelbag.fcurves.new(f'key_blocks["{key.name}"].value')
+                    else:
+                        fcurve = ensure_shape_key_fcurve(shape_keys, key, int(key_frames[0]))
+                    write_keyframes(fcurve, key_frames, key_values, interpolation=interpolation)
+
+                # Set Constant Interpolation
+                # It's set on every keyframe within the baked range, not only on baked ones, so that keyframes
+                # between baked frames (with step above 1) or skipped by incremental bake hold their value too.
+                if self.constant_interpolation:
+                    basis_path = f'key_blocks["{shape_keys.key_blocks[0].name}"].value'
+                    baked_channelbag = channelbag if self.bake_target == 'NEW' else ensure_channelbag(shape_keys)
+                    for fcurve in baked_channelbag.fcurves:
+                        if fcurve.data_path.startswith("key_blocks") and fcurve.data_path != basis_path:
+                            set_keyframe_interpolation(fcurve, 'CONSTANT', frames[0], frames[-1])
+
+                if self.bake_target == 'NEW' and self.assign_action:
+                    assign_action(shape_keys, action, slot)
+
+                    # Mute Drivers
+                    for driver in shape_keys.animation_data.drivers:
+                        if driver.data_path.startswith("key_blocks[") and driver.data_path.endswith("].value"):
+                            driver.mute = True
+
+        # Store Snapshot
+        # Partially baked objects keep previous snapshot, so that frames that weren't reached are still considered dirty.
+        if not cancelled and self.bake_target == 'ACTIVE':
+            with phase("store_snapshot"):
+                for obj, obj_frames in zip(self._objects, self._snapshot_frames):
+                    shape_keys = obj.data.shape_keys
+                    store_snapshot(shape_keys, shape_keys.key_blocks.keys()[1:], obj_frames, self.window_size)
+
+        context.scene.frame_set(self._initial_frame)
+        if cancelled:
+            self.report({'WARNING'}, f"Bake cancelled, {len(frames)} out of {len(self._frames)} frames were baked")
+        else:
+            self.report({'INFO'}, "Shape key action successfully baked for selected object(s)")
         return {'FINISHED'}
 
+    def _bake_steps(self, context):
+        """Samples shape key values of all objects one frame at a time."""
+
+        key_count = sum(len(obj.data.shape_keys.key_blocks) - 1 for obj in self._objects)
+        for chunk, values, __ in sample_shape_key_values(context.scene, self._objects, self._frames, chunk_size=1):
+            for obj_baked_values, obj_values in zip(self._baked_values, values):
+                obj_baked_values[self._sampled:self._sampled + len(chunk)] = obj_values
+            self._sampled += len(chunk)
+            yield key_count
+
+    def _sharded_bake_steps(self):
+        """Collects shape key values sampled by background processes, yielding a step for every frame of each finished shard."""
+
+        sampler = self._sampler
+        key_count = sum(len(obj.data.shape_keys.key_blocks) - 1 for obj in self._objects)
+        finished = numpy.zeros(len(sampler.shards), dtype=bool)
+        while not finished.all():
+            try:
+                shards = sampler.poll()
+            except RuntimeError as error:
+                self._shard_error = str(error)
+                return
+
+            for index in shards:
+                start = sampler.offsets[index]
+                with phase("read_shard"):
+                    for obj_baked_values, obj_values in zip(self._baked_values, sampler.read(index)):
+                        obj_baked_values[start:start + len(obj_values)] = obj_values
+                finished[index] = True
+
+                # Only frames before the first unfinished shard count as sampled, so that cancelled bake writes a continuous range.
+                self._sampled = sampler.offsets[numpy.argmin(finished)] if not finished.all() else len(self._frames)
+                for __ in sampler.shards[index]:
+                    yield key_count
+
+            if not shards:
+                time.sleep(0.01)
+                yield None
+
     def _filter_objects(self, context):
         """Get the list of applicable objects (with animated shape keys)."""
 
@@ -0,0 +1,262 @@
+import bpy
+import numpy
+
+from ..functions.animation import (
+    is_shape_key_animated,
+    transfer_animation,
+)
+from ..functions.drivers import (
+    DriverIndex,
+)
+from ..functions.mesh import (
+    KeyBlockIndex,
+    get_shape_key_delta,
+)
+from ..functions.poll import (
+    has_shape_keys,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+
+# Number of random directions deltas are projected on, to find shape keys that can be duplicates.
+PROJECTION_COUNT = 4
+
+
+##### ---------------------------------- OPERATORS ---------------------------------- #####
+
+class OBJECT_OT_shape_key_clean_up(bpy.types.Operator):
+    bl_idname = "object.shape_key_clean_up"
+    bl_label = "Clean Up Shape Keys"
+    bl_description = ("Find shape keys that don't deform the mesh, duplicates of other shape keys,\n"
+                      "and shape keys that are combinations of other shape keys, and remove them.\n"
+                      "Animation of removed duplicates is transferred to the shape key that is kept")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    tolerance: bpy.props.FloatProperty(
+        name = "Tolerance",
+        description = "Maximum distance between positions of a vertex for them to still be considered equal",
+        subtype = 'DISTANCE', unit = 'LENGTH',
+        min = 0.0, soft_max = 0.01,
+        default = 0.0001,
+        precision = 5,
+    )
+
+    remove_empty: bpy.props.BoolProperty(
+        name = "Empty",
+        description = "Remove shape keys that don't move any vertex away from their relative key",
+        default = True,
+    )
+    remove_duplicates: bpy.props.BoolProperty(
+        name = "Duplicates",
+        description = ("Remove shape keys that deform the mesh the same way as another shape key.\n"
+                       "If only the duplicate is animated, its animation is transferred to the shape key that is kept"),
+        default = True,
+    )
+    remove_combinations: bpy.props.BoolProperty(
+        name = "Combinations",
+        description = ("Find shape keys that can be reproduced by mixing other shape keys.\n"
+                       "Only the ones that are not animated and have value of 0 are removed, others are only reported"),
+        default = False,
+    )
+
+    report_only: bpy.props.BoolProperty(
+        name = "Report Only",
+        description = "Print shape keys that would be removed to the console without removing anything",
+        default = False,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if not has_shape_keys(context.object):
+            return False
+        if context.mode != 'OBJECT':
+            cls.poll_message_set("Shape keys can only be cleaned up in Object Mode")
+            return False
+        return True
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        layout.prop(self, "tolerance")
+        col = layout.column(heading="Remove", align=True)
+        col.prop(self, "remove_empty")
+        col.prop(self, "remove_duplicates")
+        col.prop(self, "remove_combinations")
+        layout.separator()
+        layout.prop(self, "report_only")
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        shape_keys = obj.data.shape_keys
+        key_blocks = shape_keys.key_blocks
+
+        count("keys", len(key_blocks))
+        count("vertices", len(obj.data.vertices))
+
+        # Shape keys other shape keys are relative to can't be removed without changing them, muted ones don't do anything.
+        relative_keys = {key.relative_key.name for key in key_blocks if key.relative_key != key}
+        candidates = [key for key in key_blocks[1:] if not key.mute and key.name not in relative_keys]
+
+        # Find Empty Shape Keys & Duplicates
+        empty = []
+        duplicates = []
+        remaining = []
+        with phase("find_duplicates"):
+            # Deltas are projected on a few random directions, scaled so that projections of two deltas can't differ by more
+            # than the largest distance between their vertices. Only shape keys with projections within the tolerance
+            # (and the same vertex group) can be duplicates, and only those are compared in full.
+            directions = None
+            unique = []
+            unique_projections = numpy.empty((0, PROJECTION_COUNT), dtype=numpy.float32)
+            for key in candidates:
+                delta = get_shape_key_delta(key)
+                if _max_distance(delta) <= self.tolerance:
+                    empty.append(key)
+                    continue
+
+                if self.remove_duplicates:
+                    if directions is None:
+                        directions = _projection_directions(len(delta))
+                    projection = directions @ delta
+
+                    # Projections are summed in float32, so they're compared with some room for rounding.
+                    slack = self.tolerance + 1e-5 * (numpy.abs(projection).max() + 1.0)
+                    close = numpy.flatnonzero((numpy.abs(unique_projections - projection) <= slack).all(axis=1))
+                    original = next((unique[i] for i in close if unique[i].vertex_group == key.vertex_group and
+                                     _max_distance(delta - get_shape_key_delta(unique[i])) <= self.tolerance), None)
+                    if original is not None:
+                        duplicates.append((key, original))
+                        continue
+
+                    unique.append(key)
+                    unique_projections = numpy.vstack((unique_projections, projection))
+
+                # Deltas are only kept in memory when they're needed for the rank test.
+                remaining.append((key, delta if self.remove_combinations else None))
+
+        # Find Linear Combinations
+        combinations = []
+        if self.remove_combinations:
+            with phase("rank_test"):
+                combinations = self._find_combinations([(key, delta) for key, delta in remaining if not key.vertex_group])
+
+        if not self.remove_empty:
+            empty = []
+
+        # Report
+        print(f"Cleaning up shape keys of '{obj.name}'")
+        for key in empty:
+            print(f"- '{key.name}' doesn't deform the mesh")
+        for key, original in duplicates:
+            print(f"- '{key.name}' is a duplicate of '{original.name}'")
+        for key, coefficients in combinations:
+            mix = " + ".join(f"{coefficient:.3f} * '{name}'" for name, coefficient in coefficients)
+            print(f"- '{key.name}' is a combination of {mix}")
+
+        if self.report_only:
+            self.report({'INFO'}, (f"Found {len(empty)} empty shape keys, {len(duplicates)} duplicates, "
+                                   f"and {len(combinations)} combinations. Check console for details"))
+            return {'FINISHED'}
+
+        # Remove Shape Keys
+        removed = [key.name for key in empty]
+        drivers = DriverIndex(shape_keys)
+
+        for key, original in duplicates:
+            if not is_shape_key_animated(shape_keys, key) and key.value == 0.0:
+                removed.append(key.name)
+
+            # Duplicate can be merged into the original if original doesn't have its own value or animation.
+            elif (not is_shape_key_animated(shape_keys, original) and original.value == 0.0 and
+                  original.slider_min <= key.slider_min and original.slider_max >= key.slider_max):
+                transfer_animation(shape_keys, key, original, drivers=drivers)
+                original.value = key.value
+                removed.append(key.name)
+
+            else:
+                print(f"- '{key.name}' was kept, because both it and '{original.name}' are used")
+
+        for key, coefficients in combinations:
+            if not is_shape_key_animated(shape_keys, key) and key.value == 0.0:
+                removed.append(key.name)
+
+        keys = KeyBlockIndex(obj)
+        keys.remove_many([keys.get(name) for name in removed], drivers=drivers)
+
+        obj.active_shape_key_index = min(obj.active_shape_key_index, len(key_blocks) - 1)
+
+        self.report({'INFO'}, f"{len(removed)} shape keys removed. Check console for details")
+        return {'FINISHED'}
+
+
+    def _find_combinations(self, keys):
+        """
+        Finds shape keys whose delta can be expressed as a linear combination of deltas of shape keys before them.
+        Deltas are orthogonalized one by one (Gram-Schmidt), and a shape key is a combination when what remains
+        of its delta after removing its projection on previous shape keys moves no vertex farther than the tolerance.
+        Returns list of (shape key, list of (name, coefficient)) pairs.
+        """
+
+        combinations = []
+        orthonormal = []
+        independent = []
+        for key, delta in keys:
+            delta = delta.astype(numpy.float64)
+
+            residual = delta.copy()
+            for vector in orthonormal:
+                residual -= vector * (vector @ residual)
+
+            if independent and _max_distance(residual) <= self.tolerance:
+                # Solve for coefficients with normal equations, which are only (keys x keys) in size.
+                matrix = numpy.stack([independent_delta for __, independent_delta in independent], axis=1)
+                coefficients = numpy.linalg.lstsq(matrix.T @ matrix, matrix.T @ delta, rcond=None)[0]
+                combinations.append((key, [(independent_key.name, coefficient)
+                                           for (independent_key, __), coefficient in zip(independent, coefficients)
+                                           if abs(coefficient) > 1e-6]))
+                continue
+
+            orthonormal.append(residual / numpy.linalg.norm(residual))
+            independent.append((key, delta.astype(numpy.float32)))
+
+        return combinations
+
+
+def _max_distance(delta):
+    """Returns the largest distance that flat array of offsets moves a vertex by"""
+
+    if len(delta) == 0:
+        return 0.0
+    return float(numpy.sqrt((delta.reshape(-1, 3).astype(numpy.float64) ** 2).sum(axis=1)).max())
+
+
+def _projection_directions(size):
+    """Returns (`PROJECTION_COUNT` x size) array of random directions for flat offsets arrays of given size.
+    Lengths of the parts of each direction that belong to vertices sum to 1, so projection of a difference of
+    two deltas is never larger than the largest distance between their vertices."""
+
+    directions = numpy.random.default_rng(0).standard_normal((PROJECTION_COUNT, size // 3, 3))
+    directions /= numpy.sqrt((directions ** 2).sum(axis=2)).sum(axis=1)[:, numpy.newaxis, numpy.newaxis]
+    return directions.reshape(PROJECTION_COUNT, size).astype(numpy.float32)
+
+
+
+##### ---------------------------------- REGISTERING ---------------------------------- #####
+
+classes = [
+    OBJECT_OT_shape_key_clean_up,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
@@ -0,0 +1,224 @@
+import bpy
+import csv
+import itertools
+import numpy
+
+from ..functions.mesh import (
+    KeyBlockIndex,
+    ShapeKeyMix,
+    editable_shape_keys,
+    set_shape_key_coordinates,
+)
+from ..functions.poll import (
+    has_shape_keys,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+
+
+# Memory that positions of a chunk of combinations can take, in bytes.
+CHUNK_SIZE = 256 * 1024 * 1024
+
+# Maximum number of combinations that grid can have.
+MAX_COMBINATIONS = 4096
+
+
+##### ---------------------------------- OPERATORS ---------------------------------- #####
+
+class OBJECT_OT_shape_key_bake_combinations(bpy.types.Operator):
+    bl_idname = "object.shape_key_bake_combinations"
+    bl_label = "Bake Shape Key Combinations"
+    bl_description = ("Create new shape keys with the shape of the mesh when shape keys are at given combinations of values,\n"
+                      "e.g. as a starting point for corrective shape keys. All combinations are mixed at once")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    source: bpy.props.EnumProperty(
+        name = "Combinations",
+        items = [('GRID', "Grid", ("Every combination of evenly spaced values of shape keys that currently have non-zero values,\n"
+                                   "from zero to their current value")),
+                 ('TEXT', "Table", ("Rows of a CSV table in the text datablock. First row has names of shape keys, and each next row their values.\n"
+                                    "If the first column is called 'name', it has names of new shape keys"))],
+        default = 'GRID',
+    )
+    steps: bpy.props.IntProperty(
+        name = "Steps",
+        description = "Number of values of each shape key in the grid (not counting zero)",
+        min = 1, soft_max = 4,
+        default = 1,
+    )
+    text: bpy.props.StringProperty(
+        name = "Text",
+        description = "Text datablock with the table of combinations",
+    )
+    name_prefix: bpy.props.StringProperty(
+        name = "Name Prefix",
+        description = "Prefix of names of new shape keys that don't have a name in the table",
+        default = "Combination",
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if not has_shape_keys(context.object):
+            return False
+        if not context.object.data.shape_keys.use_relative:
+            cls.poll_message_set("Only relative shape keys can be combined")
+            return False
+        return True
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        layout.prop(self, "source", expand=True)
+        if self.source == 'GRID':
+            layout.prop(self, "steps")
+        else:
+            layout.prop_search(self, "text", bpy.data, "texts")
+        layout.prop(self, "name_prefix")
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        shape_keys = obj.data.shape_keys
+        key_blocks = shape_keys.key_blocks
+
+        # Table of Values
+        if self.source == 'GRID':
+            names, table = self._grid_table(key_blocks)
+        else:
+            text = bpy.data.texts.get(self.text)
+            if text is None:
+                self.report({'ERROR'}, "Text with the table of combinations is not set")
+                return {'CANCELLED'}
+            try:
+                names, table = self._text_table(key_blocks, KeyBlockIndex(obj), text)
+            except ValueError as error:
+                self.report({'ERROR'}, str(error))
+                return {'CANCELLED'}
+
+        if len(table) == 0:
+            self.report({'INFO'}, "There are no combinations to bake")
+            return {'CANCELLED'}
+        if len(table) > MAX_COMBINATIONS:
+            self.report({'ERROR'}, f"Too many combinations ({len(table)}), maximum is {MAX_COMBINATIONS}")
+            return {'CANCELLED'}
+
+        count("keys", len(key_blocks))
+        count("vertices", len(obj.data.vertices))
+        count("combinations", len(table))
+
+        # Muted shape keys don't contribute to the mix.
+        slider_min = numpy.empty(len(key_blocks), dtype=numpy.float32)
+        slider_max = numpy.empty(len(key_blocks), dtype=numpy.float32)
+        mute = numpy.empty(len(key_blocks), dtype=bool)
+        key_blocks.foreach_get("slider_min", slider_min)
+        key_blocks.foreach_get("slider_max", slider_max)
+        key_blocks.foreach_get("mute", mute)
+        table = numpy.clip(table, slider_min, slider_max)
+        table[:, mute] = 0.0
+
+        # Only deltas of shape keys that take part in some combination are read.
+        used = numpy.flatnonzero(table.any(axis=0))
+        count("used_keys", len(used))
+
+        with editable_shape_keys(obj):
+            with phase("read_deltas"):
+                mix = ShapeKeyMix(obj, keys=used)
+
+            # Mix combinations in chunks, so that memory doesn't grow with the number of combinations.
+            chunk = max(1, CHUNK_SIZE // max(1, mix.basis.nbytes))
+            keys = KeyBlockIndex(obj)
+            for start in range(0, len(table), chunk):
+                with phase("mix"):
+                    coordinates = mix.evaluate(table[start:start + chunk])
+
+                for name, row in zip(names[start:start + chunk], coordinates):
+                    shape_key = keys.add(name=name)
+                    set_shape_key_coordinates(shape_key, row)
+
+        self.report({'INFO'}, f"{len(table)} shape key combinations baked")
+        return {'FINISHED'}
+
+
+    def _grid_table(self, key_blocks):
+        """Returns names and table of values of every combination of shape keys with non-zero values."""
+
+        keys = [i for i, key in enumerate(key_blocks) if i != 0 and key.value != 0.0 and not key.mute]
+        fractions = numpy.linspace(0.0, 1.0, self.steps + 1)
+
+        names = []
+        rows = []
+        for combination in itertools.product(range(self.steps + 1), repeat=len(keys)):
+            if not any(combination):
+                continue
+            row = numpy.zeros(len(key_blocks), dtype=numpy.float32)
+            for i, step in zip(keys, combination):
+                row[i] = key_blocks[i].value * fractions[step]
+            rows.append(row)
+            names.append(self.name_prefix + "_" + "_".join(f"{key_blocks[i].name}{row[i]:g}" for i in keys if row[i] != 0.0))
+
+            if len(rows) > MAX_COMBINATIONS:
+                break
+
+        return names, numpy.array(rows, dtype=numpy.float32).reshape(-1, len(key_blocks))
+
+
+    def _text_table(self, key_blocks, keys, text):
+        """Returns names and table of values read from the CSV table in the text datablock."""
+
+        reader = csv.reader(text.as_string().splitlines())
+        header = next(reader, None)
+        if not header:
+            raise ValueError(f"Text '{text.name}' is empty")
+
+        header = [cell.strip() for cell in header]
+        has_names = header[0].lower() == "name"
+        columns = []
+        for name in header[1:] if has_names else header:
+            index = keys.index(name)
+            if index == -1:
+                raise ValueError(f"Shape key '{name}' from the table doesn't exist")
+            columns.append(index)
+
+        names = []
+        rows = []
+        for line, cells in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in cells):
+                continue
+            name = cells[0].strip() if has_names else ""
+            cells = cells[1:] if has_names else cells
+            if len(cells) != len(columns):
+                raise ValueError(f"Row {line} of the table has {len(cells)} values instead of {len(columns)}")
+
+            row = numpy.zeros(len(key_blocks), dtype=numpy.float32)
+            try:
+                row[columns] = [float(cell) for cell in cells]
+            except ValueError:
+                raise ValueError(f"Row {line} of the table has values that aren't numbers")
+            rows.append(row)
+            names.append(name or f"{self.name_prefix}_{len(rows):03d}")
+
+        return names, numpy.array(rows, dtype=numpy.float32).reshape(-1, len(key_blocks))
+
+
+
+##### ---------------------------------- REGISTERING ---------------------------------- #####
+
+classes = [
+    OBJECT_OT_shape_key_bake_combinations,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
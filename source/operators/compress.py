@@ -0,0 +1,277 @@
+import bpy
+import numpy
+
+from ..functions.animation import (
+    ensure_shape_key_fcurve,
+    write_keyframes,
+)
+from ..functions.drivers import (
+    DriverIndex,
+)
+from ..functions.mesh import (
+    KeyBlockIndex,
+    get_shape_key_coordinates,
+    get_shape_key_delta,
+    set_shape_key_coordinates,
+)
+from ..functions.poll import (
+    has_shape_keys,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+from ..functions.sampling import (
+    frame_range,
+    sample_shape_key_values,
+)
+
+
+# Maximum length of driver expression, as stored by Blender.
+MAX_EXPRESSION_LENGTH = 255
+
+
+##### ---------------------------------- OPERATORS ---------------------------------- #####
+
+class OBJECT_OT_shape_key_compress(bpy.types.Operator):
+    bl_idname = "object.shape_key_compress"
+    bl_label = "Compress Shape Keys"
+    bl_description = ("Replace shape keys with smaller number of component shape keys that reproduce them (principal component analysis).\n"
+                      "Only shape keys relative to basis and without vertex groups are compressed.\n"
+                      "Values of the original shape keys are reproduced either with baked animation or with drivers")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    max_error: bpy.props.FloatProperty(
+        name = "Max Error",
+        description = "Largest allowed reconstruction error, relative to the size of all shape key deformations combined",
+        subtype = 'PERCENTAGE',
+        min = 0.0, max = 100.0,
+        default = 1.0,
+    )
+    max_components: bpy.props.IntProperty(
+        name = "Max Components",
+        description = "Largest number of component shape keys to create (0 means no limit, only error is considered)",
+        min = 0,
+        default = 0,
+    )
+    prefix: bpy.props.StringProperty(
+        name = "Prefix",
+        description = "Name prefix of the component shape keys",
+        default = "Component",
+    )
+
+    method: bpy.props.EnumProperty(
+        name = "Values",
+        description = "How values of the original shape keys are transferred to the component shape keys",
+        items = [('BAKE', "Bake", ("Sample values of the original shape keys within the frame range and bake them\n"
+                                   "into component shape keys. Original shape keys are removed")),
+                 ('DRIVERS', "Drivers", ("Drive component shape keys with values of the original shape keys.\n"
+                                         "Original shape keys are muted and kept as controls"))],
+        default = 'BAKE',
+    )
+    frame_start: bpy.props.IntProperty(
+        name = "Start Frame",
+        min = 1,
+        default = 1,
+    )
+    frame_end: bpy.props.IntProperty(
+        name = "End Frame",
+        min = 1,
+        default = 100,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if not has_shape_keys(context.object):
+            return False
+        if context.mode != 'OBJECT':
+            cls.poll_message_set("Shape keys can only be compressed in Object Mode")
+            return False
+        return True
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        layout.prop(self, "max_error")
+        layout.prop(self, "max_components")
+        layout.prop(self, "prefix")
+
+        layout.separator()
+        layout.prop(self, "method", expand=True)
+        row = layout.row()
+        row.prop(self, "frame_start", text="Frame Range")
+        row.prop(self, "frame_end", text="")
+        if self.method != 'BAKE':
+            row.enabled = False
+
+    def invoke(self, context, event):
+        self.frame_start = context.scene.frame_start
+        self.frame_end = context.scene.frame_end
+
+        return context.window_manager.invoke_props_dialog(self)
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        shape_keys = obj.data.shape_keys
+        key_blocks = shape_keys.key_blocks
+        basis = shape_keys.reference_key
+
+        if self.method == 'BAKE' and self.frame_start > self.frame_end:
+            self.report({'ERROR'}, "Start frame cannot be higher than the end frame")
+            return {'CANCELLED'}
+
+        # Shape keys other shape keys are relative to can't be removed without changing them, muted ones don't do anything.
+        relative_keys = {key.relative_key.name for key in key_blocks if key.relative_key != key}
+        keys = [key for key in key_blocks[1:] if key.relative_key == basis and not key.vertex_group and
+                not key.mute and key.name not in relative_keys]
+        if len(keys) < 2:
+            self.report({'INFO'}, "Not enough shape keys relative to basis to compress")
+            return {'CANCELLED'}
+
+        count("keys", len(keys))
+        count("vertices", len(obj.data.vertices))
+
+        key_index = KeyBlockIndex(obj)
+
+        # Build Delta Matrix
+        with phase("read_deltas"):
+            deltas = numpy.stack([get_shape_key_delta(key) for key in keys])
+
+        # Truncated SVD
+        # Decomposing (keys x keys) gram matrix is much cheaper than decomposing (keys x vertices) delta matrix.
+        with phase("decompose"):
+            eigenvalues, eigenvectors = numpy.linalg.eigh(deltas.astype(numpy.float64) @ deltas.T.astype(numpy.float64))
+            order = numpy.argsort(eigenvalues)[::-1]
+            singular_values = numpy.sqrt(numpy.clip(eigenvalues[order], 0.0, None))
+            weights = eigenvectors[:, order]
+
+            # relative_error[m] is error when m components are kept.
+            energy = singular_values ** 2
+            total_energy = energy.sum()
+            if total_energy == 0.0:
+                self.report({'INFO'}, "Shape keys don't deform the mesh")
+                return {'CANCELLED'}
+            relative_error = numpy.sqrt(numpy.clip(1.0 - numpy.cumsum(energy) / total_energy, 0.0, None))
+            relative_error = numpy.concatenate(([1.0], relative_error))
+
+            components = int(numpy.argmax(relative_error <= self.max_error / 100.0))
+            if relative_error[components] > self.max_error / 100.0:
+                components = len(keys)
+            if self.max_components:
+                components = min(components, self.max_components)
+            components = max(components, 1)
+
+            if components >= len(keys):
+                self.report({'INFO'}, f"Shape keys can't be compressed within {self.max_error}% error")
+                return {'CANCELLED'}
+
+            # Component deformations, scaled so that component values stay within -1 and 1.
+            weights = weights[:, :components]
+            component_deltas = (weights.T @ deltas.astype(numpy.float64))
+            value_limits = numpy.array([max(abs(key.slider_min), abs(key.slider_max)) for key in keys])
+            scale = numpy.abs(weights).T @ value_limits
+            scale[scale == 0.0] = 1.0
+            component_deltas *= scale[:, numpy.newaxis]
+            coefficients = weights / scale
+
+        # Measure Error
+        with phase("measure_error"):
+            max_vertex_error = 0.0
+            for delta, key_coefficients in zip(deltas, coefficients):
+                residual = delta - key_coefficients @ component_deltas
+                max_vertex_error = max(max_vertex_error, numpy.linalg.norm(residual.reshape(-1, 3), axis=1).max())
+
+        # Drivers
+        expressions = []
+        if self.method == 'DRIVERS':
+            for component_coefficients in coefficients.T:
+                expression = " + ".join(f"{coefficient:.6g} * v{i}" for i, coefficient in enumerate(component_coefficients)
+                                        if abs(coefficient) > 1e-6)
+                if len(expression) > MAX_EXPRESSION_LENGTH:
+                    self.report({'ERROR'}, "Too many shape keys to reproduce with drivers, use 'Bake' instead")
+                    return {'CANCELLED'}
+                expressions.append(expression or "0.0")
+
+        # Bake Values
+        baked_values = None
+        if self.method == 'BAKE':
+            initial_frame = context.scene.frame_current
+            frames = frame_range(self.frame_start, self.frame_end)
+            indices = [key_index.index(key.name) for key in keys]
+
+            baked_values = numpy.empty((len(frames), components), dtype=numpy.float32)
+            offset = 0
+            for chunk, values, __ in sample_shape_key_values(context.scene, [obj], frames):
+                # Project (frames x keys) weight curves onto components.
+                baked_values[offset:offset + len(chunk)] = values[0][:, indices] @ coefficients
+                offset += len(chunk)
+            context.scene.frame_set(initial_frame)
+
+            current_values = numpy.array([key.value for key in keys]) @ coefficients
+
+        # Create Component Shape Keys
+        with phase("create_components"):
+            basis_coordinates = get_shape_key_coordinates(basis)
+            components_keys = []
+            for i, component_delta in enumerate(component_deltas):
+                component = key_index.add(name=f"{self.prefix}_{i:03d}")
+                set_shape_key_coordinates(component, basis_coordinates + component_delta)
+                component.slider_min = -1.0
+                component.slider_max = 1.0
+                component.relative_key = basis
+                components_keys.append(component)
+
+        if self.method == 'BAKE':
+            for i, component in enumerate(components_keys):
+                component.value = current_values[i]
+                if shape_keys.animation_data is not None:
+                    fcurve = ensure_shape_key_fcurve(shape_keys, component, int(frames[0]))
+                    write_keyframes(fcurve, frames, baked_values[:, i], interpolation='LINEAR', replace=True)
+
+            drivers = DriverIndex(shape_keys)
+            key_index.remove_many(keys, drivers=drivers)
+
+        elif self.method == 'DRIVERS':
+            for component, expression in zip(components_keys, expressions):
+                fcurve = component.driver_add("value")
+                driver = fcurve.driver
+                driver.type = 'SCRIPTED'
+                for i, key in enumerate(keys):
+                    if f"v{i} " not in expression + " ":
+                        continue
+                    variable = driver.variables.new()
+                    variable.name = f"v{i}"
+                    variable.type = 'SINGLE_PROP'
+                    variable.targets[0].id_type = 'KEY'
+                    variable.targets[0].id = shape_keys
+                    variable.targets[0].data_path = f'key_blocks["{key.name}"].value'
+                driver.expression = expression
+
+            for key in keys:
+                key.mute = True
+
+        obj.active_shape_key_index = len(key_blocks) - 1
+
+        self.report({'INFO'}, (f"{len(keys)} shape keys compressed into {components} "
+                               f"(error {relative_error[components]:.2%}, largest vertex error {max_vertex_error:.5f})"))
+        return {'FINISHED'}
+
+
+
+##### ---------------------------------- REGISTERING ---------------------------------- #####
+
+classes = [
+    OBJECT_OT_shape_key_compress,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
@@ -1,5 +1,20 @@
 import bpy
 
+from ..functions.animation import (
+    copy_shape_key_animation,
+)
+from ..functions.mesh import (
+    KeyBlockIndex,
+    get_shape_key_coordinates,
+    get_shape_key_properties,
+    set_shape_key_coordinates,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+
 
 ##### ---------------------------------- OPERATORS ---------------------------------- #####
 
@@ -25,6 +40,13 @@ class OBJECT_OT_shape_key_transfer_all(bpy.types.Operator):
         default = False,
     )
 
+    copy_animation: bpy.props.BoolProperty(
+        name = "Copy Animation",
+        description = ("Copy f-curves and drivers of shape keys as well.\n"
+                       "Driver variables that read shape keys of the source object will read the ones of the active object"),
+        default = True,
+    )
+
     @classmethod
     def poll(cls, context):
         if not context.active_object:
@@ -36,6 +58,7 @@ class OBJECT_OT_shape_key_transfer_all(bpy.types.Operator):
         else:
             return True
 
+    @profiled
     def execute(self, context):
         sources = context.selected_objects
         target = context.active_object
@@ -47,54 +70,104 @@ class OBJECT_OT_shape_key_transfer_all(bpy.types.Operator):
                 continue
             if not source.data.shape_keys or len(source.data.shape_keys.key_blocks) < 2:
                 continue
+            count("objects")
 
             # filter_shape_keys
-            if self.existing_only:
-                if not target.data.shape_keys:
-                    filtered_keys = []
-                else:
-                    filtered_keys = [key for key in source.data.shape_keys.key_blocks[1:] if key.name in target.data.shape_keys.key_blocks]
-            else:
-                filtered_keys = source.data.shape_keys.key_blocks[1:]
-
-
-            for key in filtered_keys:
+            target_keys = KeyBlockIndex(target)
+            keys = []
+            for key in source.data.shape_keys.key_blocks[1:]:
                 if key.lock_shape:
                     continue
-                if self.existing_only and key.name not in target.data.shape_keys.key_blocks:
+                if self.existing_only and key.name not in target_keys:
                     continue
+                keys.append(key)
+
+            if len(keys) == 0:
+                continue
 
-                # Create Basis
-                if target.data.shape_keys is None:
-                    basis = target.shape_key_add(from_mix=False)
-                    basis.name = "Basis"
-
-                # Add New Shape Key & Transfer Values
-                if self.existing_only:
-                    copy = target.data.shape_keys.key_blocks[key.name]
-                else:
-                    copy = target.shape_key_add(from_mix=False)
-
-                copy.name = key.name
-                copy.slider_min = key.slider_min
-                copy.slider_max = key.slider_max
-                copy.mute = key.mute
-
-                if key.vertex_group != None and key.vertex_group in target.vertex_groups:
-                    copy.vertex_group = str(key.vertex_group)
-                if key.relative_key.name in target.data.shape_keys.key_blocks:
-                    copy.relative_key = target.data.shape_keys.key_blocks[key.relative_key.name]
+            # Create Basis
+            if target.data.shape_keys is None:
+                target_keys.add(name="Basis")
+            source_shape_keys = source.data.shape_keys
+            target_shape_keys = target.data.shape_keys
+
+            # Read Source Key Graph
+            # Relations are stored as names, and resolved after all target shape keys exist,
+            # so that shape keys can be relative to the ones that come after them.
+            with phase("read_graph"):
+                properties = []
+                for key in keys:
+                    key_properties = get_shape_key_properties(key)
+                    key_properties["relative_key"] = key.relative_key.name
+                    properties.append(key_properties)
+
+            # Read Vertex Positions
+            with phase("read_positions"):
+                if not self.existing_only:
+                    # New shape keys are created from the basis, so vertices missing on source keep basis positions.
+                    basis_coordinates = get_shape_key_coordinates(target_shape_keys.reference_key)
+
+                coordinates = []
+                for key in keys:
+                    if self.existing_only:
+                        target_coordinates = get_shape_key_coordinates(target_keys.get(key.name))
+                    else:
+                        target_coordinates = basis_coordinates
+                    coordinates.append(_transfer_coordinates(get_shape_key_coordinates(key), target_coordinates))
+
+            # Create Shape Keys
+            # Names of source shape keys mapped to names of their copies, which Blender makes unique if they're taken.
+            names = {}
+            copies = []
+            for key in keys:
+                copy = target_keys.get(key.name) if self.existing_only else target_keys.add(name=key.name)
+                names[key.name] = copy.name
+                copies.append(copy)
+
+            # Resolve Relations & Transfer Values
+            relative_names = {source_shape_keys.reference_key.name: target_shape_keys.reference_key.name, **names}
+            vertex_groups = set(target.vertex_groups.keys())
+            for copy, key_properties, key_coordinates in zip(copies, properties, coordinates):
+                # Slider range is set first, so that value isn't clamped by the previous range.
+                copy.slider_min = key_properties["slider_min"]
+                copy.slider_max = key_properties["slider_max"]
+                copy.mute = key_properties["mute"]
+                copy.interpolation = key_properties["interpolation"]
+
+                relative_key = target_keys.get(relative_names.get(key_properties["relative_key"], key_properties["relative_key"]))
+                if relative_key is not None:
+                    copy.relative_key = relative_key
+                if key_properties["vertex_group"] in vertex_groups:
+                    copy.vertex_group = key_properties["vertex_group"]
                 if self.copy_values:
-                    copy.value = key.value
+                    copy.value = key_properties["value"]
+
+                # Write Vertex Positions
+                with phase("copy_positions"):
+                    set_shape_key_coordinates(copy, key_coordinates)
+                count("keys")
+                count("vertices", len(copy.data))
 
-                # Transfer Vertex Positions
-                for source_vert, target_vert in zip(key.data, copy.data):
-                    target_vert.co = source_vert.co
+            # Copy Animation
+            if self.copy_animation:
+                copy_shape_key_animation(source_shape_keys, target_shape_keys, names)
 
         self.report({'INFO'}, f"Shape keys copied from selected objects to '{target.name}'")
         return {'FINISHED'}
 
 
+def _transfer_coordinates(source_coordinates, target_coordinates):
+    """Returns target vertex positions with the ones that have matching index in source replaced by source positions."""
+
+    if len(source_coordinates) == len(target_coordinates):
+        return source_coordinates
+
+    coordinates = target_coordinates.copy()
+    size = min(len(source_coordinates), len(target_coordinates))
+    coordinates[:size] = source_coordinates[:size]
+
+    return coordinates
+
 
 ##### ---------------------------------- REGISTRATION ---------------------------------- #####
 
@@ -1,17 +1,26 @@
 import bpy
+import re
 
 from ..functions.animation import (
     transfer_animation,
 )
+from ..functions.drivers import (
+    validate_replacement,
+)
 from ..functions.mesh import (
+    KeyBlockIndex,
+    copy_shape_key_data,
+    editable_shape_keys,
     store_active_shape_key,
     set_shape_key_values,
-    duplicate_shape_key,
-    reposition_shape_key,
 )
 from ..functions.poll import (
     has_shape_keys,
 )
+from ..functions.profiling import (
+    count,
+    profiled,
+)
 
 
 ##### ---------------------------------- OPERATORS ---------------------------------- #####
@@ -22,30 +31,56 @@ class OBJECT_OT_shape_key_duplicate(bpy.types.Operator):
     bl_description = "Make a duplicated copy of an active shape key with its animation & drivers"
     bl_options = {'REGISTER', 'UNDO'}
 
+    driver_pattern: bpy.props.StringProperty(
+        name = "Retarget Drivers",
+        description = ("Regular expression that is replaced in bones, objects, and data paths that driver variables of the new shape key read,\n"
+                       "e.g. '_L$' to point the driver of a mirrored shape key to the other side. Leave empty to copy drivers as they are"),
+        default = "",
+    )
+    driver_replacement: bpy.props.StringProperty(
+        name = "Replace With",
+        description = "Text that matches of the pattern are replaced with",
+        default = "",
+    )
+
     @classmethod
     def poll(cls, context):
         return has_shape_keys(context.object)
 
+    @profiled
     def execute(self, context):
         obj = context.object
         shape_keys = obj.data.shape_keys
         active_index = obj.active_shape_key_index
-        mode = obj.mode
 
         if active_index == 0:
             self.report({'INFO'}, "Basis shape key can't be duplicated")
             return {'CANCELLED'}
 
-        # Get the active shape key and its properties
-        original_shape_key, sk_properties = store_active_shape_key(obj)
+        try:
+            validate_replacement(self.driver_pattern, self.driver_replacement)
+        except re.error as error:
+            self.report({'ERROR'}, f"Invalid driver retarget pattern: {error}")
+            return {'CANCELLED'}
+
+        count("keys", len(shape_keys.key_blocks))
+        count("vertices", len(obj.data.vertices))
+
+        # Edit Mode is left once for the whole operation, since new shape key is moved.
+        with editable_shape_keys(obj, object_mode=True):
+            # Get the active shape key and its properties
+            original_shape_key, sk_properties = store_active_shape_key(obj)
 
-        # Duplicate shape key and transfer properties & animation
-        dupe_shape_key = duplicate_shape_key(obj)
-        set_shape_key_values(dupe_shape_key, sk_properties)
-        transfer_animation(shape_keys, original_shape_key, dupe_shape_key)
+            # Duplicate shape key and transfer properties & animation
+            keys = KeyBlockIndex(obj)
+            dupe_shape_key = keys.add(name=sk_properties["name"])
+            copy_shape_key_data(original_shape_key, dupe_shape_key)
+            set_shape_key_values(dupe_shape_key, sk_properties, name=dupe_shape_key.name)
+            transfer_animation(shape_keys, original_shape_key, dupe_shape_key,
+                               replacements=[(self.driver_pattern, self.driver_replacement)])
 
-        # Move the shape key to the correct position in the UI
-        reposition_shape_key(obj, shape_keys, active_index, dupe_shape_key, mode=mode)
+            # Move the shape key to the correct position in the UI
+            keys.move(dupe_shape_key, active_index + 1)
 
         return {'FINISHED'}
 
@@ -1,19 +1,22 @@
 import bpy
 
-from ..functions.animation import (
-    transfer_animation,
+from ..functions.drivers import (
+    DriverIndex,
 )
 from ..functions.mesh import (
-    set_active_shape_key,
+    EditShapeLayers,
+    KeyBlockIndex,
+    apply_mix_to_shape_key,
+    editable_shape_keys,
     store_shape_key_values,
-    store_active_shape_key,
-    set_shape_key_values,
-    remove_shape_key,
-    reposition_shape_key,
 )
 from ..functions.poll import (
     has_shape_keys,
 )
+from ..functions.profiling import (
+    count,
+    profiled,
+)
 
 
 ##### ---------------------------------- OPERATORS ---------------------------------- #####
@@ -37,11 +40,11 @@ class OBJECT_OT_shape_key_merge_all(bpy.types.Operator):
     def poll(cls, context):
         return has_shape_keys(context.object)
 
+    @profiled
     def execute(self, context):
         obj = context.object
         shape_keys = obj.data.shape_keys
         active_index = obj.active_shape_key_index
-        mode = obj.mode
 
         if (active_index == 0) or (active_index == 1 and self.direction == 'TOP'):
             self.report({'INFO'}, "Basis shape key can't be merged with anything")
@@ -51,58 +54,60 @@ class OBJECT_OT_shape_key_merge_all(bpy.types.Operator):
             self.report({'INFO'}, "No shape keys below to merge with")
             return {'CANCELLED'}
 
-        if mode == 'EDIT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        # Get shape keys and their properties
-        sk_values = store_shape_key_values(obj)
-        original_shape_key, sk_properties = store_active_shape_key(obj)
-
-        # Filter shape keys
-        shape_keys_above = []
-        shape_keys_below = []
-        for i, key in enumerate(shape_keys.key_blocks):
-            if i == active_index or i == 0:
-                continue
-            if i < active_index:
-                shape_keys_above.append(key)
-            else:
-                shape_keys_below.append(key)
-
-        # Merge Up
-        if self.direction == 'TOP':
-            for shape_key in shape_keys_below:
-                shape_key.value = 0.0
-
-            merged_shape_key = obj.shape_key_add(from_mix=True)
-            set_active_shape_key(obj, merged_shape_key)
-            bpy.ops.object.shape_key_move(type='TOP')
-
-        # Merge Down
-        elif self.direction == 'DOWN':
-            for shape_key in shape_keys_above:
+        count("keys", len(shape_keys.key_blocks))
+        count("vertices", len(obj.data.vertices))
+
+        # Active shape key is merged in place, so it keeps its position, properties, and animation.
+        # Merging down in Edit Mode doesn't change index of the active shape key, so merged positions are written
+        # straight to BMesh shape layers. Otherwise Edit Mode is left once for the whole operation.
+        if self.direction == 'DOWN':
+            original_shape_key = obj.active_shape_key
+            shape_keys_below = shape_keys.key_blocks[active_index + 1:]
+            if EditShapeLayers.available(obj, [original_shape_key, *shape_keys_below]):
+                layers = EditShapeLayers(obj)
+                layers.set_coordinates(original_shape_key, layers.mix([original_shape_key, *shape_keys_below]))
+                for shape_key in shape_keys_below:
+                    layers.remove(shape_key)
+                layers.update()
+
+                keys = KeyBlockIndex(obj)
+                keys.remove_many(shape_keys_below, drivers=DriverIndex(shape_keys))
+                keys.rename(original_shape_key, original_shape_key.name + ".merged")
+                return {'FINISHED'}
+
+        with editable_shape_keys(obj, object_mode=True):
+            # Get shape keys and their values
+            sk_values = store_shape_key_values(obj)
+            original_shape_key = obj.active_shape_key
+
+            # Filter shape keys
+            shape_keys_above = []
+            shape_keys_below = []
+            for i, key in enumerate(shape_keys.key_blocks):
+                if i == active_index or i == 0:
+                    continue
+                if i < active_index:
+                    shape_keys_above.append(key)
+                else:
+                    shape_keys_below.append(key)
+
+            # Merge Up / Down
+            for shape_key in (shape_keys_below if self.direction == 'TOP' else shape_keys_above):
                 shape_key.value = 0.0
+            apply_mix_to_shape_key(obj, original_shape_key)
 
-            merged_shape_key = obj.shape_key_add(from_mix=True)
-
-        # Transfer properties & animation
-        set_shape_key_values(merged_shape_key, sk_properties, name=sk_properties["name"] + ".merged")
-        transfer_animation(shape_keys, original_shape_key, merged_shape_key)
-
-        # Remove shape keys
-        filtered_shape_keys = shape_keys_above if self.direction == 'TOP' else shape_keys_below
-        for shape_key in filtered_shape_keys + [original_shape_key]:
-            remove_shape_key(obj, shape_key)
+            # Remove shape keys
+            filtered_shape_keys = shape_keys_above if self.direction == 'TOP' else shape_keys_below
+            keys = KeyBlockIndex(obj)
+            drivers = DriverIndex(shape_keys)
+            keys.remove_many(filtered_shape_keys, drivers=drivers)
 
-        # Restore values
-        for shape_key in shape_keys.key_blocks:
-            shape_key.value = sk_values.get(shape_key.name, 0.0)
+            # Restore values
+            for shape_key in shape_keys.key_blocks:
+                shape_key.value = sk_values.get(shape_key.name, 0.0)
 
-        merged_shape_key.value = sk_properties["value"]
-        set_active_shape_key(obj, merged_shape_key)
-
-        if mode == 'EDIT':
-            bpy.ops.object.mode_set(mode=mode)
+            keys.rename(original_shape_key, original_shape_key.name + ".merged")
+            keys.set_active(original_shape_key)
 
         return {'FINISHED'}
 
@@ -126,11 +131,11 @@ class OBJECT_OT_shape_key_merge(bpy.types.Operator):
     def poll(cls, context):
         return has_shape_keys(context.object)
 
+    @profiled
     def execute(self, context):
         obj = context.object
         shape_keys = obj.data.shape_keys
         active_index = obj.active_shape_key_index
-        mode = context.object.mode
 
         if (active_index == 0) or (active_index == 1 and self.direction == 'TOP'):
             self.report({'INFO'}, "Basis shape key can't be merged with anything")
@@ -140,47 +145,51 @@ class OBJECT_OT_shape_key_merge(bpy.types.Operator):
             self.report({'INFO'}, "No shape keys below to merge with")
             return {'CANCELLED'}
 
-        if mode == 'EDIT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        # Get shape keys and their properties
-        sk_values = store_shape_key_values(obj)
-        original_shape_key, sk_properties = store_active_shape_key(obj)
-        above_shape_key = shape_keys.key_blocks[active_index - 1]
-        below_shape_key = shape_keys.key_blocks[active_index + 1] if active_index != len(shape_keys.key_blocks) - 1 else None
-
-        # New Shape Key from Mix
-        for shape_key in shape_keys.key_blocks:
-            if shape_key == original_shape_key:
-                continue
-            if ((self.direction == 'TOP' and shape_key != above_shape_key) or
-                (self.direction == 'DOWN' and shape_key != below_shape_key)):
-                    shape_key.value = 0.0
-
-        merged_shape_key = obj.shape_key_add(from_mix=True)
-
-        # Transfer properties & animation
-        set_shape_key_values(merged_shape_key, sk_properties, name=sk_properties["name"] + ".merged")
-        transfer_animation(shape_keys, original_shape_key, merged_shape_key)
-
-        # Move the shape key to the correct position in the UI
-        reposition_shape_key(obj, shape_keys, active_index, merged_shape_key,
-                             mode=mode, offset=0 if self.direction=='TOP' else 1)
+        count("keys", len(shape_keys.key_blocks))
+        count("vertices", len(obj.data.vertices))
+
+        # Active shape key is merged in place, so it keeps its position, properties, and animation.
+        # Merging down in Edit Mode doesn't change index of the active shape key, so merged positions are written
+        # straight to BMesh shape layers. Otherwise Edit Mode is left once for the whole operation.
+        if self.direction == 'DOWN':
+            original_shape_key = obj.active_shape_key
+            merged_with = shape_keys.key_blocks[active_index + 1]
+            if EditShapeLayers.available(obj, [original_shape_key, merged_with]):
+                layers = EditShapeLayers(obj)
+                layers.set_coordinates(original_shape_key, layers.mix([original_shape_key, merged_with]))
+                layers.remove(merged_with)
+                layers.update()
+
+                keys = KeyBlockIndex(obj)
+                keys.remove(merged_with)
+                keys.rename(original_shape_key, original_shape_key.name + ".merged")
+                return {'FINISHED'}
+
+        with editable_shape_keys(obj, object_mode=True):
+            # Get shape keys and their values
+            sk_values = store_shape_key_values(obj)
+            original_shape_key = obj.active_shape_key
+            if self.direction == 'TOP':
+                merged_with = shape_keys.key_blocks[active_index - 1]
+            else:
+                merged_with = shape_keys.key_blocks[active_index + 1]
 
-        # Remove shape keys
-        filtered_shape_keys = [original_shape_key, above_shape_key if self.direction=='TOP' else below_shape_key]
-        for shape_key in filtered_shape_keys:
-            remove_shape_key(obj, shape_key)
+            # Mix of the two Shape Keys
+            for shape_key in shape_keys.key_blocks:
+                if shape_key not in (original_shape_key, merged_with):
+                    shape_key.value = 0.0
+            apply_mix_to_shape_key(obj, original_shape_key)
 
-        # Restore values
-        for shape_key in shape_keys.key_blocks:
-            shape_key.value = sk_values.get(shape_key.name, 0.0)
+            # Remove shape key
+            keys = KeyBlockIndex(obj)
+            keys.remove(merged_with)
 
-        merged_shape_key.value = sk_properties["value"]
-        set_active_shape_key(obj, merged_shape_key)
+            # Restore values
+            for shape_key in shape_keys.key_blocks:
+                shape_key.value = sk_values.get(shape_key.name, 0.0)
 
-        if mode == 'EDIT':
-            bpy.ops.object.mode_set(mode=mode)
+            keys.rename(original_shape_key, original_shape_key.name + ".merged")
+            keys.set_active(original_shape_key)
 
         return {'FINISHED'}
 
@@ -0,0 +1,211 @@
+import bpy
+import re
+
+from ..functions.animation import (
+    transfer_animation,
+)
+from ..functions.drivers import (
+    DriverIndex,
+    validate_replacement,
+)
+from ..functions.mesh import (
+    KeyBlockIndex,
+    editable_shape_keys,
+    get_shape_key_coordinates,
+    get_shape_key_properties,
+    set_shape_key_coordinates,
+    set_shape_key_values,
+)
+from ..functions.poll import (
+    has_shape_keys,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+from ..functions.symmetry import (
+    get_symmetry_map,
+    mirror_coordinates,
+)
+
+
+##### ---------------------------------- OPERATORS ---------------------------------- #####
+
+class OBJECT_OT_shape_key_mirror_copy(bpy.types.Operator):
+    bl_idname = "object.shape_key_mirror_copy"
+    bl_label = "Mirror Shape Keys"
+    bl_description = ("Create mirrored copies of shape keys, e.g. '_R' shape keys from '_L' ones, with their animation & drivers.\n"
+                      "Symmetry of the mesh is found once and reused until the basis shape key changes")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    keys: bpy.props.EnumProperty(
+        name = "Shape Keys",
+        items = [('ACTIVE', "Active", "Mirror the active shape key"),
+                 ('MATCHING', "Matching", "Mirror all shape keys with names that match the pattern")],
+        default = 'ACTIVE',
+    )
+    name_pattern: bpy.props.StringProperty(
+        name = "Name Pattern",
+        description = ("Regular expression that is replaced in names of mirrored shape keys (and their vertex groups and drivers).\n"
+                       "Mirrored shape keys that already exist are overwritten"),
+        default = "_L$",
+    )
+    name_replacement: bpy.props.StringProperty(
+        name = "Replace With",
+        description = "Text that matches of the pattern are replaced with",
+        default = "_R",
+    )
+
+    axis: bpy.props.EnumProperty(
+        name = "Axis",
+        description = "Local axis to mirror across",
+        items = [('X', "X", ""),
+                 ('Y', "Y", ""),
+                 ('Z', "Z", "")],
+        default = 'X',
+    )
+    tolerance: bpy.props.FloatProperty(
+        name = "Tolerance",
+        description = "Maximum distance between a vertex and the mirrored position of its counterpart",
+        subtype = 'DISTANCE', unit = 'LENGTH',
+        min = 0.0, soft_max = 0.01,
+        default = 0.0001,
+        precision = 5,
+    )
+
+    transfer_animation: bpy.props.BoolProperty(
+        name = "Transfer Animation",
+        description = ("Copy animation & drivers to newly created mirrored shape keys.\n"
+                       "Name pattern is also applied to bones, objects, and data paths that drivers read"),
+        default = True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if not has_shape_keys(context.object):
+            return False
+        if context.object.type != 'MESH':
+            cls.poll_message_set("Only shape keys of meshes can be mirrored")
+            return False
+        return True
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        layout.prop(self, "keys", expand=True)
+        col = layout.column(align=True)
+        col.prop(self, "name_pattern")
+        col.prop(self, "name_replacement")
+
+        layout.separator()
+        layout.row().prop(self, "axis", expand=True)
+        layout.prop(self, "tolerance")
+        layout.prop(self, "transfer_animation")
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        shape_keys = obj.data.shape_keys
+        key_blocks = shape_keys.key_blocks
+
+        try:
+            pattern = re.compile(self.name_pattern)
+            validate_replacement(self.name_pattern, self.name_replacement)
+        except re.error as error:
+            self.report({'ERROR'}, f"Invalid name pattern or replacement: {error}")
+            return {'CANCELLED'}
+
+        # Shape keys to mirror
+        if self.keys == 'ACTIVE':
+            if obj.active_shape_key_index == 0:
+                self.report({'INFO'}, "Basis shape key can't be mirrored")
+                return {'CANCELLED'}
+            sources = [obj.active_shape_key]
+        else:
+            sources = [key for key in key_blocks[1:] if self.name_pattern and pattern.search(key.name)]
+            if not sources:
+                self.report({'INFO'}, "No shape keys match the name pattern")
+                return {'CANCELLED'}
+
+        count("keys", len(sources))
+        count("vertices", len(obj.data.vertices))
+
+        key_index = KeyBlockIndex(obj)
+        drivers = DriverIndex(shape_keys)
+        replacements = [(self.name_pattern, self.name_replacement)]
+
+        with editable_shape_keys(obj):
+            symmetry = get_symmetry_map(obj, self.axis, self.tolerance)
+
+            reference_coordinates = {}
+            unmasked = []
+            mirrored = 0
+            for source in sources:
+                name = pattern.sub(self.name_replacement, source.name) if self.name_pattern else source.name
+                if name == source.name:
+                    name = source.name + ".mirror"
+
+                # Create Mirrored Shape Key
+                target = key_index.get(name)
+                created = target is None
+                if created:
+                    target = key_index.add(name=name)
+                    set_shape_key_values(target, get_shape_key_properties(source), name=name)
+
+                    # Mirrored vertex group
+                    # Without the mirrored group, source group would mask the mirrored deformation on the other side.
+                    if source.vertex_group:
+                        vertex_group = pattern.sub(self.name_replacement, source.vertex_group) if self.name_pattern else ""
+                        if vertex_group not in obj.vertex_groups or vertex_group == source.vertex_group:
+                            vertex_group = ""
+                            unmasked.append(target.name)
+                        target.vertex_group = vertex_group
+
+                # Mirror Deformation
+                relative_key = source.relative_key
+                if relative_key.name not in reference_coordinates:
+                    reference_coordinates[relative_key.name] = get_shape_key_coordinates(relative_key)
+                with phase("mirror"):
+                    coordinates = mirror_coordinates(get_shape_key_coordinates(source), reference_coordinates[relative_key.name],
+                                                     symmetry, self.axis)
+                set_shape_key_coordinates(target, coordinates)
+
+                # Transfer Animation
+                if created and self.transfer_animation:
+                    transfer_animation(shape_keys, source, target, replacements=replacements, drivers=drivers)
+
+                mirrored += 1
+
+        if unmasked:
+            print(f"Mirrored vertex groups don't exist, these shape keys were left without one: {', '.join(unmasked)}")
+
+        unmatched = int((symmetry < 0).sum())
+        if unmasked:
+            self.report({'WARNING'}, (f"{mirrored} shape keys mirrored. {len(unmasked)} of them were left without a vertex group, "
+                                      "because mirrored vertex group doesn't exist. Check console for details"))
+        elif unmatched:
+            self.report({'WARNING'}, (f"{mirrored} shape keys mirrored. {unmatched} vertices don't have a mirrored counterpart "
+                                      "within the tolerance, and were left in place"))
+        else:
+            self.report({'INFO'}, f"{mirrored} shape keys mirrored")
+
+        return {'FINISHED'}
+
+
+
+##### ---------------------------------- REGISTERING ---------------------------------- #####
+
+classes = [
+    OBJECT_OT_shape_key_mirror_copy,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
@@ -1,21 +1,63 @@
 import bpy
 import numpy
+import os
 
 from ..functions.animation import (
     ensure_channelbag,
+    get_keyframed_frames,
+)
+from ..functions.jobs import (
+    ChunkedJob,
+    ModalJob,
+)
+from ..functions.mesh import (
+    get_cached_mix,
+    get_mesh_coordinates,
+    get_shape_key_coordinates,
+    get_shape_key_mix,
+    get_mesh_region,
+    get_vertex_group_weights,
+    hash_coordinates,
+    mix_cache_limit,
+    new_mesh_from_region,
+    quantize_values,
+)
+from ..functions.parallel import (
+    parallel_map,
 )
 from ..functions.poll import (
     has_shape_keys,
 )
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+from ..functions.sampling import (
+    frame_range,
+)
+from ..functions.wavefront import (
+    format_obj_faces,
+    write_obj,
+)
+
+
+# Number of vertices whose positions are compared before all positions are, when looking for duplicate shapes.
+DEDUPE_SAMPLE_COUNT = 32
+
+# Distance (relative to the size of the mesh) within which positions of sampled vertices are considered the same.
+# It only decides which shapes are compared in full, so it errs on the side of comparing more.
+DEDUPE_SAMPLE_TOLERANCE = 1e-4
 
 
 ##### ---------------------------------- OPERATORS ---------------------------------- #####
 
-class OBJECT_OT_objects_from_shape_keys(bpy.types.Operator):
+class OBJECT_OT_objects_from_shape_keys(ModalJob, bpy.types.Operator):
     bl_idname = "object.objects_from_shape_keys"
     bl_label = "Objects from Shape Keys"
     bl_description = ("Iterates over a given frame range and creates a new object on every frame\n"
-                      "if the shape key values are different from the previous frame, i.e. mesh is different")
+                      "if the shape key values are different from the previous frame, i.e. mesh is different.\n"
+                      "Press Esc to cancel, objects that were already created will be kept")
     bl_options = {'REGISTER', 'UNDO'}
 
     delete_duplicates: bpy.props.BoolProperty(
@@ -53,6 +95,44 @@ class OBJECT_OT_objects_from_shape_keys(bpy.types.Operator):
         default=False,
     )
 
+    region: bpy.props.EnumProperty(
+        name="Region",
+        description="Part of the mesh that is compared and copied",
+        items=[('ALL', "Whole Mesh", "Compare and copy the whole mesh"),
+               ('VERTEX_GROUP', "Vertex Group", "Only compare and copy vertices in the vertex group"),
+               ('SELECTION', "Selected Vertices", "Only compare and copy selected vertices")],
+        default='ALL',
+    )
+    vertex_group: bpy.props.StringProperty(
+        name="Vertex Group",
+        description="Vertex group that defines the region",
+    )
+    region_output: bpy.props.EnumProperty(
+        name="Output",
+        description="What is stored in created objects when only a region of the mesh is used",
+        items=[('MESH', "Region Mesh", ("Create meshes that only contain vertices of the region in their deformed positions.\n"
+                                        "Only faces and edges with all vertices inside the region are kept, without UV maps and other attributes")),
+               ('DELTAS', "Position Deltas", ("Create meshes of the region in rest position,\n"
+                                              "with offsets of deformed vertices stored in 'shape_delta' attribute"))],
+        default='MESH',
+    )
+
+    output: bpy.props.EnumProperty(
+        name="Output",
+        description="What is done with every unique shape",
+        items=[('OBJECTS', "Objects", "Create an object for every unique shape"),
+               ('OBJ', "OBJ Files", ("Write every unique shape to an OBJ file in the directory instead of creating objects.\n"
+                                     "Positions include modifiers, unless a region is used, which only has the mix of shape keys")),
+               ('COUNT', "Count Only", "Only count unique shapes within the frame range, without creating anything")],
+        default='OBJECTS',
+    )
+    directory: bpy.props.StringProperty(
+        name="Directory",
+        description="Directory OBJ files are written to",
+        subtype='DIR_PATH',
+        default="//shapes/",
+    )
+
     keep_position: bpy.props.BoolProperty(
         name="Keep Position",
         description="If enabled duplicated objects will have same position as original. Otherwise they'll move along the selected axis",
@@ -108,6 +188,20 @@ class OBJECT_OT_objects_from_shape_keys(bpy.types.Operator):
         col.prop(self, "keyframes_only")
         col.separator()
 
+        col = layout.column(align=True)
+        col.prop(self, "region")
+        if self.region == 'VERTEX_GROUP':
+            col.prop_search(self, "vertex_group", context.object, "vertex_groups")
+        if self.region != 'ALL':
+            col.prop(self, "region_output")
+        col.separator()
+
+        col = layout.column(align=True)
+        col.prop(self, "output")
+        if self.output == 'OBJ':
+            col.prop(self, "directory")
+        col.separator()
+
         col = layout.column(align=True)
         col.prop(self, "keep_position")
         axis_col = layout.column(align=True)
@@ -127,17 +221,11 @@ class OBJECT_OT_objects_from_shape_keys(bpy.types.Operator):
         return context.window_manager.invoke_props_dialog(self)
 
 
+    @profiled
     def execute(self, context):
         print("Starting 'Objects from Shape Keys' operator")
 
         obj = context.object
-        initial_frame = context.scene.frame_current
-        move_axis_index = 'XYZ'.index(self.move_axis)
-        garbage_shape_keys = []
-
-        # Create the Collection
-        duplicates_collection = bpy.data.collections.new(obj.name + "_duplicates")
-        obj.users_collection[0].children.link(duplicates_collection)
 
         # Define Frame Range
         if self.frame_start > self.frame_end:
@@ -145,57 +233,338 @@ class OBJECT_OT_objects_from_shape_keys(bpy.types.Operator):
             return {'CANCELLED'}
 
         if self.keyframes_only:
-            frame_range = set()
             channelbag = ensure_channelbag(obj.data.shape_keys)
-            for fcurve in channelbag.fcurves:
-                if fcurve.data_path.startswith("key_blocks"):
-                    for keyframe in fcurve.keyframe_points:
-                        frame_number = int(keyframe.co[0])
-                        frame_range.add(frame_number)
+            frames = get_keyframed_frames(channelbag, self.frame_start, self.frame_end, self.step)
+        else:
+            frames = frame_range(self.frame_start, self.frame_end, self.step)
+
+        # Output Directory
+        if self.output == 'OBJ':
+            # Without a saved file relative path would be resolved against the working directory of Blender.
+            if self.directory.startswith("//") and not bpy.data.filepath:
+                self.report({'ERROR'}, "Save the file first, or choose an absolute directory for OBJ files")
+                return {'CANCELLED'}
+
+            self._directory = bpy.path.abspath(self.directory)
+            try:
+                os.makedirs(self._directory, exist_ok=True)
+            except OSError as error:
+                self.report({'ERROR'}, f"Directory for OBJ files can't be created: {error}")
+                return {'CANCELLED'}
+
+        # Define Region
+        self._region_indices = None
+        if self.region != 'ALL':
+            if obj.type != 'MESH' or not obj.data.shape_keys.use_relative:
+                self.report({'ERROR'}, "Region can only be used on meshes with relative shape keys")
+                return {'CANCELLED'}
+
+            with phase("read_region"):
+                if self.region == 'VERTEX_GROUP':
+                    if self.vertex_group not in obj.vertex_groups:
+                        self.report({'ERROR'}, "Vertex group for the region is not set")
+                        return {'CANCELLED'}
+                    self._region_indices = numpy.flatnonzero(get_vertex_group_weights(obj, self.vertex_group) > 0.0)
+                else:
+                    selected = numpy.empty(len(obj.data.vertices), dtype=bool)
+                    obj.data.vertices.foreach_get("select", selected)
+                    self._region_indices = numpy.flatnonzero(selected)
+
+            if len(self._region_indices) == 0:
+                self.report({'ERROR'}, "Region doesn't contain any vertices")
+                return {'CANCELLED'}
+
+        count("keys", len(obj.data.shape_keys.key_blocks))
+        count("vertices", len(obj.data.vertices) if self._region_indices is None else len(self._region_indices))
+        count("frames", len(frames))
+
+        self._obj = obj
+        self._initial_frame = context.scene.frame_current
+        self._garbage_shape_keys = []
+        self._unique_count = 0
+        self._output_error = None
+
+        # Region
+        self._region = None
+        self._mix = None
+        if self._region_indices is not None:
+            with phase("prepare_region"):
+                self._region = get_mesh_region(obj.data, self._region_indices)
+                self._mix = get_shape_key_mix(obj, self._region_indices)
+
+        # Without modifiers, positions of the whole mesh are the mix of shape keys, which can be taken from the mix cache
+        # instead of the evaluated mesh, as long as deltas of all shape keys fit in it.
+        # Existing objects are compared by digests of their evaluated positions, which can differ from the NumPy mix
+        # in the last bits, so when they are considered positions are read from the evaluated mesh too.
+        self._read_positions = self.output == 'OBJ' or (self.delete_duplicates and self.consider_existing_objects)
+        self._positions_mix = self._mix
+        if (self._mix is None and self._read_positions and
+            not (self.delete_duplicates and self.consider_existing_objects) and
+            obj.type == 'MESH' and obj.data.shape_keys.use_relative and
+            not any(modifier.show_viewport for modifier in obj.modifiers) and
+            len(obj.data.shape_keys.key_blocks) * len(obj.data.vertices) * 12 <= mix_cache_limit()):
+            self._positions_mix = get_shape_key_mix(obj)
+
+        # Duplicate Detection
+        # Shapes are compared by positions of a few sampled vertices first, only the ones that match are compared in full.
+        self._compare_shapes = self.delete_duplicates and (self._positions_mix is not None or self._read_positions)
+        self._dedupe_stats = {"frames": 0, "values": 0, "samples": 0, "compared": 0, "positions": 0}
+        self._sample_indices = numpy.empty(0, dtype=numpy.int64)
+        if self._compare_shapes:
+            with phase("prepare_samples"):
+                self._prepare_samples(context)
+
+        # Output
+        if self.output == 'OBJECTS':
+            self._duplicates_collection = bpy.data.collections.new(obj.name + "_duplicates")
+            obj.users_collection[0].children.link(self._duplicates_collection)
+
+        elif self.output == 'OBJ':
+            # Faces are the same for every shape, so they're formatted once.
+            region = self._region
+            if region is None:
+                eval_mesh = obj.evaluated_get(context.evaluated_depsgraph_get()).data
+                region = get_mesh_region(eval_mesh, numpy.arange(len(eval_mesh.vertices)))
+            self._faces = format_obj_faces(region)
+            self._faces_vertex_count = len(region.indices)
+
+        # Pipeline
+        samples = self._sample(context, frames)
+        shapes = self._dedupe(context, samples)
+        steps = self._materialize(context, shapes)
+
+        job = ChunkedJob("Creating Objects from Shape Keys", steps, len(frames))
+        return self.start_job(context, job)
+
+
+    def finish_job(self, context, cancelled):
+        obj = self._obj
 
-            frame_range &= set(range(self.frame_start, self.frame_end + 1, self.step))
+        # Reset everything
+        context.view_layer.objects.active = obj
+        obj.select_set(True)
+        context.scene.frame_set(self._initial_frame)
+
+        if self.output == 'OBJECTS':
+            if self.hide_duplicates:
+                self._duplicates_collection.hide_viewport = True
+
+            # Remove userless shape keys IDs.
+            self._clean_up_shape_keys(self._garbage_shape_keys)
+            obj.hide_set(True)
+
+            message = f"{self._unique_count} objects created"
+        elif self.output == 'OBJ':
+            message = f"{self._unique_count} OBJ files written to '{self._directory}'"
         else:
-            frame_range = range(self.frame_start, self.frame_end + 1, self.step)
+            message = f"{self._unique_count} unique shapes found"
 
-        # Cache meshes in the scene
-        scene_objects_cache = {}
-        if self.consider_existing_objects:
-            scene_objects_cache = self._cache_existing_objects(context, obj)
+        if self._output_error is not None:
+            self.report({'ERROR'}, self._output_error)
+            cancelled = True
+
+        # Report
+        stats = self._dedupe_stats
+        if stats["frames"]:
+            print(f"Duplicate detection on {stats['frames']} frames: {stats['values']} matched by shape key values, "
+                  f"{stats['samples']} told apart by {len(self._sample_indices)} sampled vertices, "
+                  f"{stats['compared']} compared in full ({stats['positions']} matched)")
+            for tier in ("values", "samples", "compared", "positions"):
+                count(f"dedupe_{tier}", stats[tier])
+
+        if cancelled:
+            self.report({'WARNING'}, f"Cancelled, {message}. Check console for details about duplicates")
+        else:
+            self.report({'INFO'}, f"{message}. Check console for details about duplicates")
+
+        return {'FINISHED'}
+
+
+    # Frames go through a pipeline of generators: sample > dedupe > materialize.
+    # Each stage pulls one frame at a time from the previous one, so nothing is kept for frames that were processed,
+    # except values and fingerprints of unique shapes, and output of one frame is done before the next frame is sampled.
+
+    def _sample(self, context, frames):
+        """Pipeline stage that steps through frames and yields `(frame, shape key values)`."""
+        """NOTE: Values array is reused between frames, so it has to be copied to be kept."""
+
+        shape_keys = self._obj.data.shape_keys
+        values = numpy.empty(len(shape_keys.key_blocks), dtype=numpy.float32)
+
+        for frame in frames:
+            with phase("frame_set"):
+                context.scene.frame_set(int(frame))
+
+            shape_keys.key_blocks.foreach_get("value", values)
+            yield int(frame), values
 
-        unique_shape_keys_dict = {}
-        prev_obj = None
-        for frame in sorted(frame_range):
-            context.scene.frame_set(frame)
 
-            # Detect Duplicate
-            match = None
-            if self.delete_duplicates:
-                sk_values, match = self._detect_duplicate(context, obj, obj.data, unique_shape_keys_dict, scene_objects_cache)
+    def _dedupe(self, context, samples):
+        """Pipeline stage that yields `(frame, positions, match)`, where match is the name of the earlier shape or existing object that is the same, or None."""
+        """Duplicates are found in tiers, and each tier only runs when cheaper ones don't settle it:
+        1. Quantized shape key values are looked up among values of earlier frames, nothing is evaluated.
+        2. Positions of a few sampled vertices are compared with the ones of unique shapes and existing objects.
+           When none are close, the shape is unique, without reading or hashing all positions.
+        3. Digests of all positions are compared with the ones of shapes that matched on sampled vertices.
+        Positions are None when they weren't needed."""
 
+        stats = self._dedupe_stats
+
+        # Shapes that frames are compared with, as names, positions of sampled vertices, digests of all positions
+        # (computed when they're first compared), and values that their positions are mixed from.
+        names = []
+        samples_buffer = numpy.empty((0, len(self._sample_indices) * 3), dtype=numpy.float32)
+        digests = []
+        shape_values = []
+
+        if self._compare_shapes and self.consider_existing_objects:
+            with phase("cache_existing_objects"):
+                vertex_count = len(self._region_indices) if self._region_indices is not None else None
+                existing_names, samples_buffer, digests = self._cache_existing_objects(context, self._obj, vertex_count=vertex_count)
+            names.extend(existing_names)
+            shape_values.extend([None] * len(existing_names))
+
+        unique_values = {}
+        for frame, values in samples:
+            if not self.delete_duplicates:
+                yield frame, None, None
+                continue
+
+            stats["frames"] += 1
+            coordinates = None
+
+            with phase("detect_duplicate"):
+                # Tier 1: Shape Key Values
+                values_key = quantize_values(values)
+                match = unique_values.get(values_key)
+                if match is not None:
+                    stats["values"] += 1
+
+                elif self._compare_shapes:
+                    # Tier 2: Sampled Vertices
+                    mixed_values, sampled, coordinates = self._sample_positions(context)
+                    candidates = []
+                    if len(names):
+                        distance = numpy.abs(samples_buffer[:len(names)] - sampled).max(axis=1)
+                        candidates = numpy.flatnonzero(distance <= self._sample_tolerance)
+
+                    # Tier 3: All Positions
+                    # Positions aren't kept to be compared, collision of 128-bit BLAKE2 digests is not a practical concern.
+                    digest = None
+                    if len(candidates) == 0:
+                        stats["samples"] += 1
+                    else:
+                        stats["compared"] += 1
+                        if coordinates is None:
+                            coordinates = self._read_coordinates(context, mixed_values)
+                        with phase("hash"):
+                            digest = hash_coordinates(coordinates)
+                        for i in candidates:
+                            if digests[i] is None:
+                                with phase("hash"):
+                                    digests[i] = hash_coordinates(self._read_coordinates(context, shape_values[i]))
+                            if digests[i] == digest:
+                                match = names[i]
+                                stats["positions"] += 1
+                                break
+
+                    if match is None:
+                        # Digest of a unique shape is only computed when something is compared with it,
+                        # unless positions came from the evaluated mesh, which can't be read again later.
+                        if digest is None and mixed_values is None:
+                            with phase("hash"):
+                                digest = hash_coordinates(coordinates)
+                        if len(names) == len(samples_buffer):
+                            grown = numpy.empty((max(16, len(samples_buffer) * 2), samples_buffer.shape[1]), dtype=numpy.float32)
+                            grown[:len(names)] = samples_buffer[:len(names)]
+                            samples_buffer = grown
+                        samples_buffer[len(names)] = sampled
+                        names.append(self._obj.name + "_frame_" + str(frame))
+                        digests.append(digest)
+                        shape_values.append(mixed_values)
+
+                unique_values.setdefault(values_key, match or self._obj.name + "_frame_" + str(frame))
+
+            yield frame, coordinates, match
+
+
+    def _prepare_samples(self, context):
+        """Picks vertices that are compared before all positions, and prepares mix of shape keys for just those vertices.
+        With a mix, vertices that shape keys move the most are picked, otherwise vertices are spread evenly."""
+
+        obj = self._obj
+        mix = self._positions_mix
+        if mix is not None:
+            vertex_count = len(mix.indices)
+            motion = numpy.zeros(vertex_count, dtype=numpy.float32)
+            for delta in mix.deltas:
+                motion += numpy.abs(delta).reshape(-1, 3).sum(axis=1)
+            samples = numpy.sort(numpy.argsort(motion, kind="stable")[::-1][:DEDUPE_SAMPLE_COUNT])
+            self._sample_mix = get_shape_key_mix(obj, mix.indices[samples])
+            scale = numpy.abs(mix.basis).max() if len(mix.basis) else 1.0
+        else:
+            eval_mesh = obj.evaluated_get(context.evaluated_depsgraph_get()).data
+            vertex_count = len(eval_mesh.vertices)
+            samples = numpy.unique(numpy.linspace(0, max(vertex_count - 1, 0), min(DEDUPE_SAMPLE_COUNT, vertex_count)).astype(numpy.int64))
+            self._sample_mix = None
+            scale = numpy.abs(get_mesh_coordinates(eval_mesh)).max() if vertex_count else 1.0
+
+        # Sampled vertices as indices into flat positions array.
+        self._sample_indices = samples
+        self._sample_flat_indices = (samples[:, numpy.newaxis] * 3 + numpy.arange(3)).ravel()
+        self._sample_tolerance = DEDUPE_SAMPLE_TOLERANCE * max(1.0, float(scale))
+
+
+    def _sample_positions(self, context):
+        """Returns `(values, sampled positions, positions)` of the current frame. With a mix, only sampled vertices are mixed,
+        and values they're mixed from are returned, so that all positions can be mixed later. Otherwise positions are
+        read from the evaluated mesh, and values are None."""
+
+        if self._sample_mix is not None:
+            values = self._sample_mix.read_values(self._obj.data.shape_keys)
+            return values, self._sample_mix.evaluate(values), None
+
+        coordinates = self._read_coordinates(context)
+        return None, coordinates[self._sample_flat_indices], coordinates
+
+
+    def _read_coordinates(self, context, values=None):
+        """Returns positions of the current frame (or of given values, when positions are mixed), mixed for the region,
+        or taken from the mix cache or the evaluated mesh."""
+
+        if self._positions_mix is not None:
+            return get_cached_mix(self._obj, values=values, indices=self._region_indices, mix=self._positions_mix)
+
+        with phase("read_positions"):
+            return get_mesh_coordinates(self._obj.evaluated_get(context.evaluated_depsgraph_get()).data)
+
+
+    def _materialize(self, context, shapes):
+        """Pipeline stage that creates an object, writes an OBJ file, or only counts every unique shape, and yields once per frame."""
+
+        obj = self._obj
+        move_axis_index = 'XYZ'.index(self.move_axis)
+        key_count = len(obj.data.shape_keys.key_blocks)
+
+        prev_obj = None
+        for frame, coordinates, match in shapes:
             if match:
-                print(f"- Duplicate detected on the frame {frame}. Matching object: {match.name}")
-            else:
-                # Duplicate object
-                obj_copy = obj.copy()
-                obj_copy.data = obj.data.copy()
-                obj_copy.name = obj_copy.data.name = obj.name + "_frame_" + str(frame)
-                duplicates_collection.objects.link(obj_copy)
-                garbage_shape_keys.append(obj_copy.data.shape_keys.name)
-
-                # Cache shape key values to the dict of uniques
-                if self.delete_duplicates:
-                    unique_shape_keys_dict[sk_values] = obj_copy
-
-                # Apply shape keys
-                bpy.ops.object.select_all(action='DESELECT')
-                obj_copy.select_set(True)
-                context.view_layer.objects.active = obj_copy
-
-                area = [area for area in context.screen.areas if area.type == 'VIEW_3D'][0]
-                with context.temp_override(area=area):
-                    bpy.ops.object.shape_key_remove(all=True, apply_mix=True)
-
-                obj_copy.select_set(False)
+                print(f"- Duplicate detected on the frame {frame}. Matching object: {match}")
+                yield key_count
+                continue
+
+            name = obj.name + "_frame_" + str(frame)
+            if coordinates is None and (self.output == 'OBJ' or (self.output == 'OBJECTS' and self._region is not None)):
+                coordinates = self._read_coordinates(context)
+
+            # Faces of OBJ files were formatted once, so they don't fit if a modifier changes topology on some frame.
+            if self.output == 'OBJ' and len(coordinates) != self._faces_vertex_count * 3:
+                self._output_error = f"Number of vertices changed on frame {frame}, rest of OBJ files can't be written"
+                return
+
+            if self.output == 'OBJECTS':
+                obj_copy = self._create_object(name, coordinates)
+                count("objects")
 
                 # Offset from the previous duplicate
                 if not self.keep_position:
@@ -203,33 +572,69 @@ class OBJECT_OT_objects_from_shape_keys(bpy.types.Operator):
                         obj_copy.location[move_axis_index] = prev_obj.location[move_axis_index] + self.offset_distance
                     prev_obj = obj_copy
 
-        # Reset everything
-        context.view_layer.objects.active = obj
-        obj.select_set(True)
-        context.scene.frame_set(initial_frame)
-        if self.hide_duplicates:
-            duplicates_collection.hide_viewport = True
-
-        # Remove userless shape keys IDs.
-        self._clean_up_shape_keys(garbage_shape_keys)
-
-        # Report
-        num_duplicates = len(duplicates_collection.objects)
-        self.report({'INFO'}, f"{num_duplicates} objects created. Check console for details about duplicates")
-        obj.hide_set(True)
-
-        return {'FINISHED'}
-
-
-    def _cache_existing_objects(self, context, active_obj):
-        """Creates a dictionary of existing mesh objects in the scene and numpy arrays of their vertex positions."""
+            elif self.output == 'OBJ':
+                try:
+                    with phase("write_obj"):
+                        write_obj(os.path.join(self._directory, name + ".obj"), name, coordinates, self._faces)
+                except OSError as error:
+                    self._output_error = f"OBJ file can't be written: {error}"
+                    return
+
+            self._unique_count += 1
+            yield key_count
+
+
+    def _create_object(self, name, coordinates):
+        """Creates a copy of the object with shape keys applied, or a new object with the region mesh."""
+
+        obj = self._obj
+
+        if self._region is not None:
+            with phase("create_mesh"):
+                if self.region_output == 'MESH':
+                    mesh = new_mesh_from_region(name, self._region, coordinates, obj.data.materials)
+                else:
+                    mesh = new_mesh_from_region(name, self._region, self._mix.basis, obj.data.materials)
+                    attribute = mesh.attributes.new("shape_delta", 'FLOAT_VECTOR', 'POINT')
+                    attribute.data.foreach_set("vector", coordinates - self._mix.basis)
+
+            obj_copy = bpy.data.objects.new(name, mesh)
+            obj_copy.matrix_world = obj.matrix_world
+            self._duplicates_collection.objects.link(obj_copy)
+            return obj_copy
+
+        # Duplicate object
+        with phase("copy_object"):
+            obj_copy = obj.copy()
+            obj_copy.data = obj.data.copy()
+        obj_copy.name = obj_copy.data.name = name
+        self._duplicates_collection.objects.link(obj_copy)
+        self._garbage_shape_keys.append(obj_copy.data.shape_keys.name)
+
+        # Apply shape keys
+        with phase("apply_shape_keys"):
+            mix = obj_copy.shape_key_add(name="__mix__", from_mix=True)
+            mix_coordinates = get_shape_key_coordinates(mix)
+            obj_copy.shape_key_clear()
+            obj_copy.data.vertices.foreach_set("co", mix_coordinates)
+            obj_copy.data.update()
+
+        return obj_copy
+
+
+    def _cache_existing_objects(self, context, active_obj, vertex_count=None):
+        """Returns names of existing mesh objects in the scene, positions of their sampled vertices, and digests of their positions.
+        Positions are read on main thread and hashed on thread pool, and only digests are kept.
+        Only objects with `vertex_count` vertices are considered, which is vertex count of the active object by default.
+        Offsets stored in 'shape_delta' attribute (by region output) are added to positions."""
 
         # Evaluate active object to get it's vertex count
         depsgraph = context.evaluated_depsgraph_get()
         eval_active_obj = active_obj.evaluated_get(depsgraph)
-        eval_active_obj_vert_count = len(eval_active_obj.data.vertices)
+        eval_active_obj_vert_count = vertex_count if vertex_count is not None else len(eval_active_obj.data.vertices)
 
-        scene_objects_cache = {}
+        names = []
+        coordinates = []
         for obj in context.scene.objects:
             if obj == active_obj:
                 continue
@@ -243,42 +648,21 @@ class OBJECT_OT_objects_from_shape_keys(bpy.types.Operator):
             if eval_obj_vert_count != eval_active_obj_vert_count:
                 continue
 
-            verts_co = numpy.empty((eval_obj_vert_count * 3), dtype=numpy.float64)
-            eval_obj.data.vertices.foreach_get("co", verts_co)
-
-            scene_objects_cache[obj] = verts_co
-
-        return scene_objects_cache
-
-
-    def _detect_duplicate(self, context, obj, data, unique_shape_keys_dict, scene_objects_cache):
-        """Checks if the exact match of the evaluated mesh (on the current frame) has already been created in loop (or exists in the scene)."""
-        """Compares array of evaluated meshes vertex positions to other arrays in `unique_verts_dict` and returns match if found."""
-        """If match is not found array is added to the dict as an unique."""
-
-        match = None
-        sk_values = None
-        verts_co = None
-
-        # Compare current shape key values to previously stored ones
-        sk_values = tuple(key.value for key in data.shape_keys.key_blocks)
-        if sk_values in unique_shape_keys_dict:
-            match = unique_shape_keys_dict[sk_values]
-
-        # Compare to existing objects in the scene
-        if self.consider_existing_objects:
-            depsgraph = context.evaluated_depsgraph_get()
-            eval_obj = obj.evaluated_get(depsgraph)
+            verts_co = get_mesh_coordinates(eval_obj.data)
+            delta = eval_obj.data.attributes.get("shape_delta")
+            if delta is not None and delta.data_type == 'FLOAT_VECTOR' and delta.domain == 'POINT':
+                delta_co = numpy.empty_like(verts_co)
+                delta.data.foreach_get("vector", delta_co)
+                verts_co += delta_co
 
-            verts_co = numpy.empty((len(eval_obj.data.vertices) * 3), dtype=numpy.float64)
-            eval_obj.data.vertices.foreach_get("co", verts_co)
+            names.append(obj.name)
+            coordinates.append(verts_co)
 
-            for key, values in scene_objects_cache.items():
-                if numpy.array_equal(verts_co, values):
-                    match = key
-                    break
+        samples = numpy.empty((len(coordinates), len(self._sample_flat_indices)), dtype=numpy.float32)
+        for i, verts_co in enumerate(coordinates):
+            samples[i] = verts_co[self._sample_flat_indices]
 
-        return sk_values, match
+        return names, samples, parallel_map(hash_coordinates, coordinates)
 
 
     def _clean_up_shape_keys(self, garbage_shape_keys):
@@ -0,0 +1,248 @@
+import bpy
+import numpy
+import os
+
+from bpy_extras.io_utils import ExportHelper, ImportHelper
+
+from ..functions.pointcache import (
+    CompressedPointCacheWriter,
+    PointCacheWriter,
+    decompress_point_cache,
+    read_point_cache_header,
+)
+from ..functions.poll import (
+    has_shape_keys,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+from ..functions.sampling import (
+    frame_range,
+)
+
+
+##### ---------------------------------- OPERATORS ---------------------------------- #####
+
+class OBJECT_OT_shape_key_point_cache_bake(bpy.types.Operator, ExportHelper):
+    bl_idname = "object.shape_key_point_cache_bake"
+    bl_label = "Bake Shape Keys to Point Cache"
+    bl_description = ("Evaluate the active object on every frame within frame range and write vertex positions to a point cache file (.pc2),\n"
+                      "that can be played back with Mesh Cache modifier")
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".pc2"
+    filter_glob: bpy.props.StringProperty(
+        default = "*.pc2;*.pc2z",
+        options = {'HIDDEN'},
+    )
+
+    follow_scene_range: bpy.props.BoolProperty(
+        name = "Scene Frame Range",
+        description = "Bake between frame range start and end as defined in scene properties",
+        default = True,
+    )
+    frame_start: bpy.props.IntProperty(
+        name = "Start Frame",
+        min = 1,
+        default = 1,
+    )
+    frame_end: bpy.props.IntProperty(
+        name = "End Frame",
+        min = 1,
+        default = 100,
+    )
+    step: bpy.props.IntProperty(
+        name = "Step",
+        min = 1, max = 4,
+        default = 1,
+    )
+
+    source: bpy.props.EnumProperty(
+        name = "Positions",
+        items = [('SHAPE_KEYS', "Shape Keys", ("Only bake the mix of shape keys. Modifiers are disabled while baking,\n"
+                                               "so that they can still be applied on top of the cache")),
+                 ('EVALUATED', "Evaluated", ("Bake positions after all modifiers.\n"
+                                             "Modifiers must not change the number of vertices"))],
+        default = 'SHAPE_KEYS',
+    )
+    compress: bpy.props.BoolProperty(
+        name = "Compress",
+        description = ("Write a compressed point cache (.pc2z) with changes between frames, for transfer.\n"
+                       "It's converted to a regular point cache when it's loaded"),
+        default = False,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if not has_shape_keys(context.object, check_animated=True):
+            cls.poll_message_set("Active object does not have shape keys or they are not animated")
+            return False
+        if context.mode != 'OBJECT':
+            cls.poll_message_set("Point cache can only be baked in Object Mode")
+            return False
+        return True
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        # frame_range
+        layout.prop(self, "follow_scene_range")
+        col = layout.column(align=True)
+        col.prop(self, "frame_start", text="Frame Start")
+        col.prop(self, "frame_end", text="End")
+        if self.follow_scene_range:
+            col.enabled = False
+        layout.prop(self, "step")
+
+        layout.separator()
+        layout.prop(self, "source")
+        layout.prop(self, "compress")
+
+    def check(self, context):
+        # Keep extension of the file path in sync with compression.
+        self.filename_ext = ".pc2z" if self.compress else ".pc2"
+        return super().check(context)
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        scene = context.scene
+        initial_frame = scene.frame_current
+
+        # Define Frame Range
+        if self.follow_scene_range:
+            self.frame_start = scene.frame_start
+            self.frame_end = scene.frame_end
+
+        if self.frame_start > self.frame_end:
+            self.report({'ERROR'}, "Start frame cannot be higher than the end frame")
+            return {'CANCELLED'}
+
+        frames = frame_range(self.frame_start, self.frame_end, self.step)
+        filepath = bpy.path.ensure_ext(self.filepath, ".pc2z" if self.compress else ".pc2")
+
+        # Disable Modifiers
+        disabled_modifiers = []
+        if self.source == 'SHAPE_KEYS':
+            disabled_modifiers = [modifier for modifier in obj.modifiers if modifier.show_viewport]
+            for modifier in disabled_modifiers:
+                modifier.show_viewport = False
+
+        try:
+            vertex_count = len(obj.evaluated_get(context.evaluated_depsgraph_get()).data.vertices)
+
+            # Positions of every frame are read into the same buffer and written out before the next frame.
+            coordinates = numpy.empty(vertex_count * 3, dtype=numpy.float32)
+            writer_type = CompressedPointCacheWriter if self.compress else PointCacheWriter
+            with writer_type(filepath, vertex_count, len(frames), start_frame=float(frames[0]), sample_rate=float(self.step)) as writer:
+                for frame in frames:
+                    with phase("frame_set"):
+                        scene.frame_set(int(frame))
+
+                    with phase("read_positions"):
+                        eval_mesh = obj.evaluated_get(context.evaluated_depsgraph_get()).data
+                        if len(eval_mesh.vertices) != vertex_count:
+                            writer.abort()
+                            self.report({'ERROR'}, f"Number of vertices changed on frame {frame}, point cache can't be baked")
+                            return {'CANCELLED'}
+                        eval_mesh.vertices.foreach_get("co", coordinates)
+
+                    with phase("write_cache"):
+                        writer.write(coordinates)
+
+        except OSError as error:
+            self.report({'ERROR'}, f"Point cache can't be written: {error}")
+            return {'CANCELLED'}
+
+        finally:
+            for modifier in disabled_modifiers:
+                modifier.show_viewport = True
+            scene.frame_set(initial_frame)
+
+        count("vertices", vertex_count)
+        count("frames", len(frames))
+
+        self.report({'INFO'}, f"Point cache of {len(frames)} frames baked to '{bpy.path.basename(filepath)}'")
+        return {'FINISHED'}
+
+
+class OBJECT_OT_shape_key_point_cache_load(bpy.types.Operator, ImportHelper):
+    bl_idname = "object.shape_key_point_cache_load"
+    bl_label = "Load Point Cache"
+    bl_description = ("Play back a point cache file (.pc2 or .pc2z) on the active object with Mesh Cache modifier.\n"
+                      "Compressed point caches are converted to regular ones next to them")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filename_ext = ".pc2"
+    filter_glob: bpy.props.StringProperty(
+        default = "*.pc2;*.pc2z",
+        options = {'HIDDEN'},
+    )
+
+    relative_path: bpy.props.BoolProperty(
+        name = "Relative Path",
+        description = "Store path of the point cache relative to the blend file",
+        default = True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.object is not None and context.object.type == 'MESH'
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        filepath = self.filepath
+
+        try:
+            if filepath.lower().endswith(".pc2z"):
+                with phase("decompress_cache"):
+                    target = os.path.splitext(filepath)[0] + ".pc2"
+                    point_count, start_frame, sample_rate, sample_count = decompress_point_cache(filepath, target)
+                filepath = target
+            else:
+                point_count, start_frame, sample_rate, sample_count = read_point_cache_header(filepath)
+        except (OSError, ValueError) as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        if point_count != len(obj.data.vertices):
+            self.report({'ERROR'}, f"Point cache has {point_count} points, but '{obj.name}' has {len(obj.data.vertices)} vertices")
+            return {'CANCELLED'}
+
+        # Add Mesh Cache Modifier
+        # It's the first modifier, so that positions from the cache replace the mix of shape keys before other modifiers.
+        modifier = obj.modifiers.new("Shape Key Cache", 'MESH_CACHE')
+        modifier.cache_format = 'PC2'
+        modifier.filepath = bpy.path.relpath(filepath) if self.relative_path and bpy.data.filepath else filepath
+        modifier.time_mode = 'FRAME'
+        modifier.frame_start = start_frame
+        modifier.frame_scale = 1.0 / sample_rate if sample_rate > 0.0 else 1.0
+        obj.modifiers.move(len(obj.modifiers) - 1, 0)
+
+        count("vertices", point_count)
+        count("frames", sample_count)
+
+        self.report({'INFO'}, f"Point cache of {sample_count} frames loaded on '{obj.name}'")
+        return {'FINISHED'}
+
+
+
+##### ---------------------------------- REGISTERING ---------------------------------- #####
+
+classes = [
+    OBJECT_OT_shape_key_point_cache_bake,
+    OBJECT_OT_shape_key_point_cache_load,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
@@ -0,0 +1,185 @@
+import bpy
+import math
+import numpy
+
+from ..functions.animation import (
+    ensure_channelbag,
+    evaluate_fcurve,
+    write_keyframes,
+)
+from ..functions.poll import (
+    has_shape_keys,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+
+
+##### ---------------------------------- OPERATORS ---------------------------------- #####
+
+class OBJECT_OT_shape_key_retime(bpy.types.Operator):
+    bl_idname = "object.shape_key_retime"
+    bl_label = "Retime Shape Key Animation"
+    bl_description = ("Resample shape key animation of selected objects at new times: scale it, convert it to a different frame rate,\n"
+                      "or remap it with a time curve. F-curves are evaluated directly, without stepping through frames")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    mode: bpy.props.EnumProperty(
+        name = "Mode",
+        items = [('SCALE', "Scale", "Stretch or squash animation in time around the pivot frame"),
+                 ('FPS', "Frame Rate", "Convert animation from scene frame rate to a different one, keeping its duration in seconds"),
+                 ('CURVE', "Time Curve", ("Remap time with an animated custom property of the scene.\n"
+                                          "On every frame in the scene frame range, value of the property is the frame that is sampled"))],
+        default = 'SCALE',
+    )
+    scale: bpy.props.FloatProperty(
+        name = "Scale",
+        description = "Multiplier of animation length. Values above 1 slow it down, values below 1 speed it up",
+        min = 0.01, soft_max = 10.0,
+        default = 1.0,
+    )
+    pivot: bpy.props.IntProperty(
+        name = "Pivot Frame",
+        description = "Frame that stays in place when animation is scaled",
+        default = 1,
+    )
+    fps: bpy.props.FloatProperty(
+        name = "Frame Rate",
+        description = "Frame rate to convert the animation to",
+        min = 1.0, soft_max = 120.0,
+        default = 30.0,
+    )
+    set_scene_fps: bpy.props.BoolProperty(
+        name = "Set Scene Frame Rate",
+        description = "Change frame rate and frame range of the scene to match the converted animation",
+        default = True,
+    )
+    time_property: bpy.props.StringProperty(
+        name = "Time Property",
+        description = "Name of the animated custom property of the scene that maps frames to sampled frames",
+        default = "shape_key_time",
+    )
+
+    step: bpy.props.IntProperty(
+        name = "Step",
+        description = "Distance between resampled keyframes",
+        min = 1, max = 4,
+        default = 1,
+    )
+    interpolation: bpy.props.EnumProperty(
+        name = "Interpolation",
+        description = "Interpolation of resampled keyframes",
+        items = [('CONSTANT', "Constant", ""),
+                 ('LINEAR', "Linear", ""),
+                 ('BEZIER', "Bezier", "")],
+        default = 'LINEAR',
+    )
+
+    @classmethod
+    def poll(cls, context):
+        if not has_shape_keys(context.object, check_animated=True):
+            cls.poll_message_set("Active object does not have shape keys or they are not animated")
+            return False
+        return True
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        layout.prop(self, "mode", expand=True)
+        if self.mode == 'SCALE':
+            layout.prop(self, "scale")
+            layout.prop(self, "pivot")
+        elif self.mode == 'FPS':
+            layout.prop(self, "fps")
+            layout.prop(self, "set_scene_fps")
+        elif self.mode == 'CURVE':
+            layout.prop(self, "time_property")
+
+        layout.separator()
+        layout.prop(self, "step")
+        layout.prop(self, "interpolation")
+
+    def invoke(self, context, event):
+        self.pivot = context.scene.frame_start
+        return context.window_manager.invoke_props_dialog(self)
+
+    @profiled
+    def execute(self, context):
+        scene = context.scene
+
+        objects = [obj for obj in context.selected_objects if has_shape_keys(obj, check_animated=True)]
+        if context.object not in objects:
+            objects.append(context.object)
+
+        # Time Curve
+        time_curve = None
+        if self.mode == 'CURVE':
+            channelbag = ensure_channelbag(scene)
+            time_curve = channelbag.fcurves.find(f'["{self.time_property}"]') if channelbag else None
+            if time_curve is None:
+                self.report({'ERROR'}, f"Scene property '{self.time_property}' is not animated")
+                return {'CANCELLED'}
+
+        # Scale of Time
+        scene_fps = scene.render.fps / scene.render.fps_base
+        scale = self.scale if self.mode == 'SCALE' else self.fps / scene_fps
+        pivot = self.pivot if self.mode == 'SCALE' else scene.frame_start
+
+        retimed = 0
+        for obj in objects:
+            channelbag = ensure_channelbag(obj.data.shape_keys)
+            if channelbag is None:
+                continue
+            fcurves = [fcurve for fcurve in channelbag.fcurves
+                       if fcurve.data_path.startswith("key_blocks[") and fcurve.data_path.endswith("].value")]
+            if not fcurves:
+                continue
+
+            # Sample Times
+            if time_curve is not None:
+                frames = numpy.arange(scene.frame_start, scene.frame_end + 1, self.step, dtype=numpy.float64)
+                with phase("evaluate_time_curve"):
+                    source_frames = evaluate_fcurve(time_curve, frames).astype(numpy.float64)
+            else:
+                first = min(fcurve.range()[0] for fcurve in fcurves)
+                last = max(fcurve.range()[1] for fcurve in fcurves)
+                frames = numpy.arange(math.ceil(pivot + (first - pivot) * scale),
+                                      math.floor(pivot + (last - pivot) * scale) + 1, self.step, dtype=numpy.float64)
+                source_frames = pivot + (frames - pivot) / scale
+
+            count("frames", len(frames))
+            count("keys", len(fcurves))
+
+            # Values of all f-curves are evaluated before any of them is written.
+            values = [evaluate_fcurve(fcurve, source_frames) for fcurve in fcurves]
+            for fcurve, fcurve_values in zip(fcurves, values):
+                write_keyframes(fcurve, frames, fcurve_values, interpolation=self.interpolation, replace=True)
+            retimed += len(fcurves)
+
+        if self.mode == 'FPS' and self.set_scene_fps:
+            scene.render.fps = round(self.fps)
+            scene.render.fps_base = round(self.fps) / self.fps
+            scene.frame_end = math.floor(pivot + (scene.frame_end - pivot) * scale)
+
+        self.report({'INFO'}, f"{retimed} shape key f-curves retimed")
+        return {'FINISHED'}
+
+
+
+##### ---------------------------------- REGISTERING ---------------------------------- #####
+
+classes = [
+    OBJECT_OT_shape_key_retime,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
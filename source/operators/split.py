@@ -1,18 +1,29 @@
 import bpy
+import numpy
+import re
 
 from ..functions.animation import (
     transfer_animation,
 )
+from ..functions.drivers import (
+    validate_replacement,
+)
 from ..functions.mesh import (
+    KeyBlockIndex,
+    editable_shape_keys,
+    get_shape_key_coordinates,
+    set_shape_key_coordinates,
     store_active_shape_key,
     set_shape_key_values,
-    duplicate_shape_key,
-    remove_shape_key,
-    reposition_shape_key,
 )
 from ..functions.poll import (
     has_shape_keys,
 )
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
 
 
 ##### ---------------------------------- OPERATORS ---------------------------------- #####
@@ -23,66 +34,84 @@ class OBJECT_OT_shape_key_split(bpy.types.Operator):
     bl_description = "Split active shape key into two parts based on edit mode selection"
     bl_options = {'REGISTER', 'UNDO'}
 
+    driver_pattern: bpy.props.StringProperty(
+        name = "Retarget Drivers",
+        description = ("Regular expression that is replaced in bones, objects, and data paths that driver variables of the new shape key read,\n"
+                       "e.g. '_L$' to point the driver of a mirrored shape key to the other side. Leave empty to copy drivers as they are"),
+        default = "",
+    )
+    driver_replacement: bpy.props.StringProperty(
+        name = "Replace With",
+        description = "Text that matches of the pattern are replaced with",
+        default = "",
+    )
+
     @classmethod
     def poll(cls, context):
         return has_shape_keys(context.object)
 
+    @profiled
     def execute(self, context):
         obj = context.object
         shape_keys = obj.data.shape_keys
         active_index = obj.active_shape_key_index
-        mode = obj.mode
 
         if active_index == 0:
             self.report({'INFO'}, "Basis shape key can't be split")
             return {'CANCELLED'}
 
-        if not any(v.select for v in obj.data.vertices):
-            self.report({'INFO'}, "Nothing is selected in edit mode")
+        try:
+            validate_replacement(self.driver_pattern, self.driver_replacement)
+        except re.error as error:
+            self.report({'ERROR'}, f"Invalid driver retarget pattern: {error}")
             return {'CANCELLED'}
 
-        if mode == 'EDIT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        # Get the active shape key and its properties
-        original_shape_key, sk_properties = store_active_shape_key(obj)
-
-        # Create Vertex Groups
-        verts_left = []
-        verts_right = []
-        for vert in obj.data.vertices:
-            if vert.select == True:
-                verts_left.append(vert.index)
-            else:
-                verts_right.append(vert.index)
-
-        group_left = obj.vertex_groups.new(name="shape_key_split_left")
-        group_left.add(verts_left, weight=1, type='ADD')
-
-        group_right = obj.vertex_groups.new(name="shape_key_split_right")
-        group_right.add(verts_right, weight=1, type='ADD')
-
-
-        # Add Left Shape Key
-        original_shape_key.vertex_group = "shape_key_split_left"
-        left_shape_key = duplicate_shape_key(obj)
-        set_shape_key_values(left_shape_key, sk_properties, name=sk_properties["name"] + ".split_001")
-        obj.vertex_groups.remove(group_left)
-
-        # Add Right Shape Key
-        original_shape_key.vertex_group = 'shape_key_split_right'
-        right_shape_key = duplicate_shape_key(obj)
-        set_shape_key_values(right_shape_key, sk_properties, name=sk_properties["name"] + ".split_002")
-        obj.vertex_groups.remove(group_right)
-
-        # Transfer Animation
-        transfer_animation(shape_keys, original_shape_key, left_shape_key, right_shape_key)
-
-        # Move the shape key to the correct position in the UI
-        reposition_shape_key(obj, shape_keys, active_index, left_shape_key, right_shape_key, mode=mode)
+        # In Edit Mode selected vertex count is read from edit-mode mesh, so nothing has to be converted to check it.
+        if obj.mode == 'EDIT' and obj.type == 'MESH' and obj.data.total_vert_sel == 0:
+            self.report({'INFO'}, "Nothing is selected in edit mode")
+            return {'CANCELLED'}
 
-        # Remove the original shape key
-        remove_shape_key(obj, original_shape_key)
+        count("keys", len(shape_keys.key_blocks))
+        count("vertices", len(obj.data.vertices))
+
+        # Edit Mode is left once for the whole operation, since new shape key is moved and made active.
+        with editable_shape_keys(obj, object_mode=True):
+            # Read Selection
+            selected = numpy.empty(len(obj.data.vertices), dtype=bool)
+            obj.data.vertices.foreach_get("select", selected)
+            if not selected.any():
+                self.report({'INFO'}, "Nothing is selected in edit mode")
+                return {'CANCELLED'}
+
+            # Get the active shape key and its properties
+            original_shape_key, sk_properties = store_active_shape_key(obj)
+
+            # Split Deformation
+            # Selected part stays in the original shape key, rest is moved to the new one.
+            with phase("split_coordinates"):
+                selected = numpy.repeat(selected, 3)
+                coordinates = get_shape_key_coordinates(original_shape_key)
+                basis_coordinates = get_shape_key_coordinates(shape_keys.reference_key)
+                left_coordinates = numpy.where(selected, coordinates, basis_coordinates)
+                right_coordinates = numpy.where(selected, basis_coordinates, coordinates)
+
+            # Add Right Shape Key
+            keys = KeyBlockIndex(obj)
+            right_shape_key = keys.add(name=sk_properties["name"] + ".split_002")
+            set_shape_key_values(right_shape_key, sk_properties, name=right_shape_key.name)
+            set_shape_key_coordinates(right_shape_key, right_coordinates)
+
+            # Left Shape Key
+            set_shape_key_coordinates(original_shape_key, left_coordinates)
+            keys.rename(original_shape_key, sk_properties["name"] + ".split_001")
+
+            # Transfer Animation
+            transfer_animation(shape_keys, original_shape_key, right_shape_key,
+                               replacements=[(self.driver_pattern, self.driver_replacement)])
+
+            # Move the shape key to the correct position in the UI
+            keys.move(right_shape_key, active_index + 1)
+            keys.set_active(original_shape_key)
 
         return {'FINISHED'}
 
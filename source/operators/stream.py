@@ -0,0 +1,250 @@
+import bpy
+import numpy
+
+from bpy_extras.io_utils import ExportHelper, ImportHelper
+
+from ..functions.animation import (
+    ensure_shape_key_fcurve,
+    write_keyframes,
+)
+from ..functions.mesh import (
+    KeyBlockIndex,
+)
+from ..functions.poll import (
+    has_shape_keys,
+)
+from ..functions.profiling import (
+    count,
+    phase,
+    profiled,
+)
+from ..functions.sampling import (
+    frame_range,
+    sample_shape_key_values,
+)
+from ..functions.stream import (
+    ShapeKeyStreamWriter,
+    ShapeKeyStreamReader,
+)
+
+
+##### ---------------------------------- OPERATORS ---------------------------------- #####
+
+class OBJECT_OT_shape_key_stream_export(bpy.types.Operator, ExportHelper):
+    bl_idname = "object.shape_key_stream_export"
+    bl_label = "Export Shape Key Animation"
+    bl_description = ("Sample shape key values of the active object on every frame within frame range\n"
+                      "and write them to a compact binary stream file")
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".bsks"
+    filter_glob: bpy.props.StringProperty(
+        default = "*.bsks",
+        options = {'HIDDEN'},
+    )
+
+    follow_scene_range: bpy.props.BoolProperty(
+        name = "Scene Frame Range",
+        description = "Export between frame range start and end as defined in scene properties",
+        default = True,
+    )
+    frame_start: bpy.props.IntProperty(
+        name = "Start Frame",
+        min = 1,
+        default = 1,
+    )
+    frame_end: bpy.props.IntProperty(
+        name = "End Frame",
+        min = 1,
+        default = 100,
+    )
+    step: bpy.props.IntProperty(
+        name = "Step",
+        min = 1, max = 4,
+        default = 1,
+    )
+
+    precision: bpy.props.EnumProperty(
+        name = "Precision",
+        description = "Precision in which shape key values are stored",
+        items = [('HALF', "Half (16-bit)", "Store values as 16-bit floats. Smaller, precise to about 3 decimal places"),
+                 ('FULL', "Full (32-bit)", "Store values as 32-bit floats")],
+        default = 'HALF',
+    )
+    sparse: bpy.props.BoolProperty(
+        name = "Only Changed Values",
+        description = "Only store values of shape keys that changed since the previous frame",
+        default = True,
+    )
+    threshold: bpy.props.FloatProperty(
+        name = "Threshold",
+        description = "Changes smaller than this are not stored",
+        min = 0.0, max = 0.1,
+        default = 0.0,
+        precision = 4,
+    )
+    include_positions: bpy.props.BoolProperty(
+        name = "Vertex Positions",
+        description = "Store evaluated vertex positions for every frame as well",
+        default = False,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return has_shape_keys(context.object, check_animated=True)
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        # frame_range
+        layout.prop(self, "follow_scene_range")
+        col = layout.column(align=True)
+        col.prop(self, "frame_start", text="Frame Start")
+        col.prop(self, "frame_end", text="End")
+        if self.follow_scene_range:
+            col.enabled = False
+        layout.prop(self, "step")
+
+        layout.separator()
+        layout.prop(self, "precision")
+        layout.prop(self, "sparse")
+        row = layout.row()
+        row.prop(self, "threshold")
+        if not self.sparse:
+            row.enabled = False
+        layout.prop(self, "include_positions")
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        scene = context.scene
+        initial_frame = scene.frame_current
+
+        # Define Frame Range
+        if self.follow_scene_range:
+            self.frame_start = scene.frame_start
+            self.frame_end = scene.frame_end
+
+        if self.frame_start > self.frame_end:
+            self.report({'ERROR'}, "Start frame cannot be higher than the end frame")
+            return {'CANCELLED'}
+
+        frames = frame_range(self.frame_start, self.frame_end, self.step)
+        names = [key.name for key in obj.data.shape_keys.key_blocks[1:]]
+        vertex_count = 0
+        if self.include_positions:
+            vertex_count = len(obj.evaluated_get(context.evaluated_depsgraph_get()).data.vertices)
+
+        # Stream Frames to File
+        try:
+            with ShapeKeyStreamWriter(self.filepath, names, frames,
+                                      vertex_count=vertex_count,
+                                      fps=scene.render.fps / scene.render.fps_base,
+                                      half=(self.precision == 'HALF'),
+                                      sparse=self.sparse,
+                                      threshold=self.threshold) as writer:
+                for __, values, coordinates in sample_shape_key_values(scene, [obj], frames, positions=self.include_positions):
+                    # Skip 'Basis' Key
+                    with phase("write_stream"):
+                        writer.write(values[0][:, 1:], coordinates[0] if coordinates else None)
+        except (OSError, ValueError) as error:
+            scene.frame_set(initial_frame)
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        count("keys", len(names))
+        count("vertices", vertex_count)
+        count("frames", len(frames))
+
+        scene.frame_set(initial_frame)
+        self.report({'INFO'}, f"Shape key animation of {len(frames)} frames exported to '{bpy.path.basename(self.filepath)}'")
+        return {'FINISHED'}
+
+
+class OBJECT_OT_shape_key_stream_import(bpy.types.Operator, ImportHelper):
+    bl_idname = "object.shape_key_stream_import"
+    bl_label = "Import Shape Key Animation"
+    bl_description = ("Read shape key values from a binary stream file and keyframe them on shape keys of the active object.\n"
+                      "Shape keys are matched by name. Existing keyframes of matching shape keys are replaced")
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filename_ext = ".bsks"
+    filter_glob: bpy.props.StringProperty(
+        default = "*.bsks",
+        options = {'HIDDEN'},
+    )
+
+    frame_offset: bpy.props.IntProperty(
+        name = "Frame Offset",
+        description = "Offset every imported keyframe by this amount of frames",
+        default = 0,
+    )
+    constant_interpolation: bpy.props.BoolProperty(
+        name = "Constant Interpolation",
+        description = "All inserted keyframes will have constant interpolation",
+        default = True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return has_shape_keys(context.object)
+
+    @profiled
+    def execute(self, context):
+        obj = context.object
+        shape_keys = obj.data.shape_keys
+
+        try:
+            reader = ShapeKeyStreamReader(self.filepath)
+        except (OSError, ValueError) as error:
+            self.report({'ERROR'}, str(error))
+            return {'CANCELLED'}
+
+        if reader.frame_count == 0:
+            self.report({'WARNING'}, "File doesn't contain any frames")
+            return {'CANCELLED'}
+
+        frames = numpy.asarray(reader.frames, dtype=numpy.float32) + self.frame_offset
+        with phase("read_stream"):
+            values = reader.read_values()
+        count("frames", len(frames))
+
+        # Write F-Curves
+        interpolation = 'CONSTANT' if self.constant_interpolation else None
+        imported = 0
+        keys = KeyBlockIndex(obj)
+        for i, name in enumerate(reader.names):
+            if keys.index(name) < 1:
+                continue
+            key = keys.get(name)
+
+            fcurve = ensure_shape_key_fcurve(shape_keys, key, float(frames[0]))
+            write_keyframes(fcurve, frames, values[:, i], interpolation=interpolation, replace=True)
+            imported += 1
+            count("keys")
+
+        skipped = len(reader.names) - imported
+        if skipped:
+            self.report({'WARNING'}, f"Animation imported for {imported} shape keys, {skipped} not found on '{obj.name}'")
+        else:
+            self.report({'INFO'}, f"Animation imported for {imported} shape keys")
+        return {'FINISHED'}
+
+
+
+##### ---------------------------------- REGISTERING ---------------------------------- #####
+
+classes = [
+    OBJECT_OT_shape_key_stream_export,
+    OBJECT_OT_shape_key_stream_import,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
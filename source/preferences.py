@@ -0,0 +1,78 @@
+import bpy
+
+
+#### ------------------------------ FUNCTIONS ------------------------------ ####
+
+def get_preferences(context=None):
+    """Returns add-on preferences"""
+
+    context = context or bpy.context
+    return context.preferences.addons[__package__].preferences
+
+
+
+#### ------------------------------ PREFERENCES ------------------------------ ####
+
+class BAKE_SHAPE_KEYS_preferences(bpy.types.AddonPreferences):
+    bl_idname = __package__
+
+    enable_profiling: bpy.props.BoolProperty(
+        name = "Profile Operators",
+        description = ("Measure time spent in each phase of shape key operators, report it after every run,\n"
+                       "and append it to the JSON log in the log directory"),
+        default = False,
+    )
+    use_cprofile: bpy.props.BoolProperty(
+        name = "Capture with cProfile",
+        description = ("Additionally capture a full Python profile of every run and save it next to the log (.prof file).\n"
+                       "This slows operators down considerably"),
+        default = False,
+    )
+    log_directory: bpy.props.StringProperty(
+        name = "Log Directory",
+        description = "Directory where profiling log and profiles are saved. If empty, add-ons user directory is used",
+        subtype = 'DIR_PATH',
+        default = "",
+    )
+
+    mix_cache_size: bpy.props.IntProperty(
+        name = "Mix Cache Size (MB)",
+        description = ("Memory that shape key mixes (and data they're computed from) can take while they're reused\n"
+                       "by operators that mix the same shape key values more than once"),
+        min = 0, soft_max = 4096,
+        default = 256,
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False
+
+        col = layout.column(heading="Performance")
+        col.prop(self, "mix_cache_size")
+        layout.separator()
+
+        col = layout.column(heading="Profiling")
+        col.prop(self, "enable_profiling")
+        row = col.row()
+        row.prop(self, "use_cprofile")
+        row.enabled = self.enable_profiling
+        row = col.row()
+        row.prop(self, "log_directory")
+        row.enabled = self.enable_profiling
+
+
+
+#### ------------------------------ REGISTRATION ------------------------------ ####
+
+classes = [
+    BAKE_SHAPE_KEYS_preferences,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
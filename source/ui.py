@@ -1,7 +1,7 @@
 import bpy
 import os
 
-from .functions.poll import has_shape_keys
+from .functions.poll import has_shape_keys, shape_key_summary
 
 
 #### ------------------------------ MENUS ------------------------------ ####
@@ -16,13 +16,14 @@ def animation_menu(self, context):
         bake_shape_key = pcoll["bake_shape_key"]
 
         layout.operator("object.shape_key_action_bake", icon_value=bake_shape_key.icon_id)
+        layout.operator("object.shape_key_retime")
 
 
 def shape_keys_panel(self, context):
     layout = self.layout
     obj = context.active_object
 
-    if has_shape_keys(obj) and len(obj.data.shape_keys.key_blocks) >= 3:
+    if shape_key_summary(obj).key_count >= 3:
         layout.separator()
         layout.operator("object.shape_key_keyframe_all", text="Keyframe All Shape Keys")
 
@@ -36,6 +37,7 @@ def copy_menu(self, context):
 def shape_key_context_menu(self, context):
     layout = self.layout
     layout.operator("object.shape_key_split", text="Split", icon='SCULPTMODE_HLT')
+    layout.operator("object.shape_key_mirror_copy", text="Mirror Copy", icon='MOD_MIRROR')
     layout.operator("object.shape_key_duplicate", text="Duplicate (w/ Animation)", icon='DUPLICATE')
 
 
@@ -44,6 +46,14 @@ def shape_key_extras(self, context):
     layout.separator()
     layout.menu("OBJECT_MT_shape_key_merge", text="Merge Shape Keys")
     layout.operator("object.objects_from_shape_keys")
+    layout.operator("object.shape_key_clean_up")
+    layout.operator("object.shape_key_compress")
+    layout.operator("object.shape_key_bake_combinations")
+    layout.separator()
+    layout.operator("object.shape_key_stream_export", text="Export Shape Key Animation")
+    layout.operator("object.shape_key_stream_import", text="Import Shape Key Animation")
+    layout.operator("object.shape_key_point_cache_bake", text="Bake to Point Cache")
+    layout.operator("object.shape_key_point_cache_load", text="Load Point Cache")
 
 
 class OBJECT_MT_shape_key_merge(bpy.types.Menu):